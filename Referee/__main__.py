@@ -3,10 +3,16 @@ Driver program to instantiate two Player classes
 and begin a game between them.
 """
 
-from Referee.log import StarLog
+import os
+import functools
+
+from Referee.log import StarLog, TelemetryLog
 from Referee.game import play, IllegalActionException
 from Referee.player import PlayerWrapper, ResourceLimitException, set_space_line
 from Referee.options import get_options
+from Referee.isolation import ProcessPlayerWrapper, PlayerProcessError
+from Referee.engine import EnginePlayerWrapper, is_engine_spec
+from Referee.profiling import PlayerProfile
 
 def main():
     # Parse command-line options into a namespace for use throughout this
@@ -20,14 +26,37 @@ def main():
     out.comment("(any other lines of output must be from your Player classes).")
     out.comment()
 
+    # Optionally record every player call for later analysis
+    telemetry = None
+    if options.telemetry is not None:
+        telemetry = TelemetryLog(open(options.telemetry, 'w'))
+
+    # Optionally run each player in a process of its own
+    if options.isolate:
+        Wrapper = functools.partial(ProcessPlayerWrapper, share_board=True)
+    else:
+        Wrapper = PlayerWrapper
+    def wrapper(num, player_loc):
+        if is_engine_spec(player_loc):
+            return EnginePlayerWrapper
+        # Optionally profile the player's calls
+        if options.profile is not None:
+            profile = PlayerProfile(os.path.join(options.profile,
+                f"player{num}"), options.profile_mode)
+            return functools.partial(Wrapper, profile=profile)
+        return Wrapper
+    p1 = p2 = None
+
     try:
-        # Import player classes
-        p1 = PlayerWrapper('player 1', options.player1_loc,
+        # Import player classes (or start engines)
+        p1 = wrapper(1, options.player1_loc)('player 1', options.player1_loc,
                 time_limit=options.time, space_limit=options.space,
-                logfn=out.comment)
-        p2 = PlayerWrapper('player 2', options.player2_loc,
+                logfn=out.comment, accounting=options.accounting,
+                telemetry=telemetry)
+        p2 = wrapper(2, options.player2_loc)('player 2', options.player2_loc,
                 time_limit=options.time, space_limit=options.space,
-                logfn=out.comment)
+                logfn=out.comment, accounting=options.accounting,
+                telemetry=telemetry)
 
         # We'll start measuring space usage from now, after all
         # library imports should be finished:
@@ -37,6 +66,7 @@ def main():
         result = play([p1, p2],
                 delay=options.delay,
                 logfilename=options.logfile,
+                recordfilename=options.record,
                 out_function=out.comment,
                 print_state=(options.verbosity>1),
                 use_debugboard=(options.verbosity>2),
@@ -59,8 +89,18 @@ def main():
         out.comment("game error!", depth=-1)
         out.print("error: resource limit exceeded!")
         out.comment(e)
+    except PlayerProcessError as e:
+        out.comment("game error!", depth=-1)
+        out.print("error: player process failed!")
+        out.comment(e)
     # If it's another kind of error then it might be coming from the player
     # itself? Then, a traceback will be more helpful.
+    finally:
+        for p in (p1, p2):
+            if p is not None:
+                p.close()
+        if telemetry is not None:
+            telemetry.file.close()
 
 if __name__ == '__main__':
     main()
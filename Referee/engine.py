@@ -0,0 +1,266 @@
+"""
+Drive a long-lived engine process, speaking a line-based text protocol on its
+stdin/stdout, as a normal player.
+
+The referee sends one command per line:
+
+    isready                     -- reply `readyok` once all earlier commands
+                                   have been processed
+    newgame                     -- forget the last game; set the start position
+    position startpos|NAME|KEY [moves ACTION ...]
+                                -- set the position (the start position, a
+                                   named test position, or the text form of
+                                   a position key with the colour to move;
+                                   see `Referee.position`), then apply
+                                   actions
+    move ACTION                 -- apply an action (by either player)
+    go [depth N] [movetime S] [time S]
+                                -- search the position for the side to move,
+                                   to a depth, for S CPU seconds, or with S
+                                   seconds left for the rest of the game;
+                                   reply (any number of `info ...` lines and)
+                                   `bestmove ACTION`
+    stop                        -- finish the current search early
+    quit                        -- exit
+
+and ACTION is written without spaces (see `format_action`): `B34` to boom the
+stack at (3, 4), or `M2-34-36` to move 2 tokens from (3, 4) to (3, 6). Lines
+the engine cannot handle are answered with `error MESSAGE`.
+
+`EnginePlayerWrapper` plays one game with such an engine, charging the
+engine's CPU time and memory (read from procfs) against the player's limits
+as for a player in its own process (see `Referee.isolation`). An `Engine`
+can be kept running and handed to wrapper after wrapper, so that many games
+are played without paying for the engine's start-up each time.
+
+A player specification of the form 'engine=COMMAND' (e.g. 'engine=python -m
+Src.engine') asks the referee or the tournament to play with an engine.
+"""
+
+import os
+import time
+import shlex
+import select
+import subprocess
+
+from Referee.player import ResourceLimitException
+from Referee.isolation import ProcessPlayerWrapper, PlayerProcessError, \
+    HANG_GRACE
+
+ENGINE_PREFIX = "engine="
+
+# seconds to wait for an engine to start up or confirm it is ready
+STARTUP_TIMEOUT = 60.0
+
+def is_engine_spec(player_loc):
+    """Whether a parsed player specification names an engine command"""
+    return player_loc[0] == ENGINE_PREFIX
+
+def format_action(action):
+    """Write an action in the protocol's notation"""
+    if action[0] == "BOOM":
+        (x, y), = action[1:]
+        return f"B{x}{y}"
+    _, n, (ax, ay), (bx, by) = action
+    return f"M{n}-{ax}{ay}-{bx}{by}"
+
+def parse_action(text):
+    """Read an action written in the protocol's notation"""
+    try:
+        if text[0] == "B" and len(text) == 3:
+            return ("BOOM", (int(text[1]), int(text[2])))
+        if text[0] == "M":
+            n, a, b = text[1:].split("-")
+            if len(a) == len(b) == 2:
+                return ("MOVE", int(n), (int(a[0]), int(a[1])),
+                    (int(b[0]), int(b[1])))
+    except (IndexError, ValueError):
+        pass
+    raise ValueError(f"not an action: {text!r}")
+
+
+class Engine:
+    """
+    A running engine process: send it commands and read its replies (with a
+    timeout), and measure its CPU time and memory use.
+    """
+    def __init__(self, command, quiet=False):
+        args = shlex.split(command) if isinstance(command, str) else command
+        self.command = command
+        self.process = subprocess.Popen(args, stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=(subprocess.DEVNULL if quiet else None), bufsize=0)
+        self.buffer = b""
+        self.base_usage = (0, 0)
+        self.send("isready")
+        self.expect("readyok", STARTUP_TIMEOUT)
+        # the engine's footprint on starting up counts as the interpreter's
+        self.base_usage = self.space_usage()
+
+    def _readline(self, timeout):
+        """
+        Read a line of output (without a thread, which would count towards
+        the memory use of players in the referee's process), or return None at
+        the end of the output. Raise TimeoutError if none arrives in time.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        fd = self.process.stdout.fileno()
+        while b"\n" not in self.buffer:
+            wait = None if deadline is None else max(0, deadline - time.time())
+            if not select.select([fd], [], [], wait)[0]:
+                raise TimeoutError
+            data = os.read(fd, 4096)
+            if not data:
+                return None
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode().strip()
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def send(self, line):
+        try:
+            self.process.stdin.write(line.encode() + b"\n")
+        except (BrokenPipeError, OSError):
+            raise self._died()
+
+    def expect(self, prefix, timeout=None):
+        """
+        Wait for a reply starting with `prefix` (skipping any other lines, e.g.
+        `info` lines) and return it. Raise ResourceLimitException on timing
+        out, or PlayerProcessError if the engine exits or reports an error.
+        """
+        while True:
+            try:
+                line = self._readline(timeout)
+            except TimeoutError:
+                raise ResourceLimitException(f"engine '{self.command}' "
+                    "stopped responding")
+            if line is None:
+                raise self._died()
+            if line.startswith("error"):
+                raise PlayerProcessError(f"engine '{self.command}' reported "
+                    f"an {line}")
+            if line.split(" ", 1)[0] == prefix:
+                return line
+
+    def _died(self):
+        try:
+            exitcode = self.process.wait(1)
+        except subprocess.TimeoutExpired:
+            exitcode = None
+        return PlayerProcessError(f"engine '{self.command}' exited "
+            f"unexpectedly (exit code {exitcode})")
+
+    def cpu_time(self):
+        """Total CPU time (user and system) used by the engine, in seconds"""
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            # (skip past the command name, which may contain spaces)
+            fields = f.read().rsplit(")", 1)[1].split()
+        utime, stime = int(fields[11]), int(fields[12])
+        return (utime + stime) / os.sysconf("SC_CLK_TCK")
+
+    def space_usage(self):
+        """
+        Current and peak virtual memory usage of the engine, in MB, beyond
+        its usage (and peak usage) on starting up
+        """
+        base_curr, base_peak = self.base_usage
+        with open(f"/proc/{self.process.pid}/status") as proc_status:
+            for line in proc_status:
+                if 'VmSize:' in line:
+                    curr_usage = int(line.split()[1]) / 1024 # kB -> MB
+                elif 'VmPeak:' in line:
+                    peak_usage = int(line.split()[1]) / 1024 # kB -> MB
+        curr_usage -= base_curr
+        return curr_usage, max(curr_usage, peak_usage - base_peak)
+
+    def close(self):
+        if self.alive():
+            try:
+                self.send("quit")
+                self.process.wait(1)
+            except (PlayerProcessError, subprocess.TimeoutExpired):
+                pass
+        if self.alive():
+            self.process.kill()
+            self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class EnginePlayerWrapper(ProcessPlayerWrapper):
+    """
+    A PlayerWrapper playing with an engine (see the module documentation).
+
+    `player_loc` is a specification parsed from 'engine=COMMAND'. If given a
+    running `engine`, the wrapper plays with it and leaves it running when
+    closed; otherwise it starts an engine of its own and stops it on `.close()`.
+
+    The engine's CPU time since the start of the game is charged to the
+    player, like its memory use beyond its use on starting up (note that the
+    peak usage of a reused engine covers all its games so far).
+    """
+    def __init__(self, name, player_loc, time_limit=None, space_limit=None,
+            logfn=None, accounting="strict", telemetry=None, engine=None,
+            quiet=False):
+        self.engine = engine
+        self.owns_engine = engine is None
+        super().__init__(name, player_loc, time_limit=time_limit,
+            space_limit=space_limit, logfn=logfn, accounting=accounting,
+            telemetry=telemetry, quiet=quiet)
+
+    def _load(self, player_loc):
+        _, command = player_loc
+        if self.engine is None:
+            self.engine = Engine(command, quiet=self.quiet)
+        self.player_cls = f"engine '{command}'"
+        self.process = self.engine.process
+
+    def _request(self, method, *args):
+        engine = self.engine
+        timeout = None
+        if self.timer.limit:
+            timeout = max(0, self.timer.limit - self.timer.clock) + HANG_GRACE
+        try:
+            if method == "init":
+                engine.send("newgame")
+                engine.send("isready")
+                engine.expect("readyok", STARTUP_TIMEOUT)
+                self.cpu_start = engine.cpu_time()
+                result = None
+            elif method == "action":
+                go = "go"
+                if self.timer.limit:
+                    go += f" time {self.timer.limit - self.timer.clock:.3f}"
+                engine.send(go)
+                result = parse_action(engine.expect("bestmove",
+                    timeout).split()[1])
+            else: # method == "update"
+                _, action = args
+                engine.send(f"move {format_action(action)}")
+                result = None
+        except (ResourceLimitException, PlayerProcessError):
+            # an engine in an unknown state is no use to later games either
+            engine.close()
+            self.close()
+            raise
+        except (IndexError, ValueError) as e:
+            engine.close()
+            self.close()
+            raise PlayerProcessError(f"{self.name} sent an unreadable "
+                f"reply: {e}")
+        curr_usage, peak_usage = engine.space_usage()
+        self._charge(engine.cpu_time() - self.cpu_start, curr_usage,
+            peak_usage)
+        return result
+
+    def close(self):
+        if self.engine is not None:
+            if self.owns_engine:
+                self.engine.close()
+            self.engine = self.process = None
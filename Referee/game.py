@@ -17,6 +17,7 @@ import sys
 import time
 from collections import Counter
 
+from Referee import rules, tables
 
 
 # Game-specific constants for use in other modules:
@@ -31,7 +32,8 @@ NUM_PLAYERS = 2
 
 def play(players,
          delay=0, logfilename=None, out_function=None, print_state=True,
-         use_debugboard=False, use_colour=False, use_unicode=False):
+         use_debugboard=False, use_colour=False, use_unicode=False,
+         recordfilename=None, opening=()):
     """
     Coordinate a game, return a string describing the result.
 
@@ -47,6 +49,12 @@ def play(players,
         state is also True).
     use_colour -- Use ANSI colour codes for output.
     use_unicode -- Use unicode symbols for output.
+    recordfilename -- If not None, write a binary record of the game (see
+        `Referee.record`) at this path.
+    opening -- Actions to play at the start of the game on the players'
+        behalf (alternating from White), before either player is asked for
+        an action. The players are told of them as usual, through their
+        .update() methods.
     """
     # Configure behaviour of this function depending on parameters:
     out = out_function if out_function else (lambda *_, **__: None) # no-op
@@ -68,43 +76,64 @@ def play(players,
     # Set up a new game and initialise the players (constructing the
     # Player classes including running their .__init__() methods).
     game = Game(logfilename=logfilename, debugboard=use_debugboard,
-                colourboard=use_colour, unicodeboard=use_unicode)
-    out("initialising players", depth=-1)
-    for player, colour in zip(players, COLOURS):
-        # NOTE: `player` here is actually a player wrapper. Your program should
-        # still implement a method called `__init__()`, not one called `init()`.
-        player.init(colour)
-
-    # Display the initial state of the game.
-    out("game start!", depth=-1)
-    display_state(game)
-
-    # Repeat the following until the game ends
-    # (starting with White as the current player, then alternating):
-    curr_player, next_player = players
-    while not game.over():
-        wait()
-        out(f"{curr_player.name}'s turn", depth=-1, clear=True)
-
-        # Ask the current player for their next action (calling their .action()
-        # method).
-        action = curr_player.action()
-
-        # Validate this action (or pass) and apply it to the game if it is
-        # allowed. Display the resulting game state.
-        game.update(curr_player.colour, action)
+                colourboard=use_colour, unicodeboard=use_unicode,
+                recordfilename=recordfilename,
+                playernames=[player.name for player in players])
+    try:
+        out("initialising players", depth=-1)
+        for player, colour in zip(players, COLOURS):
+            # NOTE: `player` here is actually a player wrapper. Your program
+            # should still implement a method called `__init__()`, not one
+            # called `init()`.
+            player.init(colour)
+
+        # Display the initial state of the game.
+        out("game start!", depth=-1)
         display_state(game)
 
-        # Notify both players (including the current player) of the action
-        # (using their .update() methods).
-        for player in players:
-            player.update(curr_player.colour, action)
-
-        # Next player's turn!
-        curr_player, next_player = next_player, curr_player
-
-    # After that loop, the game has ended (one way or another!)
-    return game.end()
+        # Play the opening (if any) on the players' behalf.
+        curr_player, next_player = players
+        for action in opening:
+            if game.over():
+                break
+            out(f"opening action for {curr_player.name}: {action!r}", depth=-1)
+            game.update(curr_player.colour, action)
+            display_state(game)
+            for player in players:
+                player.update(curr_player.colour, action)
+            curr_player, next_player = next_player, curr_player
+
+        # Repeat the following until the game ends
+        # (starting with the player after the opening, then alternating):
+        while not game.over():
+            wait()
+            out(f"{curr_player.name}'s turn", depth=-1, clear=True)
+
+            # Ask the current player for their next action (calling their
+            # .action() method).
+            action = curr_player.action()
+
+            # Validate this action (or pass) and apply it to the game if it is
+            # allowed. Display the resulting game state.
+            cpu_time = getattr(getattr(curr_player, "timer", None), "elapsed",
+                               None)
+            game.update(curr_player.colour, action, cpu_time=cpu_time)
+            display_state(game)
+
+            # Notify both players (including the current player) of the action
+            # (using their .update() methods).
+            for player in players:
+                player.update(curr_player.colour, action)
+
+            # Next player's turn!
+            curr_player, next_player = next_player, curr_player
+
+        # After that loop, the game has ended (one way or another!)
+        return game.end()
+    finally:
+        # If the game broke down before it ended (say, a player raised an
+        # exception or ran out of time), still close its log and record.
+        game.abort()
 
 
 
@@ -118,19 +147,14 @@ _BLACK_START_SQUARES = [(0,7), (1,7),   (3,7), (4,7),   (6,7), (7,7),
 _WHITE_START_SQUARES = [(0,1), (1,1),   (3,1), (4,1),   (6,1), (7,1),
                         (0,0), (1,0),   (3,0), (4,0),   (6,0), (7,0)]
 
-def _NEXT_SQUARES(square, d=1):
-    x, y = square
-    return {        (x,y+d),
-            (x-d,y),        (x+d,y),
-                    (x,y-d)        } & _ALL_SQUARES
-
-def _NEAR_SQUARES(square):
-    x, y = square
-    return {(x-1,y+1),(x,y+1),(x+1,y+1),
-            (x-1,y),          (x+1,y),
-            (x-1,y-1),(x,y-1),(x+1,y-1)} & _ALL_SQUARES
-
-_MAX_TURNS = 250 # per player
+# Zobrist keys for incremental repeated-state detection: one random 64-bit
+# key for each possible (square, signed stack size), and one for whose turn
+# it is. A board's key is the XOR of the keys of its occupied squares.
+# (The keys are generated offline, see `Referee.tables`.)
+_ZOBRIST_TABLE = tables.load("zobrist")
+_ZOBRIST_KEYS = dict(zip(((xy, n) for xy in rules.COORDS
+                          for n in tables.STACK_SIZES), _ZOBRIST_TABLE))
+_ZOBRIST_TURN = _ZOBRIST_TABLE[-1]
  
 
 
@@ -140,18 +164,22 @@ class Game:
     are __init__, update, over, end, and __str__.
     """
     def __init__(self, logfilename=None, debugboard=False, unicodeboard=False,
-            colourboard=False):
+            colourboard=False, recordfilename=None, playernames=("", "")):
         # initialise game board state:
         self.board = Counter({xy: 0 for xy in _ALL_SQUARES})
         for xy in _WHITE_START_SQUARES:
             self.board[xy] = +1
         for xy in _BLACK_START_SQUARES:
             self.board[xy] = -1
+        # and the same board by square index (see `squares`), updated along
+        # with it so that checking and applying an action needs no copy
+        self._squares = list(map(self.board.__getitem__, rules.COORDS))
         # also keep track of some other state variables for win/draw
         # detection (score, number of turns, state history)
         self.score = {'white': 12, 'black': 12}
         self.drawmsg = ""
         self.nturns  = 0
+        self.key     = self._hash_board()
         self.history = Counter({self._snap(): 1})
 
         # when we print the board, should we show coordinates?
@@ -179,16 +207,25 @@ class Game:
             self._log("game", "Start game log at", time.asctime())
         else:
             self._logfile = None
+
+        # and a compact binary record of the game
+        if recordfilename is not None:
+            # (imported here as Referee.record builds on this module)
+            from Referee.record import RecordWriter
+            self._record = RecordWriter(recordfilename, *playernames)
+        else:
+            self._record = None
         
-    def update(self, colour, action):
+    def update(self, colour, action, cpu_time=None):
         """
         Submit an action to the game for validation and application.
         If the action is not allowed, raise an InvalidActionException with
         a message describing allowed actions.
-        Otherwise, apply the action to the game state.
+        Otherwise, apply the action to the game state (recording the CPU time
+        taken to choose it, if known, in the game record).
         """
-        available_actions = self._available_actions(colour)
-        if action not in available_actions:
+        if not self._action_available(colour, action):
+            available_actions = self._available_actions(colour)
             result = f"illegal action detected ({colour}): {action!r}."
             self._log("error", result)
             # NOTE: The game instance _could_ potentially be recovered, but:
@@ -200,47 +237,58 @@ class Game:
                 "not available. See specification and game rules for details, "
                 "or consider currently available actions:\n"
                 f"* {available_actions_list_str}")
-        # otherwise, apply the action
-        atype, *aargs = action
-        if atype == "MOVE":
-            n, a, b = aargs
-            n = -n if self.board[a] < 0 else n
-            self.board[a] -= n
-            self.board[b] += n
-        else: # atype == "BOOM":
-            start_square, = aargs
-            to_boom = [start_square]
-            for boom_square in to_boom:
-                n = self.board[boom_square]
-                self.score["white" if n > 0 else "black"] -= abs(n)
-                self.board[boom_square] = 0
-                for near_square in _NEAR_SQUARES(boom_square):
-                    if self.board[near_square] != 0:
-                        to_boom.append(near_square)
+        # otherwise, apply the action (only booms remove tokens)
+        for i, n in rules.changes(self._squares, action):
+            square = rules.COORDS[i]
+            old = self.board[square]
+            if action[0] == "BOOM":
+                self.score["white" if old > 0 else "black"] -= abs(old)
+            self._xor_square(square)
+            self.board[square] = n
+            self._squares[i] = n
+            self._xor_square(square)
         self._log(colour, _FORMAT_ACTION(action))
+        if self._record is not None:
+            self._record.write_ply(action, cpu_time)
         self._turn_detect_draw()
         # TODO: return a sanitised version of the action?
 
+    def set_board(self, board):
+        """
+        Replace the board with another (a mapping from (x, y) squares to
+        signed stack sizes), recounting the score and recomputing the key.
+        The turn count and state history are left as they are.
+        """
+        self.board = Counter({xy: 0 for xy in _ALL_SQUARES})
+        self.board.update(board)
+        self._squares = list(map(self.board.__getitem__, rules.COORDS))
+        self.score = {
+            "white": sum(n for n in self._squares if n > 0),
+            "black": sum(-n for n in self._squares if n < 0),
+        }
+        self.key = self._hash_board()
+
+    def squares(self):
+        """
+        The board as a list of signed stack sizes by square index, as used
+        by `Referee.rules`
+        """
+        return list(self._squares)
+
+    def _action_available(self, colour, action):
+        """
+        Check whether an action is available to a particular player by
+        inspecting the board directly (without listing every available
+        action). Equivalent to `action in self._available_actions(colour)`.
+        """
+        return rules.is_legal(self._squares, rules.SIGNS[colour], action)
+
     def _available_actions(self, colour):
         """
         A list of currently-available actions for a particular player
         (assists validation).
         """
-        available_actions = []
-        if colour == "white":
-            stacks = +self.board
-        else:
-            stacks = -self.board
-        for square in stacks.keys():
-            available_actions.append(("BOOM", square))
-        for square, n in stacks.items():
-            for d in range(1, n+1):
-                for next_square in _NEXT_SQUARES(square, d):
-                    if next_square in stacks or self.board[next_square] == 0:
-                        for m in range(1, n+1):
-                            move_action = ("MOVE", m, square, next_square)
-                            available_actions.append(move_action)
-        return available_actions
+        return rules.actions(self._squares, rules.SIGNS[colour])
 
     def _turn_detect_draw(self):
         """
@@ -248,33 +296,50 @@ class Game:
         detect repeated game states.
         """
         self.nturns += 1
-        if self.nturns >= _MAX_TURNS * 2:
+        if self.nturns >= rules.MAX_TURNS * 2:
             self.drawmsg = "maximum number of turns reached."
         
         state = self._snap()
         self.history[state] += 1
-        if self.history[state] >= 4:
+        if self.history[state] >= rules.REPETITIONS:
             self.drawmsg = "game state occurred 4 times."
 
     def _snap(self):
         """
-        Capture the current board state in a hashable way
+        Capture the current board state as an integer key
         (for repeated-state checking)
         """
-        return (
-            # same colour tokens in the same positions
-            tuple((sq,n) for sq,n in self.board.items() if n),
-            # on the same player's turn
-            self.nturns % 2,
-        )
+        # same colour tokens in the same positions, on the same player's turn
+        return self.key ^ (_ZOBRIST_TURN if self.nturns % 2 else 0)
+
+    def _hash_board(self):
+        """
+        Compute the Zobrist key of the current board from scratch
+        (after this, `update` keeps `self.key` up to date incrementally)
+        """
+        key = 0
+        for sq, n in self.board.items():
+            if n:
+                key ^= _ZOBRIST_KEYS[sq, n]
+        return key
+
+    def _xor_square(self, square):
+        """Toggle a square's current contents in or out of the key"""
+        n = self.board[square]
+        if n:
+            self.key ^= _ZOBRIST_KEYS[square, n]
 
 
     def over(self):
         """True iff the game over (draw or win detected)."""
-        win_detected  = min(self.score.values()) == 0
+        win_detected  = self._result() is not None
         draw_detected = self.drawmsg != ""
         return win_detected or draw_detected
 
+    def _result(self):
+        """The result by the tokens left (see `Referee.rules.result`)"""
+        return rules.result(self.score["white"], self.score["black"])
+
     def end(self):
         """
         Conclude the game, extracting a string describing result (win or draw)
@@ -284,20 +349,29 @@ class Game:
         """
         if self.over():
             # possible reasons draw was detected:
+            outcome = self._result()
             # no tokens remaining (draw)
-            if max(self.score.values()) == 0:
+            if outcome == "draw":
                 result = "draw detected: no tokens remaining"
             # one player's tokens remaining (win)
-            elif min(self.score.values()) == 0:
-                winner = max(self.score.keys(), key=self.score.get)
-                result = "winner: " + winner
+            elif outcome is not None:
+                result = "winner: " + outcome
             # technical draw detected (draw)
             else:
+                outcome = "draw"
                 result = f"draw detected: {self.drawmsg}"
             self._log("over", result)
-            self._end_log()
+            self._end_log(outcome)
             return result
 
+    def abort(self):
+        """
+        Close the logfile and record if the game has not been concluded
+        with `end`, marking the record's result "aborted". Otherwise this is
+        a no-op.
+        """
+        self._end_log("aborted")
+
     def __str__(self):
         """Create and return a representation of board for printing."""
         coords = [(x,7-y) for y in range(8) for x in range(8)] # template order
@@ -317,10 +391,13 @@ class Game:
         """Helper method to add a message to the logfile"""
         if self._logfile is not None:
             print(f"[{header:5s}] -", *messages, file=self._logfile, flush=True)
-    def _end_log(self):
+    def _end_log(self, outcome="aborted"):
         if self._logfile is not None:
             self._logfile.close()
             self._logfile = None
+        if self._record is not None:
+            self._record.close(outcome)
+            self._record = None
 
 
 
@@ -0,0 +1,349 @@
+"""
+Run each Player class in a process of its own.
+
+`ProcessPlayerWrapper` has the same interface as `PlayerWrapper`, but the
+real Player lives in a child process and the wrapper exchanges method calls
+and results with it over a pipe. This way:
+
+* each player's CPU time and memory are measured in its own process, and
+  limited separately (the space limit is not shared);
+* a player may use CPU (e.g. pondering in a thread) while the other player
+  is moving; all CPU time used by the child process is charged, except for
+  the garbage collections the wrapper runs on the player's behalf;
+* a player that crashes, runs out of memory or stops responding only takes
+  its own process down, raising an exception in the referee's process.
+
+Optionally, the wrapper also mirrors the board into a shared memory block
+(`SharedBoard`) that the player can read at any time, by defining an
+`attach_board(board)` method that is called after the Player is constructed.
+
+When the wrapper is closed, the player's process calls the Player's optional
+`close()` method before it exits.
+
+A player given a profile (see `Referee.profiling`) is profiled in its own
+process, which writes the profile out when the wrapper is closed.
+"""
+
+import os
+import gc
+import sys
+import time
+import struct
+import traceback
+import multiprocessing
+from collections import Counter
+from multiprocessing import shared_memory
+
+from Referee.player import PlayerWrapper, ResourceLimitException, \
+    _MemoryWatcher, _load_player_class, set_space_line
+from Referee.game import _WHITE_START_SQUARES, _BLACK_START_SQUARES
+from Referee.profiling import PlayerProfile
+from Referee.position import from_board, to_board, board_part
+
+# extra wall-clock seconds to wait for an answer beyond a player's remaining
+# CPU time before treating the player as unresponsive
+HANG_GRACE = 10.0
+
+class PlayerProcessError(Exception):
+    """For when a player's process raises an exception or dies."""
+
+class ProcessPlayerWrapper(PlayerWrapper):
+    """
+    A PlayerWrapper running the real Player in a child process (see the
+    module documentation). Call `.close()` once the game is over to stop the
+    process and release the shared board.
+    """
+    shared_space = False
+
+    def __init__(self, name, player_loc, time_limit=None, space_limit=None,
+            logfn=None, accounting="strict", telemetry=None, profile=None,
+            share_board=False, quiet=False):
+        self.share_board = share_board
+        self.quiet = quiet
+        self.process = self.conn = self.board = None
+        self._stats = None
+        super().__init__(name, player_loc, time_limit=time_limit,
+            space_limit=space_limit, logfn=logfn, accounting=accounting,
+            telemetry=telemetry, profile=profile)
+
+    def _load(self, player_loc):
+        if self.share_board:
+            self.board = SharedBoard()
+        # spawn (rather than fork) so the child's memory use is its own
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_player_process,
+            args=(child_conn, player_loc, self.timer.gc_interval,
+                self.space.fast, self.board and self.board.name, self.quiet,
+                self.profile and self.profile.spec()),
+            daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.player_cls = self._receive(None)
+
+    def init(self, colour):
+        self.colour = colour
+        self.name += f' ({colour})'
+        self.log(f"initialising {self.colour} player as a {self.player_cls} "
+            f"(in process {self.process.pid})")
+        with self._call("init"):
+            self._request("init", colour)
+        self.log(self.timer.status(), depth=1)
+        self.log(self.space.status(), depth=1)
+
+    def action(self):
+        self.log(f"asking {self.name} for next action...")
+        with self._call("action") as call:
+            action = self._request("action")
+            call["action"] = action
+        self.log(f"{self.name} returned action: {action!r}", depth=1)
+        self.log(self.timer.status(), depth=1)
+        self.log(self.space.status(), depth=1)
+        return action
+
+    def update(self, colour, action):
+        self.log(f"updating {self.name} with {colour}'s action {action}...")
+        if self.board is not None:
+            self.board.apply(action)
+        with self._call("update") as call:
+            call["action"] = action
+            self._request("update", colour, action)
+        self.log(self.timer.status(), depth=1)
+        self.log(self.space.status(), depth=1)
+
+    def _call(self, method):
+        # limits are enforced as results come back from the child (see
+        # `_charge`); just record the call
+        return _RecordedCall(self, method)
+
+    def _request(self, *message):
+        try:
+            self.conn.send(message)
+        except (BrokenPipeError, ConnectionResetError, EOFError):
+            raise self._died()
+        timeout = None
+        if self.timer.limit:
+            timeout = max(0, self.timer.limit - self.timer.clock) + HANG_GRACE
+        return self._receive(timeout)
+
+    def _receive(self, timeout):
+        if not self.conn.poll(timeout):
+            self.close()
+            raise ResourceLimitException(f"{self.name} exceeded available "
+                "time (stopped responding)")
+        try:
+            reply = self.conn.recv()
+        except (EOFError, ConnectionResetError):
+            raise self._died()
+        if reply[0] == "error":
+            self.close()
+            raise PlayerProcessError(f"{self.name} raised an exception:\n"
+                f"{reply[1]}")
+        if reply[0] == "ready":
+            return reply[1]
+        _, result, cpu_total, curr_usage, peak_usage, self._stats = reply
+        self._charge(cpu_total, curr_usage, peak_usage)
+        return result
+
+    def _died(self):
+        self.process.join(1)
+        exitcode = self.process.exitcode
+        self.close()
+        return PlayerProcessError(f"{self.name}'s process exited "
+            f"unexpectedly (exit code {exitcode})")
+
+    def _charge(self, cpu_total, curr_usage, peak_usage):
+        """
+        Account for the resources the child reports having used, and enforce
+        this player's limits
+        """
+        self.timer.elapsed = cpu_total - self.timer.clock
+        self.timer.clock = cpu_total
+        self.timer._set_status(f"time:  +{self.timer.elapsed:6.3f}s  (just "
+            f"elapsed)  {self.timer.clock:7.3f}s  (game total)")
+        self.space.curr_usage, self.space.peak_usage = curr_usage, peak_usage
+        self.space._set_status(f"space: {curr_usage:7.3f}MB (current usage) "
+            f"{peak_usage:7.3f}MB (max usage) (own process)")
+        if self.timer.limit and self.timer.clock > self.timer.limit:
+            raise ResourceLimitException(f"{self.name} exceeded available "
+                "time")
+        if self.space.limit and peak_usage > self.space.limit:
+            raise ResourceLimitException(f"{self.name} exceeded available "
+                "space")
+
+    def close(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                try:
+                    self.conn.send(("quit",))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                # (give the child time to write its profile, if any)
+                self.process.join(HANG_GRACE if self.profile else 1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            self.conn.close()
+            self.process = None
+        if self.board is not None:
+            self.board.close(unlink=True)
+            self.board = None
+
+class _RecordedCall:
+    """Context manager recording a call to a player in its own process."""
+    def __init__(self, wrapper, method):
+        self.wrapper = wrapper
+        self.method = method
+        self.call = {"action": None}
+    def __enter__(self):
+        self.wrapper._stats = None
+        return self.call
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.wrapper.telemetry is not None:
+            self.wrapper._record(self.method, self.call["action"],
+                self.wrapper._stats)
+
+
+def _player_process(conn, player_loc, gc_interval, fast, board_name, quiet,
+        profile_spec):
+    """
+    Main loop of a player's process: construct the Player and answer method
+    calls until told to quit, reporting the resources used after each (and
+    profiling them if given a profile specification).
+    """
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    try:
+        Player = _load_player_class(*player_loc)
+    except BaseException:
+        conn.send(("error", traceback.format_exc()))
+        return
+    board = SharedBoard(board_name) if board_name is not None else None
+    profile = PlayerProfile(*profile_spec) if profile_spec else None
+    invoke = profile.call if profile else (lambda method, *args:
+        method(*args))
+    # measure space from here, after the player's imports
+    set_space_line()
+    space = _MemoryWatcher(None, fast=fast)
+    # charge all CPU time from here, except for garbage collection
+    start = time.process_time()
+    offclock = 0.0
+    ncalls = 0
+    player = None
+    conn.send(("ready", str(Player).strip('<class >')))
+
+    while True:
+        try:
+            method, *args = conn.recv()
+        except EOFError:
+            break
+        if method == "quit":
+            break
+        ncalls += 1
+        if ncalls % gc_interval == 0:
+            gc_start = time.process_time()
+            gc.collect()
+            offclock += time.process_time() - gc_start
+        try:
+            with space:
+                if method == "init":
+                    player = invoke(Player, *args)
+                    if board is not None and hasattr(player, "attach_board"):
+                        player.attach_board(board)
+                    result = None
+                elif method == "action":
+                    result = invoke(player.action)
+                else: # method == "update"
+                    result = invoke(player.update, *args)
+        except BaseException:
+            conn.send(("error", traceback.format_exc()))
+            break
+        # (collected before reading the clock: they are the player's work)
+        stats = None
+        if method == "action" and hasattr(player, "stats"):
+            stats = player.stats()
+        cpu_total = time.process_time() - start - offclock
+        conn.send(("ok", result, cpu_total, space.curr_usage,
+            space.peak_usage, stats))
+    if player is not None and hasattr(player, "close"):
+        try:
+            player.close()
+        except BaseException:
+            traceback.print_exc()
+    if profile is not None:
+        profile.write()
+    if board is not None:
+        board.close()
+
+
+# SHARED BOARD
+
+class SharedBoard:
+    """
+    A copy of the board in a block of shared memory, written by the referee
+    after every action and readable by a player's process at any time.
+
+    Layout: a sequence number (u32) then the 64 board bytes of the position's
+    key (see `Referee.position`). The sequence number is odd while the board
+    is being written, and counts up by two for each action applied.
+    """
+    SIZE = 4 + 64
+
+    def __init__(self, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.SIZE)
+            self.board = Counter()
+            for xy in _WHITE_START_SQUARES:
+                self.board[xy] = +1
+            for xy in _BLACK_START_SQUARES:
+                self.board[xy] = -1
+            self.shm.buf[4:self.SIZE] = self._squares()
+        else:
+            # (player processes share the referee's resource tracker, which
+            # unlinks the block if the referee dies without closing it)
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.board = None
+        self.name = self.shm.name
+
+    def apply(self, action):
+        """Apply an (already validated) action and publish the result"""
+        from Referee.record import apply_code, encode_action
+        apply_code(self.board, encode_action(action))
+        self._write()
+
+    def _write(self):
+        buf = self.shm.buf
+        seq, = struct.unpack_from("<I", buf, 0)
+        struct.pack_into("<I", buf, 0, seq + 1)
+        buf[4:self.SIZE] = self._squares()
+        struct.pack_into("<I", buf, 0, seq + 2)
+
+    def _squares(self):
+        return board_part(from_board(self.board))
+
+    def read_key(self):
+        """
+        Return a consistent snapshot of the board as (number of actions
+        applied, position key with the colour to move)
+        """
+        buf = self.shm.buf
+        while True:
+            seq, = struct.unpack_from("<I", buf, 0)
+            squares = bytes(buf[4:self.SIZE])
+            if seq % 2 == 0 and struct.unpack_from("<I", buf, 0)[0] == seq:
+                break
+        plies = seq // 2
+        return plies, squares + bytes((plies % 2,))
+
+    def read(self):
+        """
+        Return a consistent snapshot of the board as (number of actions
+        applied, dict of occupied squares to signed stack sizes)
+        """
+        plies, key = self.read_key()
+        return plies, dict(to_board(key)[0])
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
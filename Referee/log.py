@@ -4,6 +4,7 @@ with uniform formatting accross multiple parts of a program
 """
 
 import sys
+import json
 
 class StarLog:
     def __init__(self, level=1, file=sys.stdout, timefn=None,
@@ -54,3 +55,28 @@ class StarLog:
     def debug(self, *args, **kwargs):
         """Shortcut to log at level 2 (debug)."""
         self.log(*args, level=2, **kwargs)
+
+
+class TelemetryLog:
+    """
+    Write a structured record (a line of JSON) for every call made to a
+    player, for later analysis. One log is shared by the players in a game,
+    which lets it keep track of the turn number.
+    """
+    def __init__(self, file, game=None):
+        self.file = file
+        self.game = game
+        self.turn = 0
+
+    def record(self, player, colour, method, **fields):
+        if method == "action":
+            self.turn += 1
+        record = {"game": self.game, "turn": self.turn, "player": player,
+            "colour": colour, "method": method, **fields}
+        print(json.dumps(record, default=_jsonable), file=self.file)
+
+def _jsonable(obj):
+    """Convert values json can't handle (e.g. NumPy integers)."""
+    if hasattr(obj, "item"):
+        return obj.item()
+    return repr(obj)
@@ -4,7 +4,9 @@ Provide a command-line argument parsing function using argparse
 
 --------------------------------------------------------------------------------
 usage: referee [-h] [-V] [-d [delay]] [-s [space_limit]] [-t [time_limit]]
-               [-D | -v [{0,1,2,3}]] [-l [LOGFILE]] [-c | -C] [-u | -a]
+               [-A {strict,fast}] [-I] [-D | -v [{0,1,2,3}]] [-l [LOGFILE]]
+               [-T TELEMETRY] [-R RECORD] [-P PROFILE_DIR]
+               [--profile-mode {sample,cprofile}] [-c | -C] [-u | -a]
                white black
 
 conducts a game of Expendibots between 2 Player classes.
@@ -27,6 +29,10 @@ player package/class specifications (positional arguments):
   class with some other name you can put the alternative class name after a ':'
   (e.g. 'your_team_name:DifferentPlayer').
 
+  Alternatively, 'engine=COMMAND' plays with an engine process started by running
+  COMMAND, which speaks the text protocol described in `Referee.engine` (e.g.
+  'engine=python -m Src.engine').
+
   white                 location of White's Player class (e.g. package name)
   black                 location of Black's Player class (e.g. package name)
 
@@ -40,18 +46,41 @@ optional arguments:
                         limit on memory space (float, MB) for each player.
   -t [time_limit], --time [time_limit]
                         limit on CPU time (float, seconds) for each player.
+  -A {strict,fast}, --accounting {strict,fast}
+                        how carefully to account for resources. strict:
+                        (default) collect garbage before every player call;
+                        fast: collect garbage only occasionally (for bulk
+                        testing).
+  -I, --isolate         run each player in a process of its own (see
+                        `Referee.isolation`), with its own space limit.
   -D, --debug           switch to printing the debug board (with coordinates)
                         (equivalent to -v or -v3).
   -v [{0,1,2,3}], --verbosity [{0,1,2,3}]
                         control the level of output (not including output from
                         players). 0: no output except result; 1: commentary,
-                        but no board display; 2: (default) commentary and board
-                        display; 3: (equivalent to -D) larger board showing
-                        coordinates.
+                        but no board display; 2: (default) commentary and
+                        board display; 3: (equivalent to -D) larger board
+                        showing coordinates.
   -l [LOGFILE], --logfile [LOGFILE]
-                        if you supply this flag the referee will create a log of
-                        all game actions in a text file named LOGFILE (default:
-                        game.log).
+                        if you supply this flag the referee will create a log
+                        of all game actions in a text file named LOGFILE
+                        (default: game.log).
+  -T TELEMETRY, --telemetry TELEMETRY
+                        write a JSON record of the resources used by each call
+                        to a player (and any search statistics it reports) to
+                        a file named TELEMETRY.
+  -R RECORD, --record RECORD
+                        write a compact binary record of the game to a file
+                        named RECORD (replay it with `python -m
+                        Referee.record`).
+  -P PROFILE_DIR, --profile PROFILE_DIR
+                        profile every call to each player (not engines),
+                        writing player1 and player2 profiles to the directory
+                        PROFILE_DIR (see `Referee.profiling`).
+  --profile-mode {sample,cprofile}
+                        sample: (default) sample the players' stacks, for
+                        flame graphs; cprofile: profile every function call
+                        with cProfile.
   -c, --colour          force colour display using ANSI control sequences
                         (default behaviour is automatic based on system).
   -C, --colourless      force NO colour display (see -c).
@@ -65,6 +94,9 @@ optional arguments:
 import sys
 import argparse
 from Referee.game import GAME_NAME, COLOURS, NUM_PLAYERS
+from Referee.player import ACCOUNTING_MODES
+from Referee.engine import ENGINE_PREFIX
+from Referee.profiling import PROFILE_MODES
 
 # Program information:
 PROGRAM = "referee"
@@ -91,6 +123,7 @@ SPACE_LIMIT_DEFAULT = 0     # signifying no limit
 SPACE_LIMIT_NOVALUE = 100.0 # MB (each)
 TIME_LIMIT_DEFAULT  = 0     # signifying no limit
 TIME_LIMIT_NOVALUE  = 60.0  # seconds (each)
+ACCOUNTING_DEFAULT  = "strict"
 
 VERBOSITY_LEVELS  = 4
 VERBOSITY_DEFAULT = 2 # normal level, normal board
@@ -115,6 +148,10 @@ Either way, the referee will attempt to import the specified package/module
 and then load a class named 'Player'. If you want the referee to look for a
 class with some other name you can put the alternative class name after a ':'
 (e.g. 'your_team_name:DifferentPlayer').
+
+Alternatively, 'engine=COMMAND' plays with an engine process started by running
+COMMAND, which speaks the text protocol described in `Referee.engine` (e.g.
+'engine=python -m Src.engine').
 """.format(NUM_PLAYERS)
 
 def get_options():
@@ -158,6 +195,15 @@ def get_options():
         type=float, nargs="?",
         default=TIME_LIMIT_DEFAULT, const=TIME_LIMIT_NOVALUE,
         help="limit on CPU time (float, seconds) for each player.")
+    optionals.add_argument('-A', '--accounting',
+        choices=ACCOUNTING_MODES, default=ACCOUNTING_DEFAULT,
+        help="how carefully to account for resources. strict: (default) "
+            "collect garbage before every player call; fast: collect "
+            "garbage only occasionally (for bulk testing).")
+    optionals.add_argument('-I', '--isolate',
+        action="store_true",
+        help="run each player in a process of its own (see "
+            "`Referee.isolation`), with its own space limit.")
 
     verbosity_group = optionals.add_mutually_exclusive_group()
     verbosity_group.add_argument('-D', '--debug',
@@ -178,6 +224,27 @@ def get_options():
         help="if you supply this flag the referee will create a log of all "
         "game actions in a text file named %(metavar)s (default: %(const)s).")
 
+    optionals.add_argument('-T', '--telemetry',
+        type=str, default=None, metavar="TELEMETRY",
+        help="write a JSON record of the resources used by each call to a "
+        "player (and any search statistics it reports) to a file named "
+        "%(metavar)s.")
+
+    optionals.add_argument('-R', '--record',
+        type=str, default=None, metavar="RECORD",
+        help="write a compact binary record of the game to a file named "
+        "%(metavar)s (replay it with `python -m Referee.record`).")
+
+    optionals.add_argument('-P', '--profile',
+        type=str, default=None, metavar="PROFILE_DIR",
+        help="profile every call to each player (not engines), writing "
+        "player1 and player2 profiles to the directory %(metavar)s (see "
+        "`Referee.profiling`).")
+    optionals.add_argument('--profile-mode',
+        choices=PROFILE_MODES, default=PROFILE_MODES[0],
+        help="sample: (default) sample the players' stacks, for flame "
+        "graphs; cprofile: profile every function call with cProfile.")
+
     colour_group = optionals.add_mutually_exclusive_group()
     colour_group.add_argument('-c', '--colour',
         action="store_true",
@@ -227,19 +294,34 @@ def get_options():
 
 class PackageSpecAction(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
-        pkg_spec = values
-
-        # detect alternative class:
-        if ":" in pkg_spec:
-            pkg, cls = pkg_spec.split(':', maxsplit=1)
+        # a list of specifications (nargs='+') is converted item by item
+        if isinstance(values, list):
+            result = [parse_package_spec(pkg_spec) for pkg_spec in values]
         else:
-            pkg = pkg_spec
-            cls = "Player"
+            result = parse_package_spec(values)
+
+        # save the result in the arguments namespace
+        setattr(namespace, self.dest, result)
+
+def parse_package_spec(pkg_spec):
+    """
+    Convert a package specification into a (module name, class name) tuple
+    (or, for an engine specification, into (ENGINE_PREFIX, command); see
+    `Referee.engine`).
+    """
+    if pkg_spec.startswith(ENGINE_PREFIX):
+        return (ENGINE_PREFIX, pkg_spec[len(ENGINE_PREFIX):])
+
+    # detect alternative class:
+    if ":" in pkg_spec:
+        pkg, cls = pkg_spec.split(':', maxsplit=1)
+    else:
+        pkg = pkg_spec
+        cls = "Player"
 
-        # try to convert path to module name
-        mod = pkg.strip("/\\").replace("/", ".").replace("\\", ".")
-        if mod.endswith(".py"): # NOTE: Assumes submodule is not named `py`.
-            mod = mod[:-3]
+    # try to convert path to module name
+    mod = pkg.strip("/\\").replace("/", ".").replace("\\", ".")
+    if mod.endswith(".py"): # NOTE: Assumes submodule is not named `py`.
+        mod = mod[:-3]
 
-        # save the result in the arguments namespace as a tuple
-        setattr(namespace, self.dest, (mod, cls))
+    return (mod, cls)
@@ -5,8 +5,11 @@ being executed, etc.
 """
 
 import gc
+import os
+import re
 import time
 import importlib
+import contextlib
 
 from Referee.game import NUM_PLAYERS
 
@@ -18,39 +21,75 @@ class PlayerWrapper:
     * `.action()` and `.update()` methods just delegate to the real Player's
       methods of the same name.
     Each method enforces resource limits on the real Player's computation.
+
+    With accounting="fast", the wrapper collects garbage only every
+    `GC_INTERVAL` calls (or every call once memory use nears the limit)
+    and reads memory usage more cheaply, for bulk testing. CPU time is
+    charged in the same way in both modes.
+
+    If given a `telemetry` log (see `Referee.log.TelemetryLog`), the wrapper
+    records the resources used by every call, along with any statistics the
+    player reports through an optional `.stats()` method after each action
+    (charged to the player's clock, like the action itself).
+
+    If given a `profile` (see `Referee.profiling.PlayerProfile`), the wrapper
+    profiles every call to the real player, and writes the profile out on
+    `.close()`.
+
+    `.close()` also calls the real player's optional `.close()` method, for
+    a player holding resources that outlive the game (such as shared memory
+    or helper processes) to release them.
+
+    (See `Referee.isolation.ProcessPlayerWrapper` for a wrapper that runs the
+    Player in a process of its own.)
     """
+    # whether players share the space limit (they run in the same process)
+    shared_space = True
+
     def __init__(self, name, player_loc, time_limit=None, space_limit=None,
-            logfn=None):
+            logfn=None, accounting="strict", telemetry=None, profile=None):
         self.log = logfn if logfn else (lambda *_, **__: None) # no-op
         self.name = name
+        self.colour = None
+        self.telemetry = telemetry
+        self.profile = profile
+        if accounting not in ACCOUNTING_MODES:
+            raise ValueError(f"unknown accounting mode {accounting!r}")
+        fast = (accounting == "fast")
         
         # create some context managers for resource limiting
-        self.timer = _CountdownTimer(time_limit, self.name)
-        if space_limit is not None: space_limit *= NUM_PLAYERS
-        self.space = _MemoryWatcher(space_limit)
+        self.timer = _CountdownTimer(time_limit, self.name,
+            gc_interval=(GC_INTERVAL if fast else 1))
+        if space_limit is not None and self.shared_space:
+            space_limit *= NUM_PLAYERS
+        self.space = _MemoryWatcher(space_limit, fast=fast)
         
         # import the Player class from given package
         player_pkg, player_cls = player_loc
         self.log(f"importing {self.name}'s player class '{player_cls}' "
             f"from package '{player_pkg}'")
-        self.Player = _load_player_class(player_pkg, player_cls)
+        self._load(player_loc)
+
+    def _load(self, player_loc):
+        self.Player = _load_player_class(*player_loc)
 
     def init(self, colour):
         self.colour = colour
         self.name += f' ({colour})'
         player_cls = str(self.Player).strip('<class >')
         self.log(f"initialising {self.colour} player as a {player_cls}")
-        with self.space, self.timer:
+        with self._call("init"):
             # construct/initialise the player class
-            self.player = self.Player(colour)
+            self.player = self._invoke(self.Player, colour)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
 
     def action(self):
         self.log(f"asking {self.name} for next action...")
-        with self.space, self.timer:
+        with self._call("action") as call:
             # ask the real player
-            action = self.player.action()
+            action = self._invoke(self.player.action)
+            call["action"] = action
         self.log(f"{self.name} returned action: {action!r}", depth=1)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
@@ -59,12 +98,58 @@ class PlayerWrapper:
 
     def update(self, colour, action):
         self.log(f"updating {self.name} with {colour}'s action {action}...")
-        with self.space, self.timer:
+        with self._call("update") as call:
             # forward to the real player
-            self.player.update(colour, action)
+            call["action"] = action
+            self._invoke(self.player.update, colour, action)
         self.log(self.timer.status(), depth=1)
         self.log(self.space.status(), depth=1)
 
+    @contextlib.contextmanager
+    def _call(self, method):
+        """
+        Enforce resource limits on a call to the real player, recording
+        its resource use to the telemetry log (even if a limit is exceeded)
+        """
+        call = {"action": None}
+        stats = None
+        try:
+            with self.space, self.timer:
+                yield call
+                # (on the clock: the player's statistics are its own work)
+                if (self.telemetry is not None and method == "action"
+                        and hasattr(self.player, "stats")):
+                    stats = self.player.stats()
+        finally:
+            if self.telemetry is not None:
+                self._record(method, call["action"], stats)
+
+    def _invoke(self, method, *args):
+        """Call a method of the real player (under the profiler, if any)"""
+        if self.profile is None:
+            return method(*args)
+        return self.profile.call(method, *args)
+
+    def _record(self, method, action, stats):
+        """Write a call's resource use to the telemetry log"""
+        self.telemetry.record(self.name, self.colour, method,
+            cpu=self.timer.elapsed, cpu_total=self.timer.clock,
+            memory=self.space.curr_usage, peak_memory=self.space.peak_usage,
+            action=action, stats=stats)
+
+    def close(self):
+        """
+        Release any resources held for the player (and by it, see above);
+        write its profile
+        """
+        player = getattr(self, "player", None)
+        if player is not None and hasattr(player, "close"):
+            self.player = None
+            player.close()
+        if self.profile is not None:
+            self.profile.write()
+            self.profile = None
+
 def _load_player_class(package_name, class_name):
     """
     Load a Player class given the name of a package.
@@ -76,6 +161,10 @@ def _load_player_class(package_name, class_name):
 
 # RESOURCE MANAGEMENT
 
+ACCOUNTING_MODES = ("strict", "fast")
+GC_INTERVAL = 50      # calls between garbage collections (fast accounting)
+GC_NEAR_LIMIT = 0.8   # collect every call beyond this fraction of the limit
+
 class ResourceLimitException(Exception):
     """For when players exceed specified time / space limits."""
 
@@ -87,8 +176,10 @@ class _CountdownTimer:
     * measures CPU time, not wall-clock time
     * unless time_limit is 0, throws an exception upon exiting the context after
       the allocated time has passed
+    * collects garbage (off the clock) on entering every `gc_interval`th
+      context
     """
-    def __init__(self, time_limit, name):
+    def __init__(self, time_limit, name, gc_interval=1):
         """
         Create a new countdown timer with time limit `limit`, in seconds
         (0 for unlimited time)
@@ -96,6 +187,9 @@ class _CountdownTimer:
         self.name  = name
         self.limit = time_limit
         self.clock = 0
+        self.elapsed = 0
+        self.gc_interval = gc_interval
+        self.ncalls = 0
         self._status = ""
     def _set_status(self, status):
         self._status = status
@@ -104,7 +198,9 @@ class _CountdownTimer:
     
     def __enter__(self):
         # clean up memory off the clock
-        gc.collect()
+        self.ncalls += 1
+        if self.ncalls % self.gc_interval == 0:
+            gc.collect()
         # then start timing
         self.start = time.process_time()
         return self # unused
@@ -112,6 +208,7 @@ class _CountdownTimer:
     def __exit__(self, exc_type, exc_val, exc_tb):
         # accumulate elapsed time since __enter__
         elapsed = time.process_time() - self.start
+        self.elapsed = elapsed
         self.clock += elapsed
         self._set_status(f"time:  +{elapsed:6.3f}s  (just elapsed)  "
             f"{self.clock:7.3f}s  (game total)")
@@ -128,9 +225,15 @@ class _MemoryWatcher:
     * works by parsing procfs; only available on linux.
     * unless the limit is set to 0, throws an exception upon exiting the
       context if the memory limit has been breached
+    * in fast mode, reads the same procfs fields from a file descriptor kept
+      open between contexts (so verdicts match), and collects garbage on
+      entering the context only once usage is close to the limit
     """
-    def __init__(self, space_limit):
+    def __init__(self, space_limit, fast=False):
         self.limit = space_limit
+        self.fast = fast
+        self.curr_usage = 0
+        self.peak_usage = 0
         self._status = ""
     def _set_status(self, status):
         self._status = status
@@ -138,6 +241,10 @@ class _MemoryWatcher:
         return self._status
     
     def __enter__(self):
+        # near the limit, don't let uncollected garbage decide the verdict
+        if (self.fast and self.limit
+                and self.peak_usage > GC_NEAR_LIMIT * self.limit):
+            gc.collect()
         return self # unused
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
@@ -145,18 +252,23 @@ class _MemoryWatcher:
         stats and ensuring that peak usage is not exceeding limits
         """
         if _SPACE_ENABLED:
-            curr_usage, peak_usage = _get_space_usage()
+            if self.fast:
+                curr_usage, peak_usage = _get_space_usage_fast()
+            else:
+                curr_usage, peak_usage = _get_space_usage()
     
             # adjust measurements to reflect usage of players and referee, not
             # the Python interpreter itself
             curr_usage -= _DEFAULT_MEM_USAGE
             peak_usage -= _DEFAULT_MEM_USAGE
+            self.curr_usage, self.peak_usage = curr_usage, peak_usage
 
             self._set_status(f"space: {curr_usage:7.3f}MB (current usage) "
                 f"{peak_usage:7.3f}MB (max usage) (shared)")
 
             # if we are limited, let's hope we are not out of space!
-            if self.limit is not None and peak_usage > self.limit:
+            if (self.limit is not None and self.limit > 0
+                    and peak_usage > self.limit):
                 raise ResourceLimitException("players exceeded shared space "
                     "limit")
 
@@ -174,6 +286,27 @@ def _get_space_usage():
                 peak_usage = int(line.split()[1]) / 1024 # kB -> MB
     return curr_usage, peak_usage
 
+_STATUS_FD = None
+_STATUS_PID = None
+_VMSIZE_RE = re.compile(rb"VmSize:\s+(\d+)")
+_VMPEAK_RE = re.compile(rb"VmPeak:\s+(\d+)")
+def _get_space_usage_fast():
+    """
+    As for `_get_space_usage`, but keeping /proc/self/status open and reading
+    it in a single system call
+    """
+    global _STATUS_FD, _STATUS_PID
+    # /proc/self is resolved on opening, so reopen it in forked processes
+    if _STATUS_PID != os.getpid():
+        if _STATUS_FD is not None:
+            os.close(_STATUS_FD)
+        _STATUS_FD = os.open("/proc/self/status", os.O_RDONLY)
+        _STATUS_PID = os.getpid()
+    status = os.pread(_STATUS_FD, 4096, 0)
+    curr_usage = int(_VMSIZE_RE.search(status).group(1)) / 1024 # kB -> MB
+    peak_usage = int(_VMPEAK_RE.search(status).group(1)) / 1024 # kB -> MB
+    return curr_usage, peak_usage
+
 _DEFAULT_MEM_USAGE = 0
 _SPACE_ENABLED = False
 def set_space_line():
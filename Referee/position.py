@@ -0,0 +1,158 @@
+"""
+A compact, canonical encoding of positions, shared by the referee and the
+player as a dictionary key and as a wire format.
+
+A position key is KEY_SIZE bytes:
+
+* 64 bytes of board, one per square (x, y) at index 8x + y, holding the
+  number of tokens stacked there in the low 7 bits, with BLACK_BIT set for a
+  black stack (an empty square is always 0);
+* one byte for the colour to move: 0 for white, 1 for black, or NO_COLOUR
+  if the key is of a board alone.
+
+Equal positions have equal keys, whichever representation they were encoded
+from: the referee's board (a mapping from squares to signed stack sizes,
+positive for white and negative for black), or the player's 8x8x2 array of
+stack sizes and colours (whatever colour it gives empty squares).
+
+A key also has a readable text form, like FEN, without spaces so that it can
+be used as a single token (e.g. in the engine protocol): the rows from y = 7
+down to y = 0, separated by '/', each listing its squares from x = 0 to 7 as
+a letter for each stack ('A' to 'L' for 1 to 12 white tokens, 'a' to 'l' for
+black) and a digit for each run of empty squares; then ':' and the colour to
+move ('w', 'b', or '-'). The starting position is
+
+    aa1aa1aa/aa1aa1aa/8/8/8/8/AA1AA1AA/AA1AA1AA:w
+"""
+
+from collections import Counter
+
+BOARD_SIZE = 8
+SQUARES = BOARD_SIZE * BOARD_SIZE
+KEY_SIZE = SQUARES + 1
+BLACK_BIT = 0x80
+STACK_MASK = BLACK_BIT - 1
+WHITE, BLACK, NO_COLOUR = 0, 1, 0xFF
+COLOUR_NAMES = {"white": WHITE, "black": BLACK, None: NO_COLOUR}
+_TEXT_COLOURS = {WHITE: "w", BLACK: "b", NO_COLOUR: "-"}
+_MAX_STACK = 12
+
+def _colour_byte(colour):
+    """Accept a colour as 0/1 (the player's), a name, or None"""
+    if isinstance(colour, str) or colour is None:
+        return COLOUR_NAMES[colour]
+    return int(colour)
+
+def from_board(board, colour=None):
+    """Encode a referee board (square -> signed stack size)"""
+    squares = bytearray(KEY_SIZE)
+    for (x, y), n in board.items():
+        if n > 0:
+            squares[x * BOARD_SIZE + y] = n
+        elif n < 0:
+            squares[x * BOARD_SIZE + y] = BLACK_BIT | -n
+    squares[SQUARES] = _colour_byte(colour)
+    return bytes(squares)
+
+def to_board(key):
+    """Decode a key into a referee board (a Counter) and colour to move"""
+    board = Counter()
+    for i, byte in enumerate(key[:SQUARES]):
+        if byte:
+            n = byte & STACK_MASK
+            board[divmod(i, BOARD_SIZE)] = -n if byte & BLACK_BIT else n
+    return board, key[SQUARES]
+
+_SQUARE_TABLE = None
+
+def _square_table():
+    """
+    A table from a square of an 8x8x2 int8 state, read as a little-endian
+    u16 (stack size + 256 * colour), to its byte in a key
+    """
+    global _SQUARE_TABLE
+    if _SQUARE_TABLE is None:
+        import numpy as np
+        values = np.arange(1 << 16)
+        stacks, colours = values & 0xFF, values >> 8
+        _SQUARE_TABLE = np.where((stacks > 0) & (stacks <= STACK_MASK),
+            stacks | ((colours & 1) << 7), 0).astype(np.uint8)
+    return _SQUARE_TABLE
+
+_COLOUR_BYTES = {colour: bytes((colour,)) for colour in (WHITE, BLACK,
+    NO_COLOUR)}
+
+def from_state(state, colour=None):
+    """
+    Encode the player's 8x8x2 state (stack sizes in [..., 0], colours in
+    [..., 1])
+    """
+    tail = _COLOUR_BYTES[_colour_byte(colour)]
+    if state.dtype.itemsize == 1 and state.flags.c_contiguous:
+        # (one table lookup per square: the fast path for the search)
+        squares = _square_table().take(state.view("<u2").reshape(SQUARES))
+        return squares.tobytes() + tail
+    stacks = state[..., 0].reshape(SQUARES).astype("i4")
+    colours = state[..., 1].reshape(SQUARES).astype("i4")
+    squares = (stacks | (colours << 7)) * (stacks > 0)
+    return squares.astype("u1").tobytes() + tail
+
+def to_state(key):
+    """Decode a key into the player's 8x8x2 state and colour to move"""
+    import numpy as np
+    squares = np.frombuffer(key, np.uint8, SQUARES)
+    state = np.empty((BOARD_SIZE, BOARD_SIZE, 2), np.int8)
+    state[..., 0] = (squares & STACK_MASK).reshape(BOARD_SIZE, BOARD_SIZE)
+    state[..., 1] = (squares >> 7).reshape(BOARD_SIZE, BOARD_SIZE)
+    return state, key[SQUARES]
+
+def board_part(key):
+    """The board bytes of a key (as kept where the colour is stored apart)"""
+    return key[:SQUARES]
+
+def to_text(key):
+    """The readable form of a key (see the module documentation)"""
+    rows = []
+    for y in reversed(range(BOARD_SIZE)):
+        row, empty = "", 0
+        for x in range(BOARD_SIZE):
+            byte = key[x * BOARD_SIZE + y]
+            if not byte:
+                empty += 1
+                continue
+            if empty:
+                row, empty = row + str(empty), 0
+            base = "a" if byte & BLACK_BIT else "A"
+            row += chr(ord(base) + (byte & STACK_MASK) - 1)
+        rows.append(row + (str(empty) if empty else ""))
+    return "/".join(rows) + ":" + _TEXT_COLOURS[key[SQUARES]]
+
+def from_text(text):
+    """Read the readable form of a key; raise ValueError if malformed"""
+    try:
+        board, colour = text.split(":")
+        rows = board.split("/")
+        colour = {v: k for k, v in _TEXT_COLOURS.items()}[colour]
+    except (ValueError, KeyError):
+        raise ValueError(f"not a position: {text!r}")
+    if len(rows) != BOARD_SIZE:
+        raise ValueError(f"not a position (needs {BOARD_SIZE} rows): "
+            f"{text!r}")
+    squares = bytearray(KEY_SIZE)
+    squares[SQUARES] = colour
+    for y, row in zip(reversed(range(BOARD_SIZE)), rows):
+        x = 0
+        for char in row:
+            if char.isdigit():
+                x += int(char)
+                continue
+            n = ord(char.lower()) - ord("a") + 1
+            if not 1 <= n <= _MAX_STACK or x >= BOARD_SIZE:
+                raise ValueError(f"not a position: {text!r}")
+            squares[x * BOARD_SIZE + y] = n | (BLACK_BIT if char.islower()
+                else 0)
+            x += 1
+        if x != BOARD_SIZE:
+            raise ValueError(f"not a position (row {y} has {x} squares): "
+                f"{text!r}")
+    return bytes(squares)
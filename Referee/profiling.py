@@ -0,0 +1,155 @@
+"""
+Profile the calls the referee makes to a player, to find out where a
+player's time goes in real games.
+
+A `PlayerProfile` given to a `PlayerWrapper` profiles every call to the real
+player's constructor, `.action()` and `.update()` methods, in one of two
+modes:
+
+* sample: (default) a signal-based sampling profiler. A SIGPROF timer fires
+  every `interval` seconds of the process's CPU time, and the player's call
+  stack at that moment (from the method called by the referee down) is
+  counted. The result is written in collapsed-stack format, one line per
+  distinct stack with its number of samples ('a;b;c 12'), as read by flame
+  graph tools (e.g. flamegraph.pl or speedscope). Only works in the main
+  thread, on platforms with SIGPROF.
+* cprofile: a deterministic profile with `cProfile`, written as a pstats
+  file (read it with `python -m pstats FILE`). Much slower.
+
+Either way, the profiler's overhead is charged to the player's clock.
+
+Profiles are aggregated by writing them to the same file again: a profile
+is added to any profile already in its file. `merge_profiles` combines
+profile files written separately (e.g. by the workers of a tournament).
+"""
+
+import os
+import re
+import signal
+import cProfile
+import pstats
+import threading
+from collections import Counter
+
+PROFILE_MODES = ("sample", "cprofile")
+SAMPLE_INTERVAL = 0.001 # seconds of CPU time between samples
+EXTENSIONS = {"sample": ".folded", "cprofile": ".prof"}
+
+class PlayerProfile:
+    """
+    Profile of a player's calls, to be written to `path` (plus an extension
+    for the mode; see `EXTENSIONS`).
+    """
+    def __init__(self, path, mode="sample", interval=SAMPLE_INTERVAL):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"unknown profiling mode {mode!r}")
+        self.path = path + EXTENSIONS[mode]
+        self.mode = mode
+        self.interval = interval
+        self.samples = Counter() # collapsed stack -> number of samples
+        self.stats = {}          # (see `create_stats`)
+        self._cprofile = None
+
+    def spec(self):
+        """Arguments to create a profile like this one (in another process)"""
+        return self.path[:-len(EXTENSIONS[self.mode])], self.mode, \
+            self.interval
+
+    def call(self, function, *args):
+        """Call `function(*args)` under the profiler"""
+        if self.mode == "cprofile":
+            if self._cprofile is None:
+                self._cprofile = cProfile.Profile()
+            return self._cprofile.runcall(function, *args)
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("the sampling profiler only works in the main "
+                "thread")
+        previous = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        try:
+            return function(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, previous)
+
+    def _sample(self, signum, frame):
+        """Count the stack of the interrupted frame, up to `.call()`"""
+        stack = []
+        while frame is not None and frame.f_code is not _CALL_CODE:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        if frame is not None and stack:
+            self.samples[";".join(reversed(stack))] += 1
+
+    def create_stats(self):
+        """
+        Collect cProfile's results into `.stats` (this and `.stats` are what
+        `pstats.Stats` needs to read the profile)
+        """
+        if self._cprofile is not None:
+            self._cprofile.create_stats()
+            self.stats = self._cprofile.stats
+
+    def write(self):
+        """Add this profile to the profile in its file (if any)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.mode == "sample":
+            samples = Counter(self.samples)
+            if os.path.exists(self.path):
+                samples.update(read_folded(self.path))
+            write_folded(samples, self.path)
+        else:
+            self.create_stats()
+            if not self.stats:
+                return
+            stats = pstats.Stats(self)
+            if os.path.exists(self.path):
+                stats.add(self.path)
+            stats.dump_stats(self.path)
+
+_CALL_CODE = PlayerProfile.call.__code__
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+def read_folded(path):
+    """Read a collapsed-stack file into a Counter"""
+    samples = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                samples[stack] += int(count)
+    return samples
+
+def write_folded(samples, path):
+    """Write a Counter of stacks in collapsed-stack format"""
+    with open(path, "w") as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+
+def merge_profiles(paths, path):
+    """
+    Combine profile files of the same mode (recognised by their extension)
+    into one file at `path`, and remove them
+    """
+    if not paths:
+        return
+    if paths[0].endswith(EXTENSIONS["sample"]):
+        samples = Counter()
+        for part in paths:
+            samples.update(read_folded(part))
+        write_folded(samples, path)
+    else:
+        pstats.Stats(*paths).dump_stats(path)
+    for part in paths:
+        if part != path:
+            os.remove(part)
+
+def profile_name(label):
+    """A file name (without extension) for a player's profile"""
+    return re.sub(r"[^\w.-]+", "_", label).strip("_")
@@ -0,0 +1,212 @@
+"""
+Compact binary game records, and a tool to replay them.
+
+A game record is written as a buffered stream while the game is played, and
+consists of (all integers little-endian):
+
+* a header: the magic bytes b"EXPB", a format version (u8), flags (u8), then
+  the names of the white and black players, each as a length (u8) followed
+  by that many bytes of UTF-8;
+* one fixed-width entry per ply: the action encoded as a u16 (see
+  `encode_action`), followed by the CPU time the player took to choose it as
+  a float32 if the FLAG_CPU flag is set;
+* a trailer: the code END followed by the result of the game (u8, see
+  RESULT_CODES). Records of games that never finished have no trailer.
+
+usage: python -m Referee.record [-p PLY] [-a] RECORD
+"""
+
+import sys
+import struct
+import argparse
+from collections import Counter
+
+from Referee import rules
+from Referee.game import Game, COLOURS, _WHITE_START_SQUARES, \
+    _BLACK_START_SQUARES
+from Referee.position import from_board, to_text
+
+MAGIC = b"EXPB"
+VERSION = 1
+FLAG_CPU = 0x01
+END = 0xFFFF
+
+RESULT_CODES = {"draw": 0, "white": 1, "black": 2, "aborted": 3}
+RESULT_NAMES = {code: name for name, code in RESULT_CODES.items()}
+
+# MOVE actions are encoded as a starting square, a direction and a distance
+_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+def encode_action(action):
+    """
+    Encode a (legal) action into 16 bits:
+    * BOOM: bit 15 set, bits 0-5 hold the square (8x + y);
+    * MOVE: bit 15 clear, bits 11-14 hold the number of tokens moved (less
+      one), bits 5-10 the square moved from, bits 3-4 the direction and bits
+      0-2 the distance moved (less one).
+    """
+    atype, *aargs = action
+    if atype == "BOOM":
+        (x, y), = aargs
+        return 0x8000 | (int(x) << 3 | int(y))
+    n, (ax, ay), (bx, by) = aargs
+    dx, dy = int(bx) - int(ax), int(by) - int(ay)
+    d = abs(dx + dy)
+    direction = _DIRECTIONS.index((dx // d, dy // d))
+    return ((int(n) - 1) << 11 | (int(ax) << 3 | int(ay)) << 5
+        | direction << 3 | (d - 1))
+
+def decode_action(code):
+    """Decode an action encoded by `encode_action`."""
+    if code & 0x8000:
+        return ("BOOM", ((code >> 3) & 7, code & 7))
+    n = (code >> 11) + 1
+    x, y = (code >> 8) & 7, (code >> 5) & 7
+    ux, uy = _DIRECTIONS[(code >> 3) & 3]
+    d = (code & 7) + 1
+    return ("MOVE", n, (x, y), (x + d*ux, y + d*uy))
+
+
+class RecordWriter:
+    """
+    Write a game record to a file as the game progresses. Call `.close()`
+    with the result once the game is over.
+    """
+    def __init__(self, filename, white="", black="", cpu=True):
+        self.flags = FLAG_CPU if cpu else 0
+        self.file = open(filename, 'wb') # (buffered)
+        self.file.write(MAGIC + struct.pack("<BB", VERSION, self.flags))
+        for name in (white, black):
+            data = name.encode()[:255]
+            self.file.write(struct.pack("<B", len(data)) + data)
+
+    def write_ply(self, action, cpu_time=None):
+        code = encode_action(action)
+        if self.flags & FLAG_CPU:
+            cpu_time = cpu_time if cpu_time is not None else float('nan')
+            self.file.write(struct.pack("<Hf", code, cpu_time))
+        else:
+            self.file.write(struct.pack("<H", code))
+
+    def close(self, result="aborted"):
+        if self.file is not None:
+            self.file.write(struct.pack("<HB", END, RESULT_CODES[result]))
+            self.file.close()
+            self.file = None
+
+
+class GameRecord:
+    """
+    A game record read back from a file (see `read_record`): the players'
+    names, the encoded actions, per-ply CPU times (or None) and the result
+    (or None if the game did not finish).
+    """
+    def __init__(self, white, black, codes, cpu_times, result):
+        self.white = white
+        self.black = black
+        self.codes = codes
+        self.cpu_times = cpu_times
+        self.result = result
+
+    def __len__(self):
+        return len(self.codes)
+
+    def actions(self):
+        return [decode_action(code) for code in self.codes]
+
+    def position_key(self, ply=None):
+        """
+        The position key (see `Referee.position`) after the first `ply`
+        plies (default: all), with the colour to move
+        """
+        plies = len(self.codes[:ply])
+        return from_board(self.position(ply), COLOURS[plies % 2])
+
+    def position(self, ply=None):
+        """
+        Rebuild the board (as a Counter of signed stack sizes, as used by
+        `Referee.game.Game`) after the first `ply` plies (default: all).
+        """
+        board = Counter()
+        for xy in _WHITE_START_SQUARES:
+            board[xy] = +1
+        for xy in _BLACK_START_SQUARES:
+            board[xy] = -1
+        for code in self.codes[:ply]:
+            apply_code(board, code)
+        return board
+
+def apply_code(board, code):
+    """
+    Apply an encoded action to a board of signed stack sizes without
+    validating it (the referee validated it when the game was played).
+    """
+    squares = [board[xy] for xy in rules.COORDS]
+    for i, n in rules.changes(squares, decode_action(code)):
+        board[rules.COORDS[i]] = n
+
+def read_record(filename):
+    """Read a game record from a file."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{filename} is not a game record")
+    version, flags = struct.unpack_from("<BB", data, 4)
+    if version != VERSION:
+        raise ValueError(f"{filename}: unsupported version {version}")
+    offset = 6
+    names = []
+    for _ in range(2):
+        length = data[offset]
+        names.append(data[offset+1:offset+1+length].decode())
+        offset += 1 + length
+    body = data[offset:]
+
+    # the plies are fixed width: find where they stop
+    width = 6 if flags & FLAG_CPU else 2
+    result = None
+    nply = len(body) // width
+    if len(body) >= 3 and (len(body) - 3) % width == 0:
+        end, code = struct.unpack_from("<HB", body, len(body) - 3)
+        if end == END:
+            nply = (len(body) - 3) // width
+            result = RESULT_NAMES[code]
+
+    if flags & FLAG_CPU:
+        plies = list(struct.iter_unpack("<Hf", body[:nply*width]))
+        codes = [code for code, _ in plies]
+        cpu_times = [cpu for _, cpu in plies]
+    else:
+        codes = list(struct.unpack_from(f"<{nply}H", body))
+        cpu_times = None
+    return GameRecord(*names, codes, cpu_times, result)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="record",
+        description="replay a binary game record.")
+    parser.add_argument('record', help="the game record file to replay.")
+    parser.add_argument('-p', '--ply', type=int, default=None,
+        help="show the board after this many plies (default: the end).")
+    parser.add_argument('-a', '--actions', action="store_true",
+        help="also list the actions played (and their CPU times).")
+    parser.add_argument('-k', '--key', action="store_true",
+        help="also print the position key (see `Referee.position`).")
+    args = parser.parse_args()
+
+    record = read_record(args.record)
+    print(f"white: {record.white}, black: {record.black}, "
+        f"plies: {len(record)}, result: {record.result or 'unfinished'}")
+    if args.actions:
+        for ply, action in enumerate(record.actions()[:args.ply]):
+            cpu = record.cpu_times[ply] if record.cpu_times else None
+            cpu_str = f" ({cpu:.3f}s)" if cpu is not None else ""
+            print(f"{ply+1:4d}. {action!r}{cpu_str}")
+    game = Game(unicodeboard=(sys.platform != 'win32'))
+    game.set_board(record.position(args.ply))
+    print(game)
+    if args.key:
+        print(to_text(record.position_key(args.ply)))
+
+if __name__ == '__main__':
+    main()
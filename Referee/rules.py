@@ -0,0 +1,185 @@
+"""
+The rules of Expendibots in one place: move generation, legality, explosion
+chains and the end of the game. Both the referee (`Referee.game`) and the
+player (`Src.game`) use these functions, so they can never disagree on what
+is legal.
+
+The functions work on a board given as a sequence of 64 signed stack sizes,
+one per square (x, y) at index 8x + y (positive for white, negative for
+black, 0 for an empty square, which has no colour), and a side given as a
+sign (+1 for white, -1 for black; see `SIGNS`). Actions are in the referee's
+form: ("MOVE", n, (x, y), (x, y)) or ("BOOM", (x, y)).
+
+Sets of squares (explosions, occupied squares) are bitmasks, with bit 8x + y
+for square (x, y). The tables they need are generated offline and
+memory-mapped on import (see `Referee.tables`).
+"""
+
+from Referee import tables
+
+BOARD_SIZE = 8
+SQUARES = BOARD_SIZE * BOARD_SIZE
+SIGNS = {"white": +1, "black": -1}
+# draw rules: the game is drawn once each player has had this many turns,
+# or once a position (with the same player to move) occurs this many times
+MAX_TURNS = 250
+REPETITIONS = 4
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# the square (x, y) with each index, and back
+COORDS = [divmod(i, BOARD_SIZE) for i in range(SQUARES)]
+INDICES = {xy: i for i, xy in enumerate(COORDS)}
+
+def _unpack_rays(flat):
+    """
+    RAYS[s][d] -- the squares 1, 2, ... steps from s in direction d (+x,
+    -x, +y, -y), as far as the edge of the board, from the flat table
+    (padded with -1 past the edge)
+    """
+    steps = BOARD_SIZE - 1
+    rays = []
+    for s in range(SQUARES):
+        rays.append([[t for t in flat[i*steps:(i+1)*steps] if t >= 0]
+            for i in range(s * len(DIRECTIONS), (s+1) * len(DIRECTIONS))])
+    return rays
+
+# BLAST[s] -- bitmask of the squares caught in the explosion of square s:
+# itself and its up to 8 neighbours (see `Referee.tables`)
+BLAST = list(tables.load("blast"))
+RAYS = _unpack_rays(tables.load("rays"))
+
+def occupied_mask(squares):
+    """Bitmask of the occupied squares of a board"""
+    mask = 0
+    for i, n in enumerate(squares):
+        if n:
+            mask |= 1 << i
+    return mask
+
+def boom_mask(occupied, square):
+    """
+    Bitmask of the squares caught in the chain explosion starting at square
+    index `square`, given the bitmask of occupied squares. Each square is
+    visited once, however many explosions reach it.
+    """
+    boomed, frontier = 0, 1 << square
+    while frontier:
+        boomed |= frontier
+        blast = 0
+        while frontier:
+            lowest = frontier & -frontier
+            blast |= BLAST[lowest.bit_length() - 1]
+            frontier ^= lowest
+        frontier = blast & occupied & ~boomed
+    return boomed
+
+def mask_squares(mask):
+    """The square indices in a bitmask, in increasing order"""
+    squares = []
+    while mask:
+        lowest = mask & -mask
+        squares.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return squares
+
+def move_targets(squares, square):
+    """
+    The square indices the stack at `square` can move (some of its tokens)
+    to: up to as many squares away as it has tokens, in a straight line, onto
+    an empty square or a friendly stack (jumping over anything in between)
+    """
+    n = squares[square]
+    reach = abs(n)
+    return [t for ray in RAYS[square] for t in ray[:reach]
+        if squares[t] * n >= 0]
+
+def actions(squares, sign):
+    """A list of every action available to a side: booms first, then moves"""
+    booms, moves = [], []
+    for s, n in enumerate(squares):
+        n *= sign
+        if n <= 0:
+            continue
+        a = COORDS[s]
+        booms.append(("BOOM", a))
+        for t in move_targets(squares, s):
+            b = COORDS[t]
+            moves.extend(("MOVE", m, a, b) for m in range(1, n+1))
+    return booms + moves
+
+def _index(square):
+    """The index of a square given as (x, y), or None if it is not one"""
+    if not isinstance(square, tuple):
+        return None
+    try:
+        return INDICES.get(square)
+    except TypeError: # e.g. unhashable components
+        return None
+
+def is_legal(squares, sign, action):
+    """
+    Whether an action is well-formed and available to a side, checked on
+    the board directly (equivalent to `action in actions(squares, sign)`,
+    without listing them)
+    """
+    if not isinstance(action, tuple):
+        return False
+    if len(action) == 2 and action[0] == "BOOM":
+        s = _index(action[1])
+        return s is not None and squares[s] * sign > 0
+    if len(action) == 4 and action[0] == "MOVE":
+        _, m, a, b = action
+        s, t = _index(a), _index(b)
+        if s is None or t is None:
+            return False
+        n = squares[s] * sign
+        try:
+            if m not in range(1, n+1):
+                return False
+        except TypeError:
+            return False
+        # one straight line step of at most n squares
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        if (dx == 0) == (dy == 0) or abs(dx + dy) > n:
+            return False
+        # onto an empty square or a friendly stack
+        return squares[t] * sign >= 0
+    return False
+
+def changes(squares, action):
+    """
+    The squares a (legal) action changes, as a list of (square index, new
+    signed stack size)
+    """
+    if action[0] == "BOOM":
+        s = INDICES[action[1]]
+        return [(t, 0) for t in mask_squares(boom_mask(occupied_mask(squares),
+            s))]
+    _, m, a, b = action
+    s, t = INDICES[a], INDICES[b]
+    m = m if squares[s] > 0 else -m
+    return [(s, squares[s] - m), (t, squares[t] + m)]
+
+def token_counts(squares):
+    """The number of (white, black) tokens on a board"""
+    white = black = 0
+    for n in squares:
+        if n > 0:
+            white += n
+        elif n < 0:
+            black -= n
+    return white, black
+
+def result(white, black):
+    """
+    The result of a game given the number of tokens each side has left:
+    "white" or "black" if only that side has tokens, "draw" if neither does,
+    or None if both do (the game goes on)
+    """
+    if white and black:
+        return None
+    if white:
+        return "white"
+    if black:
+        return "black"
+    return "draw"
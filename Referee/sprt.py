@@ -0,0 +1,303 @@
+"""
+Decide whether a candidate player is stronger than a baseline with a
+sequential probability ratio test (SPRT), playing only as many games as it
+takes.
+
+Games are played in pairs across a pool of workers (as in
+`Referee.tournament`). Both games of a pair start from the same opening, a
+few random moves from the starting position played on the players' behalf
+(see `iter_openings`), with the candidate playing White in one and Black in
+the other. Each pair scores the candidate 0, 1/4, 1/2, 3/4 or 1 (the
+pentanomial model), which cancels out most of the luck of the opening.
+
+After every pair, the log-likelihood ratio of the hypotheses H1: the
+candidate is `elo1` Elo stronger, against H0: it is `elo0` Elo stronger, is
+estimated from the mean and variance of the pair scores (the generalised
+SPRT). The match stops as soon as the ratio leaves the bounds set by the
+error rates `alpha` (of passing a candidate no better than elo0) and `beta`
+(of failing one as good as elo1): above the upper bound, H1 is accepted
+and the candidate passes; below the lower bound, it fails. A match that
+reaches `max_pairs` without a decision is inconclusive.
+
+The exit status is 0 if the candidate passes and 1 otherwise, so the test
+can gate a change (e.g. 'engine=python -m Src.engine' against a build of the
+previous version, checked out elsewhere).
+
+usage: python -m Referee.sprt [--elo0 ELO0] [--elo1 ELO1] [--alpha ALPHA]
+                              [--beta BETA] [-n MAX_PAIRS] [-j JOBS]
+                              [-t time_limit] [-s space_limit]
+                              [-A {strict,fast}] [-I] [--plies PLIES]
+                              [--seed SEED] [-o RESULTS]
+                              candidate baseline
+"""
+
+import sys
+import math
+import json
+import random
+import argparse
+import itertools
+import multiprocessing
+import multiprocessing.pool
+
+from Referee import rules
+from Referee.log import StarLog
+from Referee.game import _WHITE_START_SQUARES, _BLACK_START_SQUARES
+from Referee.player import ACCOUNTING_MODES
+from Referee.tournament import _play_game, _player_labels, _score_to_elo
+from Referee.options import PackageSpecAction
+
+ELO0_DEFAULT = 0.0
+ELO1_DEFAULT = 10.0
+ALPHA_DEFAULT = 0.05
+BETA_DEFAULT = 0.05
+MAX_PAIRS_DEFAULT = 10000
+OPENING_PLIES_DEFAULT = 4
+ACCOUNTING_DEFAULT = "fast"
+PROGRESS_PAIRS = 10 # pairs between progress reports
+
+# (candidate's score in a pair, as a share of the pair's 2 points)
+PAIR_SCORES = (0.0, 0.25, 0.5, 0.75, 1.0)
+# pairs added to each count when estimating the mean and spread of pair
+# scores: without them, the spread of the first few pairs is often far too
+# small (zero, for a run of equal scores), and the test decides on them
+PSEUDO_PAIRS = 0.5
+
+def iter_openings(plies, seed=0):
+    """
+    Generate openings, each a list of `plies` random moves (no booms) from
+    the starting position, alternating from White. The same seed gives the
+    same openings, so that matches are comparable.
+    """
+    rng = random.Random(seed)
+    start = [0] * rules.SQUARES
+    for xy in _WHITE_START_SQUARES:
+        start[rules.INDICES[xy]] = +1
+    for xy in _BLACK_START_SQUARES:
+        start[rules.INDICES[xy]] = -1
+    while True:
+        squares, sign, opening = list(start), +1, []
+        for _ in range(plies):
+            moves = [a for a in rules.actions(squares, sign)
+                if a[0] == "MOVE"]
+            action = rng.choice(moves)
+            for i, n in rules.changes(squares, action):
+                squares[i] = n
+            opening.append(action)
+            sign = -sign
+        yield opening
+
+class SPRT:
+    """
+    The state of a (generalised) sequential probability ratio test on pair
+    scores (see the module documentation).
+    """
+    def __init__(self, elo0=ELO0_DEFAULT, elo1=ELO1_DEFAULT,
+            alpha=ALPHA_DEFAULT, beta=BETA_DEFAULT):
+        if elo1 <= elo0:
+            raise ValueError("elo1 must be greater than elo0")
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.counts = [0] * len(PAIR_SCORES)
+
+    def add(self, score):
+        """Count a pair in which the candidate scored `score` (of 1)"""
+        self.counts[PAIR_SCORES.index(score)] += 1
+
+    def pairs(self):
+        return sum(self.counts)
+
+    def _moments(self):
+        counts = [c + PSEUDO_PAIRS for c in self.counts]
+        n = sum(counts)
+        mean = sum(c * x for c, x in zip(counts, PAIR_SCORES)) / n
+        var = sum(c * (x - mean)**2 for c, x in zip(counts, PAIR_SCORES)) / n
+        return mean, var
+
+    def llr(self):
+        """The estimated log-likelihood ratio of H1 to H0 so far"""
+        if self.pairs() == 0:
+            return 0.0
+        mean, var = self._moments()
+        s0, s1 = _elo_to_score(self.elo0), _elo_to_score(self.elo1)
+        return self.pairs() * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+
+    def status(self):
+        """'H1' (pass), 'H0' (fail), or None while undecided"""
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self):
+        """
+        The candidate's Elo gain implied by the pairs so far, with the bounds
+        of its 95% confidence interval
+        """
+        n = self.pairs()
+        if n == 0:
+            return 0.0, -math.inf, math.inf
+        mean, var = self._moments()
+        margin = 1.96 * math.sqrt(var / n)
+        return (_score_to_elo(mean), _score_to_elo(mean - margin),
+            _score_to_elo(mean + margin))
+
+    def summary(self):
+        elo, low, high = self.elo()
+        return {"pairs": self.pairs(), "pentanomial": list(self.counts),
+            "llr": self.llr(), "bounds": [self.lower, self.upper],
+            "elo0": self.elo0, "elo1": self.elo1, "elo": elo,
+            "elo_low": low, "elo_high": high}
+
+def _elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def sprt_match(candidate_loc, baseline_loc, test, max_pairs=MAX_PAIRS_DEFAULT,
+        jobs=None, time_limit=None, space_limit=None,
+        accounting=ACCOUNTING_DEFAULT, isolate=False,
+        opening_plies=OPENING_PLIES_DEFAULT, seed=0, out_function=None,
+        results_file=None):
+    """
+    Play pairs of games between a candidate and a baseline player (given as
+    (package, class) tuples) until the SPRT `test` (an `SPRT`) decides, or
+    for `max_pairs` pairs. Return the test's status (see `SPRT.status`).
+
+    The remaining arguments are as for `Referee.tournament.tournament`,
+    plus the number of plies in each opening and the seed they are drawn
+    with.
+    """
+    out = out_function if out_function else (lambda *_, **__: None) # no-op
+    candidate, baseline = _player_labels([candidate_loc, baseline_loc])
+    openings = itertools.islice(iter_openings(opening_plies, seed),
+        max_pairs)
+    players = [(candidate, candidate_loc), (baseline, baseline_loc)]
+    def specs():
+        # games 2k and 2k + 1 make up pair k, with colours swapped
+        for pair, opening in enumerate(openings):
+            for game, (white, black) in enumerate((players, players[::-1]),
+                    2 * pair):
+                yield (game, white, black, time_limit, space_limit,
+                    accounting, None, None, isolate, None, None, opening)
+
+    if isolate:
+        # (see `Referee.tournament.tournament`)
+        pool = multiprocessing.pool.ThreadPool(jobs)
+    else:
+        maxtasks = 1 if space_limit else None
+        pool = multiprocessing.Pool(jobs, maxtasksperchild=maxtasks)
+    halves = {} # pair -> candidate's score in the first game to finish
+    status = None
+    with pool:
+        # (the pool is terminated on leaving, abandoning any games still
+        # being played once the test has decided)
+        for record in pool.imap_unordered(_play_game, specs()):
+            if results_file is not None:
+                print(json.dumps(record), file=results_file, flush=True)
+            pair = record["game"] // 2
+            score = 1.0 if record["winner"] == candidate else \
+                0.5 if record["winner"] is None else 0.0
+            if pair not in halves:
+                halves[pair] = score
+                continue
+            test.add((halves.pop(pair) + score) / 2)
+            status = test.status()
+            if status is not None or test.pairs() % PROGRESS_PAIRS == 0:
+                out(_progress(test))
+            if status is not None:
+                break
+    return status
+
+def _progress(test):
+    summary = test.summary()
+    return (f"{summary['pairs']} pairs {summary['pentanomial']}: "
+        f"llr {summary['llr']:+.2f} [{summary['bounds'][0]:+.2f}, "
+        f"{summary['bounds'][1]:+.2f}], elo {summary['elo']:+.1f} "
+        f"[{summary['elo_low']:+.1f}, {summary['elo_high']:+.1f}]")
+
+def format_verdict(status, test):
+    verdict = {"H1": "PASS", "H0": "FAIL", None: "INCONCLUSIVE"}[status]
+    return (f"{verdict} (H0: elo {test.elo0:+g}, H1: elo {test.elo1:+g}) "
+        f"after {_progress(test)}")
+
+
+# COMMAND-LINE INTERFACE
+
+def get_options():
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(prog="sprt",
+        description="plays pairs of games between a candidate and a baseline "
+        "player from paired openings until a sequential probability ratio "
+        "test accepts or rejects an Elo gain.")
+    parser.add_argument('candidate_loc', metavar='candidate',
+        action=PackageSpecAction, help="location of the candidate's Player "
+        "class (package name, as for the referee)")
+    parser.add_argument('baseline_loc', metavar='baseline',
+        action=PackageSpecAction, help="location of the baseline's Player "
+        "class")
+    parser.add_argument('--elo0', type=float, default=ELO0_DEFAULT,
+        help="Elo gain of the null hypothesis (fail) (default: "
+        "%(default)s).")
+    parser.add_argument('--elo1', type=float, default=ELO1_DEFAULT,
+        help="Elo gain of the alternative hypothesis (pass) (default: "
+        "%(default)s).")
+    parser.add_argument('--alpha', type=float, default=ALPHA_DEFAULT,
+        help="chance of passing a candidate no better than elo0 (default: "
+        "%(default)s).")
+    parser.add_argument('--beta', type=float, default=BETA_DEFAULT,
+        help="chance of failing a candidate as good as elo1 (default: "
+        "%(default)s).")
+    parser.add_argument('-n', '--max-pairs', type=int,
+        default=MAX_PAIRS_DEFAULT, help="pairs of games to play at most "
+        "before giving up (default: %(default)s).")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+        help="number of worker processes (default: one per CPU).")
+    parser.add_argument('-t', '--time', metavar="time_limit", type=float,
+        default=0, help="limit on CPU time (float, seconds) for each player "
+        "per game: the time control (default: no limit).")
+    parser.add_argument('-s', '--space', metavar="space_limit", type=float,
+        default=0, help="limit on memory space (float, MB) for each player "
+        "(default: no limit).")
+    parser.add_argument('-A', '--accounting', choices=ACCOUNTING_MODES,
+        default=ACCOUNTING_DEFAULT, help="how carefully to account for "
+        "resources (see the referee's help; default: %(default)s).")
+    parser.add_argument('-I', '--isolate', action="store_true",
+        help="run each player in a process of its own (see "
+        "`Referee.isolation`).")
+    parser.add_argument('--plies', type=int, default=OPENING_PLIES_DEFAULT,
+        help="random moves in each opening (default: %(default)s).")
+    parser.add_argument('--seed', type=int, default=0,
+        help="seed for the openings (default: %(default)s).")
+    parser.add_argument('-o', '--output', metavar="RESULTS",
+        type=argparse.FileType('w'), default=None,
+        help="write a JSON record of each game to this file as it finishes.")
+    parser.add_argument('-v', '--verbosity', type=int, choices=range(0, 2),
+        default=1, help="0: print only the verdict; 1: (default) also "
+        "report progress.")
+    return parser.parse_args()
+
+def main():
+    options = get_options()
+    out = StarLog(level=options.verbosity)
+    test = SPRT(options.elo0, options.elo1, options.alpha, options.beta)
+    try:
+        status = sprt_match(options.candidate_loc, options.baseline_loc,
+            test, max_pairs=options.max_pairs, jobs=options.jobs,
+            time_limit=options.time, space_limit=options.space,
+            accounting=options.accounting, isolate=options.isolate,
+            opening_plies=options.plies, seed=options.seed,
+            out_function=out.comment, results_file=options.output)
+    except KeyboardInterrupt:
+        print() # (end the line)
+        out.comment("bye!")
+        sys.exit(1)
+    finally:
+        if options.output is not None:
+            options.output.close()
+    out.print(format_verdict(status, test))
+    sys.exit(0 if status == "H1" else 1)
+
+if __name__ == '__main__':
+    main()
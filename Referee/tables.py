@@ -0,0 +1,102 @@
+"""
+The precomputed tables of the rules kernel (`Referee.rules`) and the
+referee's Zobrist keys (`Referee.game`), generated offline into raw files in
+Referee/data and memory-mapped on import, so that building them is never
+charged to a player's clock. If a file is missing or stale (or the machine
+is big-endian), the table is built in memory instead, with the same values.
+
+The files hold little-endian arrays, with squares numbered 8x + y:
+
+blast.bin -- u64 for each square s: bitmask of the squares caught in the
+    explosion of s (itself and its up to 8 neighbours).
+rays.bin -- i8 for each square s, direction d (+x, -x, +y, -y) and step k:
+    the square k + 1 steps from s in direction d, or -1 off the board.
+zobrist.bin -- u64 for each square s and signed stack size n (-12 to 12,
+    leaving out 0): its random key, at index 24s + n + 12 (n < 0) or
+    24s + n + 11 (n > 0); then one more key for whose turn it is.
+
+usage: python -m Referee.tables   (regenerates the files)
+"""
+
+import os
+import sys
+import mmap
+import array
+import random
+
+BOARD_SIZE = 8
+SQUARES = BOARD_SIZE * BOARD_SIZE
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+MAX_STACK = 12
+STACK_SIZES = [n for n in range(-MAX_STACK, MAX_STACK + 1) if n != 0]
+ZOBRIST_SEED = 20200512 # fixed seed: keys are reproducible
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def build_blast():
+    blast = []
+    for s in range(SQUARES):
+        x, y = divmod(s, BOARD_SIZE)
+        mask = 0
+        for i in range(max(0, x - 1), min(BOARD_SIZE, x + 2)):
+            for j in range(max(0, y - 1), min(BOARD_SIZE, y + 2)):
+                mask |= 1 << (i * BOARD_SIZE + j)
+        blast.append(mask)
+    return array.array("Q", blast)
+
+def build_rays():
+    rays = array.array("b")
+    for s in range(SQUARES):
+        x, y = divmod(s, BOARD_SIZE)
+        for dx, dy in DIRECTIONS:
+            for k in range(1, BOARD_SIZE):
+                i, j = x + k*dx, y + k*dy
+                inside = 0 <= i < BOARD_SIZE and 0 <= j < BOARD_SIZE
+                rays.append(i * BOARD_SIZE + j if inside else -1)
+    return rays
+
+def build_zobrist():
+    rng = random.Random(ZOBRIST_SEED)
+    return array.array("Q", (rng.getrandbits(64)
+        for _ in range(SQUARES * len(STACK_SIZES) + 1)))
+
+# table name -> (builder, array type code, number of items)
+TABLES = {
+    "blast": (build_blast, "Q", SQUARES),
+    "rays": (build_rays, "b", SQUARES * len(DIRECTIONS) * (BOARD_SIZE - 1)),
+    "zobrist": (build_zobrist, "Q", SQUARES * len(STACK_SIZES) + 1),
+}
+
+def load(name):
+    """
+    Memory-map a table from Referee/data as a read-only memoryview of its
+    items, or build it (as an array) if the file is missing or stale
+    """
+    build, code, length = TABLES[name]
+    path = os.path.join(DATA_DIR, name + ".bin")
+    size = length * array.array(code).itemsize
+    try:
+        with open(path, 'rb') as f:
+            stale = os.fstat(f.fileno()).st_size != size
+            if stale or sys.byteorder != "little":
+                return build()
+            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return build()
+    return memoryview(data).cast(code)
+
+def generate():
+    """Write every table to its file in Referee/data"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for name, (build, _, _) in TABLES.items():
+        table = build()
+        if sys.byteorder != "little":
+            table.byteswap()
+        with open(os.path.join(DATA_DIR, name + ".bin"), 'wb') as f:
+            table.tofile(f)
+
+def main():
+    generate()
+    print(f"wrote {len(TABLES)} tables to {DATA_DIR}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,461 @@
+"""
+Play many headless games between two or more Player classes across a pool of
+worker processes, and summarise the results.
+
+Every pair of players meets for a number of games, alternating colours from
+one game to the next. Each game is played with `Referee.game.play` (without
+printing the board), and the outcome is aggregated into wins, draws, losses,
+illegal-action, resource-limit and crash failures, per-game CPU time and
+memory use (as measured by each `PlayerWrapper`), and Elo differences with
+95% confidence intervals.
+
+With -I, each player runs in a process of its own (see `Referee.isolation`)
+and the games are coordinated from a pool of threads instead. Players given
+as 'engine=COMMAND' are engines (see `Referee.engine`); each worker keeps its
+engines running from one game to the next.
+
+With -P, every call to each player (other than engines) is profiled (see
+`Referee.profiling`), and each player's profiles are added up over the whole
+tournament.
+
+usage: python -m Referee.tournament [-n GAMES] [-j JOBS] [-t time_limit]
+                                    [-s space_limit] [-A {strict,fast}] [-I]
+                                    [-o RESULTS] [-T TELEMETRY_DIR]
+                                    [-R RECORD_DIR] [-P PROFILE_DIR]
+                                    [--profile-mode {sample,cprofile}]
+                                    player player [player ...]
+"""
+
+import os
+import math
+import json
+import time
+import argparse
+import threading
+import itertools
+import contextlib
+import multiprocessing
+import multiprocessing.pool
+
+from Referee.log import StarLog, TelemetryLog
+from Referee.game import play, IllegalActionException
+from Referee.player import PlayerWrapper, ResourceLimitException, \
+    set_space_line, ACCOUNTING_MODES
+from Referee.isolation import ProcessPlayerWrapper, PlayerProcessError
+from Referee.engine import Engine, EnginePlayerWrapper, is_engine_spec
+from Referee.profiling import PlayerProfile, PROFILE_MODES, EXTENSIONS, \
+    merge_profiles, profile_name
+from Referee.options import PackageSpecAction
+
+GAMES_DEFAULT = 100 # per pair of players
+ACCOUNTING_DEFAULT = "fast"
+PROGRESS_STEPS = 10 # number of progress reports over the tournament
+
+def tournament(player_locs, games, jobs=None, time_limit=None,
+        space_limit=None, accounting=ACCOUNTING_DEFAULT, out_function=None,
+        results_file=None, telemetry_dir=None, record_dir=None,
+        isolate=False, profile_dir=None, profile_mode=PROFILE_MODES[0]):
+    """
+    Play `games` games between every pair of players and return a list of
+    per-game records (see `_play_game`).
+
+    Arguments:
+    player_locs -- A list of (package, class) tuples, one for each player.
+    games -- Number of games to play between each pair of players.
+    jobs -- Number of worker processes (default: one per CPU).
+    time_limit, space_limit -- Resource limits for each player (see
+        `PlayerWrapper`).
+    accounting -- Resource accounting mode for each player (see
+        `PlayerWrapper`).
+    out_function -- Function to use for printing progress.
+    results_file -- If not None, a file to write each record to, as a line
+        of JSON, as soon as its game is finished.
+    telemetry_dir -- If not None, a directory in which each worker process
+        writes a telemetry log of every player call it makes (see
+        `Referee.log.TelemetryLog`).
+    record_dir -- If not None, a directory in which to write a binary record
+        of each game (see `Referee.record`).
+    isolate -- If True, run each player in a process of its own (see
+        `Referee.isolation`), coordinating `jobs` games at a time from
+        threads of this process.
+    profile_dir -- If not None, a directory in which to write a profile of
+        each player (but engines) over all of its games (see
+        `Referee.profiling`), profiled in `profile_mode`.
+    """
+    out = out_function if out_function else (lambda *_, **__: None) # no-op
+    for directory in (telemetry_dir, record_dir, profile_dir):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+    labels = _player_labels(player_locs)
+    specs = []
+    for a, b in itertools.combinations(range(len(player_locs)), 2):
+        for i in range(games):
+            # alternate colours from one game to the next
+            white, black = (a, b) if i % 2 == 0 else (b, a)
+            specs.append((len(specs),
+                (labels[white], player_locs[white]),
+                (labels[black], player_locs[black]),
+                time_limit, space_limit, accounting, telemetry_dir,
+                record_dir, isolate, profile_dir, profile_mode, ()))
+
+    if isolate:
+        # the players have processes of their own (which daemonic pool
+        # workers could not start), so threads suffice to coordinate games
+        pool = multiprocessing.pool.ThreadPool(jobs)
+    else:
+        # each worker process's space usage accumulates over the games it
+        # plays, so only reuse worker processes if space is not being limited
+        maxtasks = 1 if space_limit else None
+        pool = multiprocessing.Pool(jobs, maxtasksperchild=maxtasks)
+    records = []
+    step = max(1, len(specs) // PROGRESS_STEPS)
+    with pool:
+        for record in pool.imap_unordered(_play_game, specs):
+            records.append(record)
+            if results_file is not None:
+                print(json.dumps(record), file=results_file, flush=True)
+            if len(records) % step == 0 or len(records) == len(specs):
+                out(f"{len(records)}/{len(specs)} games played")
+    records.sort(key=lambda r: r["game"])
+    if profile_dir is not None:
+        _merge_profiles(profile_dir, labels, profile_mode)
+    return records
+
+def _player_labels(player_locs):
+    """
+    Name each player by its package specification, numbering any repeats.
+    """
+    labels = []
+    for num, (pkg, cls) in enumerate(player_locs, 1):
+        if is_engine_spec((pkg, cls)):
+            label = pkg + cls
+        else:
+            label = pkg if cls == "Player" else f"{pkg}:{cls}"
+        if label in labels:
+            label += f"#{num}"
+        labels.append(label)
+    return labels
+
+def _play_game(spec):
+    """
+    Play a single game in a worker process (or thread, if the players are
+    isolated), returning a record of the result. The game starts with the
+    spec's opening actions, if any (see `Referee.game.play`).
+    """
+    game_id, (white_label, white_loc), (black_label, black_loc), \
+        time_limit, space_limit, accounting, telemetry_dir, record_dir, \
+        isolate, profile_dir, profile_mode, opening = spec
+    worker = os.getpid()
+    if isolate:
+        worker = f"{worker}-{threading.get_native_id()}"
+    telemetry = None
+    if telemetry_dir is not None:
+        path = os.path.join(telemetry_dir, f"telemetry-{worker}.jsonl")
+        telemetry = TelemetryLog(open(path, 'a'), game=game_id)
+    limits = dict(time_limit=time_limit, space_limit=space_limit,
+        accounting=accounting, telemetry=telemetry)
+    calls = {}
+    players = []
+
+    record_path = None
+    if record_dir is not None:
+        record_path = os.path.join(record_dir, f"game-{game_id:06d}.exb")
+
+    winner = failure = culprit = None
+    start = time.time()
+    with contextlib.ExitStack() as stack:
+        if not isolate:
+            # silence the players' own output; nobody is watching
+            devnull = stack.enter_context(open(os.devnull, 'w'))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        try:
+            for label, loc in ((white_label, white_loc),
+                    (black_label, black_loc)):
+                profile = None
+                if profile_dir is not None and not is_engine_spec(loc):
+                    # each worker adds up its own part of the profile
+                    profile = PlayerProfile(os.path.join(
+                        _profile_parts_dir(profile_dir, label), str(worker)),
+                        profile_mode)
+                # blame the player whose wrapper (or engine) fails to start
+                calls["current"] = label
+                players.append(_new_player(label, loc, calls, isolate,
+                    profile=profile, **limits))
+            if not isolate:
+                set_space_line()
+            result = play(players, print_state=False,
+                recordfilename=record_path, opening=opening)
+        except IllegalActionException as e:
+            failure, result = "illegal", str(e).splitlines()[0]
+        except ResourceLimitException as e:
+            failure, result = "resource", str(e)
+        except PlayerProcessError as e:
+            failure, result = "crash", str(e).splitlines()[0]
+        except Exception as e:
+            failure, result = "crash", f"{type(e).__name__}: {e}"
+        finally:
+            for player in players:
+                player.close()
+    wall = time.time() - start
+    if telemetry is not None:
+        telemetry.file.close()
+
+    if failure is not None:
+        # the player being called when the game broke down forfeits
+        culprit = calls["current"]
+        winner = black_label if culprit == white_label else white_label
+    elif result.startswith("winner: white"):
+        winner = white_label
+    elif result.startswith("winner: black"):
+        winner = black_label
+
+    # (a player that failed to start used no CPU time or memory)
+    cpu = dict.fromkeys((white_label, black_label), 0)
+    memory = dict(cpu)
+    for p in players:
+        cpu[p.label] = p.timer.clock
+        memory[p.label] = p.space.peak_usage
+    return {
+        "game": game_id,
+        "white": white_label,
+        "black": black_label,
+        "winner": winner,
+        "result": result,
+        "failure": failure,
+        "culprit": culprit,
+        "turns": sum(p.nactions for p in players),
+        "cpu": cpu,
+        "memory": memory,
+        "wall": wall,
+    }
+
+# engines kept running by this worker (process or thread) between games
+_ENGINES = {}
+
+def _new_player(label, player_loc, calls, isolate, profile=None, **limits):
+    """
+    Wrap a player for one game, reusing this worker's engine for the player
+    if it has one running.
+    """
+    if is_engine_spec(player_loc):
+        key = (threading.get_ident(), label)
+        engine = _ENGINES.get(key)
+        if engine is None or not engine.alive():
+            engine = _ENGINES[key] = Engine(player_loc[1], quiet=True)
+        return _EngineTournamentPlayer(label, player_loc, calls,
+            engine=engine, quiet=True, **limits)
+    if isolate:
+        return _IsolatedTournamentPlayer(label, player_loc, calls,
+            profile=profile, quiet=True, **limits)
+    return _TournamentPlayer(label, player_loc, calls, profile=profile,
+        **limits)
+
+def _profile_parts_dir(profile_dir, label):
+    return os.path.join(profile_dir, "parts", profile_name(label))
+
+def _merge_profiles(profile_dir, labels, profile_mode):
+    """Add up each player's profile from the parts written by the workers"""
+    extension = EXTENSIONS[profile_mode]
+    for label in labels:
+        parts_dir = _profile_parts_dir(profile_dir, label)
+        if not os.path.isdir(parts_dir):
+            continue
+        parts = [os.path.join(parts_dir, name)
+            for name in sorted(os.listdir(parts_dir))
+            if name.endswith(extension)]
+        merge_profiles(parts, os.path.join(profile_dir,
+            profile_name(label) + extension))
+        os.rmdir(parts_dir)
+    try:
+        os.rmdir(os.path.join(profile_dir, "parts"))
+    except OSError:
+        pass
+
+class _TournamentPlayer(PlayerWrapper):
+    """
+    A PlayerWrapper that records the label of the player being called (so
+    that failures can be blamed on the right player) and counts its actions.
+    """
+    def __init__(self, label, player_loc, calls, **kwargs):
+        self.label = label
+        self.calls = calls
+        self.nactions = 0
+        super().__init__(label, player_loc, **kwargs)
+    def init(self, colour):
+        self.calls["current"] = self.label
+        super().init(colour)
+    def action(self):
+        self.calls["current"] = self.label
+        self.nactions += 1
+        return super().action()
+    def update(self, colour, action):
+        self.calls["current"] = self.label
+        super().update(colour, action)
+
+class _IsolatedTournamentPlayer(_TournamentPlayer, ProcessPlayerWrapper):
+    """A _TournamentPlayer running the real Player in its own process."""
+
+class _EngineTournamentPlayer(_TournamentPlayer, EnginePlayerWrapper):
+    """A _TournamentPlayer playing with an engine."""
+
+
+# SUMMARY STATISTICS
+
+def summarise(records, labels):
+    """
+    Aggregate per-game records into per-player standings and head-to-head
+    results. Returns a dictionary suitable for printing or saving as JSON.
+    """
+    players = {label: _new_tally() for label in labels}
+    pairs = {}
+    for r in records:
+        white, black, winner = r["white"], r["black"], r["winner"]
+        for label, opponent in ((white, black), (black, white)):
+            tally = players[label]
+            _count(tally, label, winner)
+            tally["cpu"] += r["cpu"][label]
+            tally["max_cpu"] = max(tally["max_cpu"], r["cpu"][label])
+            tally["max_memory"] = max(tally["max_memory"],
+                r["memory"][label])
+            if r["culprit"] == label:
+                tally[r["failure"]] += 1
+        a, b = sorted((white, black), key=labels.index)
+        _count(pairs.setdefault((a, b), _new_tally()), a, winner)
+
+    for tally in itertools.chain(players.values(), pairs.values()):
+        if tally["games"]:
+            tally["cpu"] /= tally["games"]
+        tally["elo"], tally["elo_low"], tally["elo_high"] = _elo(tally)
+    return {
+        "players": players,
+        "pairs": [dict(player=a, opponent=b, **tally)
+            for (a, b), tally in pairs.items()],
+    }
+
+def _new_tally():
+    return {"games": 0, "wins": 0, "draws": 0, "losses": 0,
+        "illegal": 0, "resource": 0, "crash": 0,
+        "cpu": 0.0, "max_cpu": 0.0, "max_memory": 0.0}
+
+def _count(tally, label, winner):
+    tally["games"] += 1
+    if winner is None:
+        tally["draws"] += 1
+    elif winner == label:
+        tally["wins"] += 1
+    else:
+        tally["losses"] += 1
+
+def _elo(tally):
+    """
+    Elo difference implied by a win/draw/loss record, with the bounds of its
+    95% confidence interval (based on the variance of per-game scores).
+    """
+    n = tally["games"]
+    if n == 0:
+        return 0.0, -math.inf, math.inf
+    w, d, l = tally["wins"], tally["draws"], tally["losses"]
+    score = (w + 0.5 * d) / n
+    var = (w * (1 - score)**2 + d * (0.5 - score)**2 + l * score**2) / n
+    margin = 1.96 * math.sqrt(var / n)
+    return (_score_to_elo(score), _score_to_elo(score - margin),
+        _score_to_elo(score + margin))
+
+def _score_to_elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+def format_summary(summary):
+    lines = ["standings:"]
+    for label, t in summary["players"].items():
+        lines.append(f"  {label}: {t['wins']}W {t['draws']}D {t['losses']}L "
+            f"({t['games']} games) failures: {t['illegal']} illegal, "
+            f"{t['resource']} resource, {t['crash']} crash; "
+            f"cpu {t['cpu']:.3f}s/game (max {t['max_cpu']:.3f}s), "
+            f"max space {t['max_memory']:.3f}MB")
+    lines.append("head to head (elo of player vs opponent, 95% ci):")
+    for t in summary["pairs"]:
+        lines.append(f"  {t['player']} vs {t['opponent']}: "
+            f"{t['wins']}W {t['draws']}D {t['losses']}L  "
+            f"elo {t['elo']:+.1f} [{t['elo_low']:+.1f}, {t['elo_high']:+.1f}]")
+    return "\n".join(lines)
+
+
+# COMMAND-LINE INTERFACE
+
+def get_options():
+    """Parse and return command-line arguments."""
+    parser = argparse.ArgumentParser(prog="tournament",
+        description="plays many headless games between two or more Player "
+        "classes in parallel and summarises the results.")
+    parser.add_argument('player_locs', metavar='player', nargs='+',
+        action=PackageSpecAction,
+        help="location of a Player class (package name, as for the referee)")
+    parser.add_argument('-n', '--games', type=int, default=GAMES_DEFAULT,
+        help="number of games between each pair of players "
+        "(default: %(default)s).")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+        help="number of worker processes (default: one per CPU).")
+    parser.add_argument('-t', '--time', metavar="time_limit", type=float,
+        default=0, help="limit on CPU time (float, seconds) for each player "
+        "per game (default: no limit).")
+    parser.add_argument('-s', '--space', metavar="space_limit", type=float,
+        default=0, help="limit on memory space (float, MB) for each player "
+        "(default: no limit).")
+    parser.add_argument('-A', '--accounting', choices=ACCOUNTING_MODES,
+        default=ACCOUNTING_DEFAULT, help="how carefully to account for "
+        "resources (see the referee's help; default: %(default)s).")
+    parser.add_argument('-I', '--isolate', action="store_true",
+        help="run each player in a process of its own, with its own space "
+        "limit (see `Referee.isolation`).")
+    parser.add_argument('-o', '--output', metavar="RESULTS",
+        type=argparse.FileType('w'), default=None,
+        help="write a JSON record of each game to this file as it finishes.")
+    parser.add_argument('-T', '--telemetry', metavar="TELEMETRY_DIR",
+        default=None, help="write a JSON record of every player call to "
+        "files in this directory (one per worker process).")
+    parser.add_argument('-R', '--records', metavar="RECORD_DIR",
+        default=None, help="write a binary record of each game to this "
+        "directory (see `python -m Referee.record`).")
+    parser.add_argument('-P', '--profile', metavar="PROFILE_DIR",
+        default=None, help="profile every call to each player (not engines) "
+        "and write each player's profile over all its games to this "
+        "directory (see `Referee.profiling`).")
+    parser.add_argument('--profile-mode', choices=PROFILE_MODES,
+        default=PROFILE_MODES[0], help="sample: (default) sample the "
+        "players' stacks, for flame graphs; cprofile: profile every "
+        "function call with cProfile.")
+    parser.add_argument('-v', '--verbosity', type=int, choices=range(0, 2),
+        default=1, help="0: print only the summary; 1: (default) also "
+        "report progress.")
+    args = parser.parse_args()
+    if len(args.player_locs) < 2:
+        parser.error("at least two players are required")
+    return args
+
+def main():
+    options = get_options()
+    out = StarLog(level=options.verbosity)
+    labels = _player_labels(options.player_locs)
+    try:
+        records = tournament(options.player_locs, options.games,
+            jobs=options.jobs, time_limit=options.time,
+            space_limit=options.space, accounting=options.accounting,
+            out_function=out.comment,
+            results_file=options.output, telemetry_dir=options.telemetry,
+            record_dir=options.records, isolate=options.isolate,
+            profile_dir=options.profile, profile_mode=options.profile_mode)
+    except KeyboardInterrupt:
+        print() # (end the line)
+        out.comment("bye!")
+        return
+    finally:
+        if options.output is not None:
+            options.output.close()
+    out.print(format_summary(summarise(records, labels)))
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,12 @@
-from ..game import Game
-from ..strategy import Heuristic
+import time
+from ..game import Game, History
+from ..strategy import Strategy, Material
+from ..search import AlphaBeta, FEATURES
+from ..solver import ProofNumberSolver
+from ..sharedtable import SharedTable
+from ..parallel import SearchWorkers
+from ..memory import MB, componentUsage, searchTableEntries, \
+    solverTableEntries
 
 # Constants
 BOARD_SIZE = 8
@@ -8,13 +15,47 @@ COLOUR_IDX = 1
 WHITE = 0
 BLACK = 1
 LEGAL_BOOM_SHAPES = ((2, 2, 2), (3, 3, 2), (2, 3, 2), (3, 2, 2))
+# CPU seconds we allow ourselves over the whole game, kept below the
+# referee's usual 60 second limit, and spread over this many future moves
+TIME_BUDGET = 50.0
+MOVES_TO_GO = 40
+MIN_MOVE_TIME = 0.05
+# Selective search features to use (see Src.search)
+SEARCH_FEATURES = FEATURES
+# Bytes each table may hold (see Src.memory), keeping the player well within
+# the referee's usual 100MB space limit
+MEMORY_BUDGETS = {"search_table": 48 * MB, "solver_table": 16 * MB}
+# Helper processes to search alongside ours, sharing a table with it (see
+# Src.parallel). None by default: the referee charges us for our own
+# process's CPU time only, so helpers would be using time it cannot see.
+# (Nor can helpers be started from the referee's player processes, which
+# are daemons, under -I)
+SEARCH_WORKERS = 0
 
 
 class Player:
     def __init__(self, colour):
         self.colour = WHITE if colour == 'white' else BLACK
         self.state = Game.initState()
-        # self.strategy = Strategy()
+        self.history = History(self.state, WHITE)
+        self.budgets = MEMORY_BUDGETS
+        table = workers = None
+        if SEARCH_WORKERS:
+            table = SharedTable.create(
+                SharedTable.entriesFor(self.budgets["search_table"]))
+            try:
+                workers = SearchWorkers(SEARCH_WORKERS, table.name,
+                                        SEARCH_FEATURES)
+            except BaseException:
+                table.close()
+                raise
+        search = AlphaBeta(Material, features=SEARCH_FEATURES,
+            tableSize=searchTableEntries(self.budgets["search_table"]),
+            table=table)
+        solver = ProofNumberSolver(
+            tableSize=solverTableEntries(self.budgets["solver_table"]))
+        self.strategy = Strategy(search, Material, solver, workers)
+        self.timeUsed = 0.0
 
     def action(self):
         """
@@ -25,7 +66,28 @@ class Player:
         return an allowed action to play on this turn. The action must be
         represented based on the spec's instructions for representing actions.
         """
-        return Heuristic.evaluate(self.state, self.colour)
+        start = time.process_time()
+        budget = max(MIN_MOVE_TIME, (TIME_BUDGET - self.timeUsed) / MOVES_TO_GO)
+        action = self.strategy.chooseAction(self.state, self.colour,
+                                            timeLimit=budget,
+                                            history=self.history)
+        self.timeUsed += time.process_time() - start
+        return action
+
+    # Reports statistics from the last search, and the bytes held by each
+    # component, to the referee's telemetry
+    def stats(self):
+        if self.strategy.proven:
+            stats = {"proven": True, "solver_nodes": self.strategy.solver.nodes}
+        else:
+            stats = self.strategy.search.stats.asDict()
+        stats["memory"] = componentUsage(self.strategy)
+        return stats
+
+    # Called by the referee once the game is over: ends any helper processes
+    # and releases the shared table
+    def close(self):
+        self.strategy.close()
 
     def update(self, colour, action):
         """
@@ -45,9 +107,6 @@ class Player:
         for the player colour (your method does not need to validate the action
         against the game rules).
         """
-        if action[0] == "MOVE":
-            n, prev, to = action[1], action[2], action[3]
-            self.state = Game.movePiece(n, prev, to, self.state)
-
-        if action[0] == "BOOM":
-            self.state = Game.boomPiece(action[1], self.state)
+        self.state = Game.applyAction(action, self.state)
+        nextColour = BLACK if colour == 'white' else WHITE
+        self.history.push(action, self.state, nextColour)
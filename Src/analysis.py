@@ -0,0 +1,234 @@
+"""
+Post-game analysis of recorded games (see Referee.record).
+
+Each game is replayed through Src.game and every position in it is searched
+again at a fixed budget, deeper than in play. By default that is twice the
+CPU time the player (see Src.Players.player) gives an average move, which
+takes the search a ply or two beyond the 6 to 9 plies it reaches in play on
+one CPU. A fixed depth (-d) makes reports reproducible, but should be at
+least as deep to judge the moves played. A ply is flagged as a blunder when
+the score of the move played falls short of the best score found by at
+least a threshold; a position the search could not finish depth 1 in is
+left unjudged. Games are analysed in parallel across a process pool, and
+each game's report is appended to the output file (one line of JSON) as soon
+as it is finished, so an interrupted run can be resumed: games already in
+the output are skipped. An aggregate report over all games in the output is
+printed at the end.
+
+usage: python -m Src.analysis [-o OUTPUT] [-d DEPTH | -t SECONDS] [-j JOBS]
+                              [--threshold TOKENS] [--summary FILE]
+                              RECORD_DIR
+"""
+
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+
+from Referee.record import read_record
+from Src.game import Game, History, WHITE
+from Src.search import AlphaBeta, WIN, MAX_PLY
+from Src.strategy import Material
+from Src.Players.player import TIME_BUDGET, MOVES_TO_GO
+
+# CPU seconds to search each position for, unless given a depth or time
+TIME_DEFAULT = 2 * TIME_BUDGET / MOVES_TO_GO
+# Loss in score (tokens) for a move to count as a blunder
+THRESHOLD_DEFAULT = 2
+OUTPUT_DEFAULT = "analysis.jsonl"
+COLOURS = ("white", "black")
+
+
+# Replays one recorded game, searching each position and scoring the
+# move that was played. Returns a report of the game
+def analyseGame(path, depth=None, timeLimit=None, threshold=THRESHOLD_DEFAULT):
+    record = read_record(path)
+    engine = AlphaBeta(Material)
+    state, colour = Game.initState(), WHITE
+    history = History(state, colour)
+    plies, blunders = [], []
+    for ply, played in enumerate(record.actions()):
+        if Game.gameOver(state):
+            break
+        best = engine.search(state, colour, depth, timeLimit, history)
+        bestScore, searched = engine.score, engine.stats.depth()
+        entry = {"ply": ply + 1, "colour": COLOURS[colour],
+                 "played": played, "best": _plain(best), "depth": searched,
+                 "played_score": None, "best_score": None, "loss": None}
+        # (out of time before depth 1, there is no score to judge the move
+        # by: engine.score is still the last ply's)
+        if searched:
+            if _sameAction(played, best):
+                playedScore = bestScore
+            else:
+                child = Game.applyAction(played, state)
+                childHistory = history.copy()
+                childHistory.push(played, child, 1 - colour)
+                playedScore = -engine.scorePosition(child, 1 - colour,
+                                                    searched - 1,
+                                                    childHistory)
+            entry.update(played_score=playedScore, best_score=bestScore,
+                         loss=_clamp(bestScore) - _clamp(playedScore))
+            if entry["loss"] >= threshold:
+                blunders.append(entry)
+        plies.append(entry)
+        state = Game.applyAction(played, state)
+        colour = 1 - colour
+        history.push(played, state, colour)
+
+    report = {"game": os.path.basename(path), "white": record.white,
+              "black": record.black, "result": record.result,
+              "plies": len(record), "blunders": blunders, "sides": {}}
+    # (moves not searched to depth 1 are left out of the figures, and
+    # counted as unjudged)
+    for side in COLOURS:
+        losses = [p["loss"] for p in plies
+                  if p["colour"] == side and p["depth"]]
+        report["sides"][side] = {
+            "moves": len(losses),
+            "unjudged": sum(1 for p in plies
+                            if p["colour"] == side and not p["depth"]),
+            "blunders": sum(1 for b in blunders if b["colour"] == side),
+            "mean_loss": sum(losses) / len(losses) if losses else 0.0,
+        }
+    return report
+
+
+# Scores beyond this are forced results; count them as a large material
+# swing so one forced loss doesn't dominate the averages
+def _clamp(score):
+    bound = 2 * 12
+    if abs(score) >= WIN - MAX_PLY:
+        return bound if score > 0 else -bound
+    return score
+
+
+def _plain(action):
+    if action[0] == "BOOM":
+        return ("BOOM", (int(action[1][0]), int(action[1][1])))
+    _, n, a, b = action
+    return ("MOVE", int(n), (int(a[0]), int(a[1])), (int(b[0]), int(b[1])))
+
+
+def _sameAction(a, b):
+    return tuple(a) == _plain(b)
+
+
+def _analyseTask(task):
+    path, depth, timeLimit, threshold = task
+    return analyseGame(path, depth, timeLimit, threshold)
+
+
+# Reads the names of games already analysed in an earlier run
+def _finishedGames(outputPath):
+    finished = set()
+    if not os.path.exists(outputPath):
+        return finished
+    with open(outputPath) as f:
+        for line in f:
+            try:
+                finished.add(json.loads(line)["game"])
+            except (ValueError, KeyError):
+                # A line cut short by an interrupted run; analyse it again
+                continue
+    return finished
+
+
+# Analyses every record in a directory not already in the output file,
+# appending each game's report to it as it finishes
+def run(recordDir, outputPath, depth=None, timeLimit=None,
+        threshold=THRESHOLD_DEFAULT, jobs=None, out=sys.stderr):
+    finished = _finishedGames(outputPath)
+    paths = sorted(os.path.join(recordDir, name)
+                   for name in os.listdir(recordDir)
+                   if name.endswith(".exb") and name not in finished)
+    print(f"{len(finished)} games already analysed, {len(paths)} to go",
+          file=out)
+    tasks = [(path, depth, timeLimit, threshold) for path in paths]
+    with open(outputPath, "a+") as output, \
+            multiprocessing.Pool(jobs) as pool:
+        # Don't append to a line cut short by an interrupted run
+        if output.tell() > 0:
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+        reports = pool.imap_unordered(_analyseTask, tasks)
+        for done, report in enumerate(reports, 1):
+            output.write(json.dumps(report) + "\n")
+            output.flush()
+            print(f"{done}/{len(tasks)} {report['game']}: "
+                  f"{len(report['blunders'])} blunders", file=out)
+
+
+# Aggregates the per-game reports in an output file, per player
+def summarise(outputPath):
+    players = {}
+    games = 0
+    with open(outputPath) as f:
+        for line in f:
+            try:
+                report = json.loads(line)
+            except ValueError:
+                continue
+            games += 1
+            for colour in COLOURS:
+                name, side = report[colour], report["sides"][colour]
+                tally = players.setdefault(name, {"games": 0, "moves": 0,
+                                                  "unjudged": 0,
+                                                  "blunders": 0, "loss": 0.0})
+                tally["games"] += 1
+                tally["moves"] += side["moves"]
+                tally["unjudged"] += side.get("unjudged", 0)
+                tally["blunders"] += side["blunders"]
+                tally["loss"] += side["mean_loss"] * side["moves"]
+    for tally in players.values():
+        loss, moves = tally.pop("loss"), tally["moves"]
+        tally["mean_loss"] = loss / moves if moves else 0.0
+        tally["blunder_rate"] = tally["blunders"] / moves if moves else 0.0
+    return {"games": games, "players": players}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="analysis",
+        description="re-search every position of a directory of recorded "
+        "games and flag blunders.")
+    parser.add_argument("records", metavar="RECORD_DIR",
+        help="directory of game records (*.exb) to analyse.")
+    parser.add_argument("-o", "--output", default=OUTPUT_DEFAULT,
+        help="file to append per-game reports to; games already in it are "
+        "skipped (default: %(default)s).")
+    budget = parser.add_mutually_exclusive_group()
+    budget.add_argument("-d", "--depth", type=int, default=None,
+        help="depth to search each position to.")
+    budget.add_argument("-t", "--time", type=float, default=None,
+        metavar="SECONDS", help="CPU time to search each position for "
+        f"(default: {TIME_DEFAULT:g}, twice a move's budget in play).")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes (default: one per CPU).")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD_DEFAULT,
+        metavar="TOKENS", help="loss in score that counts as a blunder "
+        "(default: %(default)s).")
+    parser.add_argument("--summary", type=argparse.FileType("w"),
+        default=None, metavar="FILE",
+        help="also write the aggregate report to this file as JSON.")
+    args = parser.parse_args()
+    timeLimit = args.time
+    if args.depth is None and timeLimit is None:
+        timeLimit = TIME_DEFAULT
+
+    try:
+        run(args.records, args.output, args.depth, timeLimit, args.threshold,
+            args.jobs)
+    except KeyboardInterrupt:
+        print("interrupted; run again to resume", file=sys.stderr)
+        sys.exit(1)
+    summary = summarise(args.output)
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    if args.summary is not None:
+        json.dump(summary, args.summary, indent=2)
+
+
+if __name__ == "__main__":
+    main()
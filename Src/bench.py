@@ -0,0 +1,204 @@
+"""
+Search benchmark: run the engine on a fixed set of positions, once to a
+fixed depth and once for each of a set of fixed CPU time budgets, and
+emit the results as JSON so runs can be compared across commits.
+
+Each run records nodes searched, nodes per second, the CPU time taken to
+complete each depth, the effective branching factor, the transposition
+table hit rate and the peak memory allocated by the search (measured with
+tracemalloc in a separate, untimed pass).
+
+It also measures the player's start-up in fresh interpreters: the time to
+import it and the CPU time its constructor takes (which the referee charges
+to the player), failing if the latter exceeds a target.
+
+usage: python -m Src.bench [-d DEPTH] [-t SECONDS ...] [-o FILE]
+                           [--compare BASELINE] [--startup-target SECONDS]
+                           [--disable FEATURE ...]
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from Src.positions import POSITIONS, getPosition
+from Src.search import AlphaBeta, FEATURES
+from Src.strategy import Material
+
+DEPTH_DEFAULT = 2
+TIME_LIMITS_DEFAULT = [0.5, 2.0]
+# Relative drop in nodes per second treated as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+# CPU seconds Player.__init__ may take, and how many fresh interpreters to
+# measure it in (keeping the fastest)
+STARTUP_TARGET = 0.05
+STARTUP_RUNS = 5
+_STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from Src import Player
+imported = time.perf_counter() - start
+start = time.process_time()
+Player("white")
+print(json.dumps([imported, time.process_time() - start]))
+"""
+
+
+# Searches a position with a fresh engine, returning the stats and
+# the chosen action
+def runSearch(name, maxDepth=None, timeLimit=None, features=FEATURES):
+    state, colour = getPosition(name)
+    engine = AlphaBeta(Material, features=features)
+    action = engine.search(state, colour, maxDepth, timeLimit)
+    return engine.stats, action
+
+
+# Peak memory in bytes allocated while searching a position to a depth
+def peakMemory(name, depth, features=FEATURES):
+    tracemalloc.start()
+    try:
+        runSearch(name, maxDepth=depth, features=features)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def benchPosition(name, depth, timeLimits, features=FEATURES):
+    results = []
+    runs = [("depth", depth, None)]
+    runs += [("time", None, limit) for limit in timeLimits]
+    for mode, maxDepth, timeLimit in runs:
+        stats, action = runSearch(name, maxDepth, timeLimit, features)
+        result = {"position": name, "mode": mode,
+                  "max_depth": maxDepth, "time_limit": timeLimit,
+                  "action": repr(_normalise(action))}
+        result.update(stats.asDict())
+        result["peak_memory"] = peakMemory(name, stats.depth(), features)
+        results.append(result)
+    return results
+
+
+# Times importing and constructing the player in fresh interpreters
+def startupTime(runs=STARTUP_RUNS):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT],
+                                cwd=root, capture_output=True, text=True,
+                                check=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    return {"import_seconds": min(s[0] for s in samples),
+            "init_seconds": min(s[1] for s in samples)}
+
+
+def _normalise(action):
+    return tuple(tuple(int(i) for i in a) if isinstance(a, tuple)
+                 else a if isinstance(a, str) else int(a) for a in action)
+
+
+def _gitRevision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, depth, timeLimits, features=FEATURES):
+    return {
+        "meta": {
+            "revision": _gitRevision(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "features": list(features),
+        },
+        "results": [r for name in names
+                    for r in benchPosition(name, depth, timeLimits, features)],
+        "startup": startupTime(),
+    }
+
+
+# Compares fixed-depth runs against a baseline report, printing the change
+# in speed for each position. Returns False if any position has regressed
+def compare(report, baseline, out=sys.stderr):
+    ok = True
+    before = {r["position"]: r for r in baseline["results"]
+              if r["mode"] == "depth"}
+    for result in report["results"]:
+        old = before.get(result["position"])
+        if result["mode"] != "depth" or old is None:
+            continue
+        if old["max_depth"] != result["max_depth"]:
+            continue
+        change = result["nps"] / old["nps"] - 1 if old["nps"] else 0.0
+        verdict = ""
+        if change < -REGRESSION_THRESHOLD:
+            verdict = "  REGRESSION"
+            ok = False
+        if result["nodes"] != old["nodes"]:
+            verdict += "  (tree changed)"
+        print(f"{result['position']:18s} nps {old['nps']:9.0f} -> "
+              f"{result['nps']:9.0f} ({change:+.1%}){verdict}", file=out)
+    if "startup" in baseline:
+        old, new = baseline["startup"], report["startup"]
+        print(f"{'startup':18s} init {old['init_seconds']:.4f}s -> "
+              f"{new['init_seconds']:.4f}s, import {old['import_seconds']:.3f}s"
+              f" -> {new['import_seconds']:.3f}s", file=out)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench",
+        description="benchmark the search on a fixed set of positions.")
+    parser.add_argument("-d", "--depth", type=int, default=DEPTH_DEFAULT,
+        help="fixed depth to search each position to (default: %(default)s).")
+    parser.add_argument("-t", "--time", type=float, nargs="*",
+        default=TIME_LIMITS_DEFAULT, metavar="SECONDS",
+        help="CPU time budgets to search each position for "
+        "(default: %(default)s).")
+    parser.add_argument("-p", "--position", nargs="+", choices=POSITIONS,
+        default=list(POSITIONS), metavar="POSITION",
+        help="names of positions to benchmark (default: all).")
+    parser.add_argument("-o", "--output", type=argparse.FileType("w"),
+        default=sys.stdout, help="file to write JSON results to "
+        "(default: stdout).")
+    parser.add_argument("--compare", type=argparse.FileType("r"),
+        metavar="BASELINE", help="JSON results of an earlier run; exit with "
+        "an error if nodes per second has regressed.")
+    parser.add_argument("--startup-target", type=float, default=STARTUP_TARGET,
+        metavar="SECONDS", help="exit with an error if constructing the "
+        "player takes more CPU time than this (default: %(default)s).")
+    parser.add_argument("--disable", nargs="+", choices=FEATURES, default=[],
+        metavar="FEATURE", help="selective search features to switch off "
+        f"(any of: {', '.join(FEATURES)}).")
+    args = parser.parse_args()
+
+    features = [f for f in FEATURES if f not in args.disable]
+    report = run(args.position, args.depth, args.time, features)
+    json.dump(report, args.output, indent=2)
+    args.output.write("\n")
+    ok = True
+    if args.compare is not None:
+        ok = compare(report, json.load(args.compare))
+    if report["startup"]["init_seconds"] > args.startup_target:
+        print(f"startup: Player.__init__ took "
+              f"{report['startup']['init_seconds']:.4f}s, over the target of "
+              f"{args.startup_target}s", file=sys.stderr)
+        ok = False
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
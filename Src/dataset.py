@@ -0,0 +1,265 @@
+"""
+A fixed-record binary dataset of training positions, for random access.
+
+A dataset NAME is two files, each a 16 byte header followed by an array of
+fixed-size records that numpy can memory-map:
+
+* NAME.pos -- one record per position (see RECORD): the board packed one
+  byte per square, as the board part of a position key (see
+  Referee.position: stack count in the low 7 bits, colour in the high bit,
+  empty squares 0, squares in the same order as the state), the colour
+  to move, the result of the game for the side to move (+1, 0, -1) and a
+  target score for the side to move;
+* NAME.idx -- one record per game (see INDEX_RECORD): where the game's
+  positions start in NAME.pos, how many there are and the game's id (for
+  a dataset built from game records, the number of its record file in the
+  directory, in name order, counting any skipped), so that datasets can
+  be split by game. Games are always looked up by id, never by their
+  place in the index.
+
+BatchSampler draws shuffled minibatches without reading the whole dataset
+into memory: each epoch it visits blocks of consecutive records in random
+order, and shuffles the records of a few blocks at a time.
+
+usage: python -m Src.dataset build RECORD_DIR -o NAME [-d DEPTH]
+       python -m Src.dataset info NAME
+"""
+
+import os
+import sys
+import struct
+import argparse
+
+import numpy as np
+
+from Src.game import Game, History, BOARD_SIZE, STACK_IDX, COLOUR_IDX, \
+    WHITE
+from Src.search import AlphaBeta
+from Src.strategy import Material
+from Referee.position import BLACK_BIT
+
+MAGIC = {"pos": b"EXPD", "idx": b"EXPI"}
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")  # magic, version, record size, records
+
+RECORD = np.dtype([("board", np.uint8, BOARD_SIZE * BOARD_SIZE),
+                   ("colour", np.uint8),
+                   ("result", np.int8),
+                   ("score", "<i2")])
+INDEX_RECORD = np.dtype([("start", "<u8"), ("count", "<u4"),
+                         ("game", "<u4")])
+COLOUR_BIT = BLACK_BIT
+
+# Records per block, and blocks shuffled together, when sampling
+BLOCK_SIZE = 4096
+BLOCKS_PER_BUFFER = 16
+
+
+# Packs 8x8x2 states (or a stack of them) into one byte per square, as in
+# the board part of their position keys
+def packBoards(states):
+    stacks = states[..., STACK_IDX].astype(np.uint8)
+    colours = states[..., COLOUR_IDX].astype(np.uint8)
+    packed = (stacks | (colours * COLOUR_BIT).astype(np.uint8)) * (stacks > 0)
+    return packed.reshape(packed.shape[:-2] + (BOARD_SIZE * BOARD_SIZE,))
+
+
+# Unpacks boards packed by packBoards into 8x8x2 states
+def unpackBoards(boards):
+    boards = np.asarray(boards)
+    states = np.empty(boards.shape[:-1] + (BOARD_SIZE, BOARD_SIZE, 2),
+                      np.int8)
+    squares = boards.reshape(boards.shape[:-1] + (BOARD_SIZE, BOARD_SIZE))
+    states[..., STACK_IDX] = squares & (COLOUR_BIT - 1)
+    states[..., COLOUR_IDX] = squares >> 7
+    return states
+
+
+def _writeHeader(f, kind, dtype, count):
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC[kind], VERSION, dtype.itemsize, count))
+
+
+def _readHeader(path, kind, dtype):
+    with open(path, "rb") as f:
+        magic, version, size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC[kind] or version != VERSION or size != dtype.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} dataset file")
+    return count
+
+
+# Appends positions to a dataset, a game at a time
+class DatasetWriter:
+
+    def __init__(self, name):
+        self.name = name
+        self.positions = open(name + ".pos", "wb")
+        self.index = open(name + ".idx", "wb")
+        _writeHeader(self.positions, "pos", RECORD, 0)
+        _writeHeader(self.index, "idx", INDEX_RECORD, 0)
+        self.count = 0
+        self.games = 0
+
+    # Writes the positions of one game: states, the colour to move in each,
+    # the target scores (clipped to 16 bits, so forced results are stored as
+    # +-32767), and the result of the game ("white", "black" or
+    # "draw")
+    def addGame(self, states, colours, scores, result, game=None):
+        records = np.zeros(len(states), RECORD)
+        records["board"] = packBoards(np.asarray(states))
+        records["colour"] = colours
+        records["score"] = np.clip(scores, -32768, 32767)
+        if result in ("white", "black"):
+            winner = WHITE if result == "white" else 1 - WHITE
+            records["result"] = np.where(records["colour"] == winner, 1, -1)
+        self.positions.write(records.tobytes())
+        entry = np.array([(self.count, len(records),
+                           self.games if game is None else game)],
+                         INDEX_RECORD)
+        self.index.write(entry.tobytes())
+        self.count += len(records)
+        self.games += 1
+
+    def close(self):
+        _writeHeader(self.positions, "pos", RECORD, self.count)
+        _writeHeader(self.index, "idx", INDEX_RECORD, self.games)
+        self.positions.close()
+        self.index.close()
+
+
+# A dataset opened for reading: .records and .index are read-only memory
+# maps over the files
+class Dataset:
+
+    def __init__(self, name):
+        count = _readHeader(name + ".pos", "pos", RECORD)
+        games = _readHeader(name + ".idx", "idx", INDEX_RECORD)
+        self.records = _memmap(name + ".pos", RECORD, count)
+        self.index = _memmap(name + ".idx", INDEX_RECORD, games)
+        # The row of each game id in the index, built when first needed
+        self.gameRows = None
+
+    def __len__(self):
+        return len(self.records)
+
+    # Returns the ids of the games in the dataset, in the order they were
+    # written
+    def games(self):
+        return self.index["game"].astype(np.int64)
+
+    # Returns the indices of the records of the games with the given ids
+    # (e.g. for a split into training and validation games); raises
+    # KeyError for an id not in the dataset
+    def gameRecords(self, games):
+        if self.gameRows is None:
+            self.gameRows = {int(game): row
+                             for row, game in enumerate(self.index["game"])}
+        rows = [self.gameRows[int(game)] for game in games]
+        return np.concatenate(
+            [np.arange(start, start + count, dtype=np.int64)
+             for start, count in self.index[["start", "count"]][rows]]
+            or [np.zeros(0, np.int64)])
+
+
+def _memmap(path, dtype, count):
+    if count == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype, "r", offset=HEADER.size, shape=(count,))
+
+
+# Yields shuffled minibatches of records (copied out of the memory map)
+class BatchSampler:
+
+    def __init__(self, dataset, batchSize, seed=None, blockSize=BLOCK_SIZE,
+                 blocksPerBuffer=BLOCKS_PER_BUFFER, dropLast=False):
+        self.records = dataset.records
+        self.batchSize = batchSize
+        self.blockSize = blockSize
+        self.blocksPerBuffer = blocksPerBuffer
+        self.dropLast = dropLast
+        self.rng = np.random.default_rng(seed)
+
+    # One pass over the dataset in a fresh random order
+    def epoch(self):
+        n = len(self.records)
+        blocks = self.rng.permutation((n + self.blockSize - 1)
+                                      // self.blockSize)
+        leftover = self.records[:0].copy()
+        for i in range(0, len(blocks), self.blocksPerBuffer):
+            buffer = np.concatenate([leftover] + [
+                self.records[b * self.blockSize:(b + 1) * self.blockSize]
+                for b in np.sort(blocks[i:i + self.blocksPerBuffer])])
+            self.rng.shuffle(buffer)
+            full = len(buffer) - len(buffer) % self.batchSize
+            for j in range(0, full, self.batchSize):
+                yield buffer[j:j + self.batchSize]
+            leftover = buffer[full:]
+        if len(leftover) and not self.dropLast:
+            yield leftover
+
+    def __iter__(self):
+        return self.epoch()
+
+
+# Converts a directory of game records (see Referee.record) into a dataset,
+# scoring each position with a search to the given depth (0 for the
+# material balance)
+def build(recordDir, name, depth=0, out=sys.stderr):
+    from Referee.record import read_record
+
+    search = AlphaBeta(Material)
+    writer = DatasetWriter(name)
+    try:
+        files = sorted(f for f in os.listdir(recordDir) if f.endswith(".exb"))
+        for game, file in enumerate(files):
+            record = read_record(os.path.join(recordDir, file))
+            if record.result is None or record.result == "aborted":
+                continue
+            states, colours, scores = [], [], []
+            state, colour = Game.initState(), WHITE
+            history = History(state, colour)
+            for action in record.actions():
+                states.append(state)
+                colours.append(colour)
+                scores.append(search.scorePosition(state, colour, depth,
+                                                   history))
+                state = Game.applyAction(action, state)
+                colour = 1 - colour
+                history.push(action, state, colour)
+            writer.addGame(states, colours, scores, record.result, game)
+    finally:
+        writer.close()
+    print(f"wrote {writer.count} positions from {writer.games} games to "
+          f"{name}.pos and {name}.idx", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="dataset",
+        description="build or inspect a dataset of training positions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    buildParser = commands.add_parser("build",
+        help="convert a directory of game records into a dataset.")
+    buildParser.add_argument("records", metavar="RECORD_DIR")
+    buildParser.add_argument("-o", "--output", required=True, metavar="NAME",
+        help="dataset to write (NAME.pos and NAME.idx).")
+    buildParser.add_argument("-d", "--depth", type=int, default=0,
+        help="depth to search each position to for its target score "
+        "(default: %(default)s, the material balance).")
+    infoParser = commands.add_parser("info", help="summarise a dataset.")
+    infoParser.add_argument("name", metavar="NAME")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.records, args.output, args.depth)
+    else:
+        dataset = Dataset(args.name)
+        results = np.asarray(dataset.records["result"])
+        print(f"{len(dataset)} positions from {len(dataset.index)} games "
+              f"({RECORD.itemsize} bytes each); results for the side to "
+              f"move: {int((results > 0).sum())} won, "
+              f"{int((results == 0).sum())} drawn, "
+              f"{int((results < 0).sum())} lost")
+
+
+if __name__ == "__main__":
+    main()
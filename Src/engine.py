@@ -0,0 +1,230 @@
+"""
+A long-lived engine process for the Src player, speaking the line-based text
+protocol described in Referee.engine on stdin/stdout. The search and its
+tables are built once and kept warm across games.
+
+With --workers, helper processes search alongside the engine's search,
+sharing its transposition table in shared memory (see Src.parallel), which
+is released when the engine quits.
+
+usage: python -m Src.engine [--disable FEATURE ...] [--set NAME=VALUE ...]
+                            [--workers N]
+"""
+
+import sys
+import time
+import argparse
+import traceback
+import threading
+
+from Referee.engine import format_action, parse_action
+from Referee.position import from_text, to_state, NO_COLOUR
+from Src.game import Game, History, WHITE
+from Src.positions import getPosition
+from Src.search import AlphaBeta, FEATURES
+from Src.solver import ProofNumberSolver
+from Src.strategy import Strategy, Material
+from Src.tune import PARAMETERS, applyValues
+from Src.memory import searchTableEntries, solverTableEntries
+from Src.sharedtable import SharedTable
+from Src.parallel import SearchWorkers
+# Time constants are read from the module when needed, so that the tuner
+# can set them (see Src.tune)
+import Src.Players.player as player
+
+
+class Engine:
+
+    # workers is the number of helper processes to search with, and values
+    # any tuned parameters (see Src.tune) for them to use too
+    def __init__(self, out=sys.stdout, features=FEATURES, workers=0,
+                 values=None):
+        self.out = out
+        budgets = player.MEMORY_BUDGETS
+        table = helpers = None
+        if workers:
+            table = SharedTable.create(
+                SharedTable.entriesFor(budgets["search_table"]))
+            helpers = SearchWorkers(workers, table.name, features, values)
+        search = AlphaBeta(Material, features=features,
+            tableSize=searchTableEntries(budgets["search_table"]),
+            table=table)
+        solver = ProofNumberSolver(
+            tableSize=solverTableEntries(budgets["solver_table"]))
+        self.strategy = Strategy(search, Material, solver, helpers)
+        self.search = self.strategy.search
+        self.thread = None
+        # Search once before reporting ready, so that the memory the search
+        # thread sets up is counted as part of the engine's start-up
+        self.newGame()
+        self.go(["depth", "1"], reply=False)
+        self.newGame()
+
+    def newGame(self):
+        self.wait()
+        self.search.table.clear()
+        self.strategy.solver.table.clear()
+        self.strategy.plan = None
+        self.state, self.colour = Game.initState(), WHITE
+        self.history = History(self.state, self.colour)
+        self.timeUsed = 0.0
+
+    # Writes one reply line (from either thread)
+    def send(self, line):
+        self.out.write(line + "\n")
+        self.out.flush()
+
+    # Handles one command line; returns False once told to quit
+    def handle(self, line):
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        try:
+            if command == "quit":
+                self.stop()
+                return False
+            elif command == "isready":
+                self.wait()
+                self.send("readyok")
+            elif command == "newgame":
+                self.newGame()
+            elif command == "position":
+                self.setPosition(args)
+            elif command == "move":
+                self.wait()
+                self.play(parse_action(args[0]))
+            elif command == "go":
+                self.go(args)
+            elif command == "stop":
+                self.stop()
+            else:
+                self.send(f"error unknown command: {command}")
+        except (IndexError, KeyError, ValueError) as e:
+            self.send(f"error bad arguments to {command}: {e}")
+        return True
+
+    def setPosition(self, args):
+        self.wait()
+        if args[0] == "startpos":
+            state, colour = Game.initState(), WHITE
+        elif ":" in args[0]:
+            state, colour = to_state(from_text(args[0]))
+            if colour == NO_COLOUR:
+                raise ValueError("position key has no colour to move")
+        else:
+            state, colour = getPosition(args[0])
+        actions = []
+        if len(args) > 1:
+            if args[1] != "moves":
+                raise ValueError(f"expected 'moves', not {args[1]!r}")
+            actions = [parse_action(text) for text in args[2:]]
+        # (the game before the given position is unknown)
+        self.state, self.colour = state, colour
+        self.history = History(state, colour)
+        for action in actions:
+            self.play(action)
+
+    def play(self, action):
+        self.state = Game.applyAction(action, self.state)
+        self.colour = 1 - self.colour
+        self.history.push(action, self.state, self.colour)
+
+    # Starts searching the current position in a background thread, so that
+    # a stop command can still be read
+    def go(self, args, reply=True):
+        self.wait()
+        options = dict(zip(args[::2], args[1::2]))
+        maxDepth = int(options["depth"]) if "depth" in options else None
+        if "movetime" in options:
+            timeLimit = float(options["movetime"])
+        elif "time" in options:
+            timeLimit = max(player.MIN_MOVE_TIME,
+                            float(options["time"]) / player.MOVES_TO_GO)
+        elif maxDepth is None:
+            timeLimit = max(player.MIN_MOVE_TIME,
+                            (player.TIME_BUDGET - self.timeUsed)
+                            / player.MOVES_TO_GO)
+        else:
+            timeLimit = None
+        self.strategy.resume()
+        self.thread = threading.Thread(target=self.think,
+                                       args=(maxDepth, timeLimit, reply))
+        self.thread.start()
+
+    # A search that fails is reported as an error instead of a bestmove, so
+    # that the referee blames the engine rather than waiting for a move
+    def think(self, maxDepth, timeLimit, reply=True):
+        start = time.process_time()
+        try:
+            action = self.strategy.chooseAction(self.state, self.colour,
+                                                maxDepth, timeLimit,
+                                                self.history)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            self.send(f"error search failed: {e!r}")
+            return
+        finally:
+            self.timeUsed += time.process_time() - start
+        if not reply:
+            return
+        if self.strategy.proven:
+            self.send(f"info proven nodes {self.strategy.solver.nodes}")
+        else:
+            stats = self.search.stats
+            self.send(f"info depth {stats.depth()} score {self.search.score} "
+                      f"nodes {stats.nodes} nps {stats.nps():.0f} "
+                      f"time {stats.elapsed:.3f}"
+                      + (f" helpernodes {stats.helperNodes}"
+                         if self.strategy.workers is not None else ""))
+        self.send(f"bestmove {format_action(action)}")
+
+    def stop(self):
+        if self.thread is not None:
+            self.strategy.stop()
+            self.wait()
+
+    # Waits for any search in progress to finish
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="engine",
+        description="run the player as an engine speaking a text protocol "
+        "on stdin/stdout.")
+    parser.add_argument("--disable", nargs="+", choices=FEATURES, default=[],
+        metavar="FEATURE", help="selective search features to switch off, "
+        f"for A/B testing (any of: {', '.join(FEATURES)}).")
+    parser.add_argument("--set", nargs="+", default=[], metavar="NAME=VALUE",
+        help="override tunable parameters (any of: "
+        f"{', '.join(PARAMETERS)}).")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+        help="helper processes to search alongside the engine, sharing its "
+        "transposition table (default: %(default)s).")
+    args = parser.parse_args()
+    values = {}
+    for setting in args.set:
+        name, _, value = setting.partition("=")
+        if name not in PARAMETERS:
+            parser.error(f"unknown parameter: {name}")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            parser.error(f"not a number: {setting}")
+    applyValues(values)
+    engine = Engine(features=[f for f in FEATURES if f not in args.disable],
+                    workers=args.workers, values=values)
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                break
+        engine.wait()
+    finally:
+        engine.strategy.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,15 @@
 import numpy as np
-import queue
+from Referee import rules
+from Referee.position import from_state as positionKey
 
 # Constants
 BOARD_SIZE = 8
 STACK_IDX = 0
 COLOUR_IDX = 1
-# All empty squares are also treated as white
+# Empty squares hold colour WHITE, but the rules never look at the colour of
+# an empty square (see signedSquares)
 WHITE = 0
 BLACK = 1
-LEGAL_BOOM_SHAPES = ((2, 2, 2), (3, 3, 2), (2, 3, 2), (3, 2, 2))
 
 # TODO:
 # Consider putting all meaningful constants here as all other classes
@@ -34,135 +35,240 @@ class Game:
 
         return board
 
-    # Returns the set of all possible actions a player can make
+    # Returns the state as the shared rules kernel (Referee.rules) sees it:
+    # a list of 64 signed stack sizes, positive for white and negative for
+    # black, so that empty squares have no colour
+    def signedSquares(state):
+        signs = 1 - 2 * state[:, :, COLOUR_IDX]
+        return (state[:, :, STACK_IDX] * signs).ravel().tolist()
+
+    # Returns the list of all possible actions a player can make
     def getAllActions(state, colour):
-        allMoves = Game.getAllMoves(state, colour)
-        allBooms = {("BOOM", i) for i in Game.getAllyCoords(state)}
-        return allMoves.union(allBooms)
+        return rules.actions(Game.signedSquares(state), 1 - 2 * colour)
+
+    # Returns the resultant state after applying any action
+    def applyAction(action, state):
+        if action[0] == "MOVE":
+            n, prev, to = action[1], action[2], action[3]
+            return Game.movePiece(n, prev, to, state)
+        return Game.boomPiece(action[1], state)
+
+    # Returns the number of tokens each colour has left, indexed by colour
+    def getTokenCounts(state):
+        stacks = state[:, :, STACK_IDX].astype(np.int32)
+        black = state[:, :, COLOUR_IDX] == BLACK
+        blackCount = int(stacks[black].sum())
+        return [int(stacks.sum()) - blackCount, blackCount]
 
-    # Returns the resultant state if a piece is moved
+    # The game is over once either colour has run out of tokens
+    def gameOver(state):
+        return rules.result(*Game.getTokenCounts(state)) is not None
+
+    # Returns the resultant state if a piece is moved. The destination takes
+    # the mover's colour, and a square left empty goes back to WHITE
     def movePiece(n, prev, to, state):
         newState = state.copy()
+        colour = state[prev[0], prev[1], COLOUR_IDX]
         newState[prev[0], prev[1], STACK_IDX] -= n
-        newState[to[0], to[1], STACK_IDX] += n
-        # Can infer who's turn it is from indexing state with prev
-        if newState[prev[0], prev[1], COLOUR_IDX] == BLACK:
-            if newState[prev[0], prev[1], STACK_IDX] == 0:
-                # Any empty tile is considered white
-                newState[prev[0], prev[1], COLOUR_IDX] = WHITE
-            newState[to[0], to[1], COLOUR_IDX] = BLACK
+        newState[to[0], to[1]] = (state[to[0], to[1], STACK_IDX] + n, colour)
+        if newState[prev[0], prev[1], STACK_IDX] == 0:
+            newState[prev[0], prev[1], COLOUR_IDX] = WHITE
         return newState
 
-    def legalMove(oldCoord, newCoord, state):
-        if (Game.outOfBounds(newCoord[0]) or Game.outOfBounds(newCoord[1])):
-            return False
-        tile = state[newCoord[0], newCoord[1], :]
-        # Can't move to a square occupied by enemy pieces
-        if tile[COLOUR_IDX] == WHITE and tile[STACK_IDX] != 0:
-            return False
-        return True
-
     def getAllMoves(state, colour):
-        # Coords should never be empty, otherwise the player has already lost
-        allyCoords = Game.getAllyCoords(state, colour)
-        allMoves = set()
-        for i in allyCoords:
-            stack = state[i[0], i[1], STACK_IDX]
-            moveCoords = Game.getMoveCoords(i, stack, state)
-            moveSet = Game.enumStackedMoves(i, stack, moveCoords)
-            allMoves = allMoves.union(moveSet)
-        return allMoves
+        return [a for a in Game.getAllActions(state, colour) if a[0] == "MOVE"]
 
     def getAllyCoords(state, colour):
         allies = np.where((state[:, :, COLOUR_IDX] == colour) & (state[:, :, STACK_IDX] != 0))
-        print('ALLIES: ' + str(allies))
-        # print('STATE: ' + str(state[:, :, COLOUR_IDX]))
         allyCoords = set(zip(allies[0], allies[1]))
         return allyCoords
 
-    # Returns the set of coordinates to which a piece or stack
-    # of pieces can move to
-    def getMoveCoords(coord, stack, state):
-        x, y = coord[0], coord[1]
-        coords = set()
-        for i in range(1, stack+1):
-            moves = set(filter(lambda c: Game.legalMove(coord, c, state),
-                               [(x+i, y), (x-i, y), (x, y+i), (x, y-i)]))
-            coords = coords.union(moves)
-        # print("Coords: " + str(coords))
-        return coords
-
-    def enumStackedMoves(coord, stack, moveCoords):
-        moveSet = set()
-        for i in moveCoords:
-            for n in range(1, stack+1):
-                moveSet.add(("MOVE", n, coord, i))
-        return moveSet
-
-    def outOfBounds(pos):
-        return True if pos < 0 or pos > BOARD_SIZE - 1 else False
-
     # Returns the resultant state if a piece is boomed
     def boomPiece(coord, state):
         newState = state.copy()
-        boomSets = Game.collectAllBoomed(coord, state)
-        allBoomed = boomSets[0].union(boomSets[1])
-        print("Caught in Boom: " + str(allBoomed))
-        for i in allBoomed:
-            newState[i[0], i[1], STACK_IDX] = 0
-            newState[i[0], i[1], COLOUR_IDX] = WHITE
+        boomed = Game.boomMask(coord, state)
+        squares = np.unpackbits(np.array([boomed], "<u8").view(np.uint8),
+                                bitorder="little").astype(bool)
+        newState.reshape(-1, 2)[squares] = (0, WHITE)
         return newState
 
+    # Returns a bitmask of the squares (bit x * 8 + y) caught in the chain
+    # explosion originating from a single coordinate
+    def boomMask(coord, state):
+        occupied = int.from_bytes(np.packbits(
+            state[:, :, STACK_IDX].ravel() != 0, bitorder="little").tobytes(),
+            "little")
+        return rules.boom_mask(occupied, int(coord[0] * BOARD_SIZE + coord[1]))
+
     # Finds all the pieces caught in a chain explosion originating from a
     # single coordinate
-    # Returns a doubleton 2D list with the sets of coordinates of enemy and
-    # ally pieces repsectively caught in the chain explosion
+    # Returns a doubleton 2D list with the sets of coordinates of white and
+    # black pieces respectively caught in the chain explosion
     def collectAllBoomed(coord, state):
-#         if state[coord[0], coord[1], COLOUR_IDX] == ALLY:
-#             boomList = [set(), {coord}]
-#         else:
-#             boomList = [{coord}, set()]
-        pieceColour = state[coord[0], coord[1], COLOUR_IDX]
-        boomList = [set(), {coord}] if pieceColour == BLACK else [{coord}, set()]
-        caught = queue.Queue()
-        caught.put(coord)
-        while caught.empty() is not True:
-            i = caught.get()
-            # print("CAUGHT ITERATION: " + str(i))
-#             if state[i[0], i[1], COLOUR_IDX] == ALLY:
-#                 boomList[ALLY].add(i)
-#             else:
-#                 boomList[ENEMY].add(i)
-            caughtColour = state[i[0], i[1], COLOUR_IDX]
-            boomList[caughtColour].add(i)
-            newCaught = Game.collectBoomed(i, state)
-            for j in newCaught:
-                if j in boomList[BLACK] or j in boomList[WHITE]:
-                    continue
-                caught.put(j)
+        boomList = [set(), set()]
+        for square in rules.mask_squares(Game.boomMask(coord, state)):
+            x, y = rules.COORDS[square]
+            boomList[state[x, y, COLOUR_IDX]].add((x, y))
         return boomList
 
-    # Finds the pieces caught in a singular explosion
-    # Takes a 2-tuple x,y, returns set of 2-tuple coordinates of pieces caught
-    def collectBoomed(boomed, state):
-        xbounds, ybounds = Game.getBounds(boomed[0]), Game.getBounds(boomed[1])
-        explosion = state[xbounds[0]:xbounds[1], ybounds[0]:ybounds[1], :]
-        assert(explosion.shape in LEGAL_BOOM_SHAPES)
-        pieces = np.where(explosion[:, :, STACK_IDX] > 0)
-        caught = set(map(lambda i: Game.explosionToCoords(boomed, i),
-                     np.stack(pieces, axis=1).tolist()))
-        return caught
-
-    # Returns the boundaries for an explosion centred on coord of boomed piece
-    def getBounds(coord):
-        # +2 as array slicing is non-inclusive on upper bound
-        upper = BOARD_SIZE + 1 if Game.outOfBounds(coord + 1) else coord + 2
-        lower = 0 if Game.outOfBounds(coord - 1) else coord - 1
-        return (lower, upper)
-
-    # Returns the coordinates of pieces caught in an 'explosion' slice
-    # relative to the actual state
-    def explosionToCoords(centre, coord):
-        xoff = 0 if centre[0] == 0 else -1
-        yoff = 0 if centre[1] == 0 else -1
-        return (coord[0] + xoff + centre[0], coord[1] + yoff + centre[1])
+
+# An index of what booming each square would take out, kept up to date
+# action by action. A boom destroys exactly the group of occupied squares
+# connected to it through any of their 8 neighbours, so the index keeps the
+# groups (each as a bitmask, with the tokens of each colour in it) and the
+# group of every square: how many tokens of each colour a boom on a square
+# would take out is a lookup. applyAction returns the index of the resulting
+# state, rebuilding only the groups the action touched; the index it is
+# called on is left as it was, so one index can be shared by all children
+class ThreatIndex:
+
+    __slots__ = ("squares", "groups", "groupOf")
+
+    # squares: the signed stack sizes (see Game.signedSquares); groups:
+    # group id (its lowest square) -> (bitmask, white tokens, black tokens);
+    # groupOf: the group id of each square, or None if it is empty
+    def __init__(self, squares, groups, groupOf):
+        self.squares = squares
+        self.groups = groups
+        self.groupOf = groupOf
+
+    def fromState(state):
+        squares = Game.signedSquares(state)
+        index = ThreatIndex(squares, {}, [None] * len(squares))
+        index.regroup(rules.occupied_mask(squares))
+        return index
+
+    # (Re)builds the groups of the occupied squares in region, which must
+    # be a union of whole groups
+    def regroup(self, region):
+        squares, groups, groupOf = self.squares, self.groups, self.groupOf
+        while region:
+            lowest = (region & -region).bit_length() - 1
+            mask = rules.boom_mask(region, lowest)
+            region &= ~mask
+            white = black = 0
+            for square in rules.mask_squares(mask):
+                groupOf[square] = lowest
+                n = squares[square]
+                if n > 0:
+                    white += n
+                else:
+                    black -= n
+            groups[lowest] = (mask, white, black)
+
+    # Returns the index of the state after action
+    def applyAction(self, action):
+        squares = self.squares.copy()
+        groups = self.groups.copy()
+        groupOf = self.groupOf.copy()
+        index = ThreatIndex(squares, groups, groupOf)
+        if action[0] == "BOOM":
+            x, y = action[1]
+            mask = groups.pop(groupOf[x * BOARD_SIZE + y])[0]
+            for square in rules.mask_squares(mask):
+                squares[square] = 0
+                groupOf[square] = None
+            return index
+        _, n, a, b = action
+        source, target = a[0] * BOARD_SIZE + a[1], b[0] * BOARD_SIZE + b[1]
+        # The groups touched: the source's, and the target's or (if the
+        # target was empty) those it joins together
+        touched = {groupOf[source]}
+        if squares[target]:
+            touched.add(groupOf[target])
+        else:
+            for square in rules.mask_squares(rules.BLAST[target]):
+                touched.add(groupOf[square])
+        touched.discard(None)
+        n = n if squares[source] > 0 else -n
+        squares[source] -= n
+        squares[target] += n
+        region = 1 << target
+        for group in touched:
+            region |= groups.pop(group)[0]
+        for square in rules.mask_squares(region):
+            groupOf[square] = None
+        index.regroup(region & ~(0 if squares[source] else 1 << source))
+        return index
+
+    # Returns the tokens of each colour (indexed by colour) a boom on the
+    # square at coord would take out, or (0, 0) for an empty square
+    def boomCount(self, coord):
+        group = self.groupOf[coord[0] * BOARD_SIZE + coord[1]]
+        if group is None:
+            return (0, 0)
+        return self.groups[group][1:]
+
+    # Returns how many more of the opponent's tokens than its own colour
+    # would take out with a boom on coord
+    def boomGain(self, coord, colour):
+        counts = self.boomCount(coord)
+        return counts[1 - colour] - counts[colour]
+
+    # Returns actions (listed booms first, as by the rules kernel) with the
+    # booms that lead to the same state, those on squares of one group,
+    # reduced to one per group: keep if it is one of them, otherwise the
+    # first. The moves are left as they are
+    def distinctBooms(self, actions, keep=None):
+        groupOf = self.groupOf
+        chosen = {}
+        for i, action in enumerate(actions):
+            if action[0] != "BOOM":
+                break
+            x, y = action[1]
+            group = groupOf[x * BOARD_SIZE + y]
+            if group not in chosen or action == keep:
+                chosen[group] = action
+        else:
+            i = len(actions)
+        return list(chosen.values()) + actions[i:]
+
+    # Returns the square of colour's best boom and its gain (as boomGain),
+    # or (None, 0) if no boom gains anything. Each group is looked at once,
+    # as all of its squares would take out the same tokens
+    def bestBoom(self, colour):
+        sign = 1 - 2 * colour
+        bestCoord, bestGain = None, 0
+        for group in sorted(self.groups):
+            mask, white, black = self.groups[group]
+            gain = (black - white) * sign
+            if gain > bestGain:
+                for square in rules.mask_squares(mask):
+                    if self.squares[square] * sign > 0:
+                        bestCoord, bestGain = rules.COORDS[square], gain
+                        break
+        return bestCoord, bestGain
+
+
+# The positions played so far in a game, for the referee's draw rules (see
+# Referee.rules): how many times each position (as a position key, with the
+# colour to move) has occurred since the last boom, and how many plies have
+# been played. A boom takes tokens off the board for good, so no position
+# from before it can occur again
+class History:
+
+    def __init__(self, state=None, colour=WHITE, plies=0):
+        self.counts = {}
+        self.plies = plies
+        if state is not None:
+            self.counts[positionKey(state, colour)] = 1
+
+    # Records an action, and the state (and colour to move) it led to
+    def push(self, action, state, colour):
+        if action[0] == "BOOM":
+            self.counts.clear()
+        key = positionKey(state, colour)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.plies += 1
+
+    def count(self, key):
+        return self.counts.get(key, 0)
+
+    def copy(self):
+        history = History(plies=self.plies)
+        history.counts = self.counts.copy()
+        return history
+
+    # Plies that can still be played before the turn limit draws the game
+    def pliesLeft(self):
+        return 2 * rules.MAX_TURNS - self.plies
@@ -0,0 +1,138 @@
+"""
+Memory accounting for the player's components.
+
+The referee only sees the memory of the whole process (shared by both
+players), so the player counts the bytes held by each of its components
+itself: the search's transposition table, the solver's table, a proven
+winning line kept between moves, and the move and explosion tables of the
+rules kernel (Referee.rules).
+
+Tables are measured by their dict plus the deep size of a sample of their
+entries, scaled up to the number of entries, which is cheap enough to do
+after every move; with exact=True every entry is measured instead (as
+Src.memreport does). A shared search table (see Src.sharedtable) is a fixed
+block, counted in full. `tableCounts` gives the number of entries each table
+holds. Budgets for the tables are set in bytes, and turned into a number of
+entries with `tableEntries`.
+
+Where tracemalloc is tracing, `tracedUsage` attributes all live allocations
+made by each Src module (and numpy's array data) instead, as a check on the
+counters.
+
+(python -m Src.memreport reports the figures after a search.)
+"""
+
+import sys
+import tracemalloc
+
+import numpy as np
+
+from Referee import rules
+from Src.game import Game, WHITE
+from Referee.position import from_state as positionKey
+
+MB = 1 << 20
+# Entries sampled when measuring a table
+SAMPLE_ENTRIES = 32
+# Allocations are attributed to the component of the file they were made in
+COMPONENT_FILES = {"search": "search.py", "solver": "solver.py",
+                   "strategy": "strategy.py", "game": "game.py",
+                   "player": "player.py"}
+
+
+# Deep size of a key or value: the object and any objects in it
+def deepSize(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(deepSize(item) for item in obj)
+    return size
+
+
+def _slotBytes():
+    n = 1 << 12
+    return sys.getsizeof(dict.fromkeys(range(n))) / n
+
+
+# Bytes per entry of a dict's own hash table (at a typical load)
+DICT_SLOT_BYTES = _slotBytes()
+
+
+# Bytes held by a dict, its keys and its values: estimated from a sample of
+# entries, or measured entry by entry if exact
+def tableBytes(table, exact=False):
+    if exact:
+        return sys.getsizeof(table) + sum(deepSize(key) + deepSize(value)
+                                          for key, value in table.items())
+    if not table:
+        return sys.getsizeof(table)
+    sample = []
+    for entry in table.items():
+        sample.append(deepSize(entry[0]) + deepSize(entry[1]))
+        if len(sample) == SAMPLE_ENTRIES:
+            break
+    return sys.getsizeof(table) + int(len(table) * sum(sample) / len(sample))
+
+
+# Returns how many entries like (key, value) fit in a budget of so many
+# bytes
+def tableEntries(budget, key, value):
+    entryBytes = DICT_SLOT_BYTES + deepSize(key) + deepSize(value)
+    return max(1, int(budget / entryBytes))
+
+
+# Entries of the search's and the solver's tables that fit in budgets of so
+# many bytes (measured with entries from the start of a game)
+def searchTableEntries(budget):
+    from Src.search import EXACT
+    state = Game.initState()
+    action = min(Game.getAllActions(state, WHITE),
+                 key=lambda a: (a[0] != "BOOM", a))
+    return tableEntries(budget, positionKey(state, WHITE),
+                        (0, 0, EXACT, action))
+
+
+def solverTableEntries(budget):
+    return tableEntries(budget, (positionKey(Game.initState(), WHITE), 0),
+                        (0, 0))
+
+
+# Bytes held by each component of a Strategy (see the module documentation;
+# a shared search table counts in full, being a fixed block)
+def componentUsage(strategy, exact=False):
+    search = strategy.search
+    usage = {"search_table": search.table.nbytes() if search.shared
+             else tableBytes(search.table, exact),
+             "solver_table": 0,
+             "plan": deepSize(strategy.plan),
+             "move_tables": deepSize(rules.BLAST) + deepSize(rules.RAYS)}
+    if strategy.solver is not None:
+        usage["solver_table"] = tableBytes(strategy.solver.table, exact)
+    return usage
+
+
+# Entries held by each table of a Strategy
+def tableCounts(strategy):
+    counts = {"search_table": len(strategy.search.table), "solver_table": 0}
+    if strategy.solver is not None:
+        counts["solver_table"] = len(strategy.solver.table)
+    return counts
+
+
+# Bytes of live allocations made by each Src module (grouped as in
+# COMPONENT_FILES), and by numpy for array data, while tracemalloc traces
+def tracedUsage():
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    usage = dict.fromkeys(COMPONENT_FILES, 0)
+    for stat in snapshot.statistics("filename"):
+        filename = stat.traceback[0].filename
+        for component, name in COMPONENT_FILES.items():
+            if filename.endswith(f"Src/{name}") or filename.endswith(
+                    f"Src/Players/{name}"):
+                usage[component] += stat.size
+    numpy = snapshot.filter_traces([tracemalloc.DomainFilter(
+        True, np.lib.tracemalloc_domain)])
+    usage["numpy"] = sum(stat.size for stat in numpy.statistics("filename"))
+    return usage
+
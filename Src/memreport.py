@@ -0,0 +1,57 @@
+"""
+Searches a position with the player and reports the bytes held by each of
+its components (see Src.memory), measuring every table entry, and the
+number of entries each table holds.
+
+usage: python -m Src.memreport [-p POSITION] [-t SECONDS] [--trace]
+"""
+
+import time
+import argparse
+import tracemalloc
+
+from Src.memory import MB, componentUsage, tableCounts, tracedUsage
+from Src.positions import POSITIONS, getPosition
+from Src.Players.player import Player
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="memreport",
+        description="search a position with the player and report the "
+        "memory held by each of its components.")
+    parser.add_argument("-p", "--position", choices=POSITIONS,
+        default="midgame-contact",
+        help="position to search (default: %(default)s).")
+    parser.add_argument("-t", "--time", type=float, default=5.0,
+        metavar="SECONDS", help="CPU time to search for (default: "
+        "%(default)s).")
+    parser.add_argument("--trace", action="store_true",
+        help="also trace allocations with tracemalloc (slow).")
+    args = parser.parse_args()
+
+    if args.trace:
+        tracemalloc.start()
+    player = Player("white")
+    player.state, player.colour = getPosition(args.position)
+    start = time.process_time()
+    player.strategy.chooseAction(player.state, player.colour,
+                                 timeLimit=args.time)
+    print(f"searched for {time.process_time() - start:.3f}s")
+    counts = tableCounts(player.strategy)
+    for name, size in componentUsage(player.strategy, exact=True).items():
+        budget = player.budgets.get(name)
+        line = f"  {name:14} {size / MB:9.3f}MB"
+        if budget is not None:
+            line += f"  (budget {budget / MB:.3f}MB)"
+        if name in counts:
+            line += f"  {counts[name]} entries"
+        print(line)
+    traced = tracedUsage()
+    if traced is not None:
+        print("traced allocations:")
+        for name, size in traced.items():
+            print(f"  {name:14} {size / MB:9.3f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Parallel search by helper processes sharing a transposition table (lazy
+SMP).
+
+Each helper attaches to the main search's shared table (see
+Src.sharedtable) and, while the main search runs, searches the same
+position with a search of its own, probing and storing as it goes. Helpers
+start their iterative deepening from different depths, so that they get
+ahead of the main search and fill the table with results it can use. Only
+the main search's choice of action counts.
+
+Helpers run in processes of their own, so their CPU time is not counted by
+the process that started them (e.g. by the referee's clock): use them where
+wall-clock time is what is limited, such as in the engine (see Src.engine).
+`SearchWorkers.close()` stops the processes; the table's owner releases the
+table itself.
+"""
+
+import threading
+import multiprocessing
+
+from Src.search import AlphaBeta, FEATURES
+from Src.sharedtable import SharedTable
+from Src.strategy import Material
+
+# Seconds to wait for a helper to report after being told to stop
+STOP_TIMEOUT = 2.0
+
+
+# Main loop of a helper process: searches each job it is sent until told to
+# stop, then reports the nodes it searched. A job of None ends the loop
+def _helperProcess(conn, tableName, features, values):
+    from Src.tune import applyValues
+    applyValues(values)
+    table = SharedTable(tableName)
+    search = AlphaBeta(Material, features=features, table=table)
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            search.resume()
+            thread = threading.Thread(target=search.search, args=job)
+            thread.start()
+            conn.recv()  # stop
+            search.stop()
+            thread.join()
+            conn.send(search.stats.nodes)
+    finally:
+        table.close()
+
+
+class SearchWorkers:
+
+    # Starts count helper processes searching with the shared table of the
+    # given name, the selective search features given and any tuned
+    # parameter values (see Src.tune)
+    def __init__(self, count, tableName, features=FEATURES, values=None):
+        context = multiprocessing.get_context("spawn")
+        self.conns = []
+        self.processes = []
+        for _ in range(count):
+            conn, child = context.Pipe()
+            process = context.Process(target=_helperProcess, daemon=True,
+                                      args=(child, tableName, list(features),
+                                            dict(values or {})))
+            process.start()
+            child.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    # Sets the helpers searching state for colour, within the same limits as
+    # the main search (see AlphaBeta.search). Every other helper starts a
+    # depth deeper
+    def start(self, state, colour, maxDepth=None, timeLimit=None,
+              history=None):
+        for i, conn in enumerate(self.conns):
+            try:
+                conn.send((state, colour, maxDepth, timeLimit, history,
+                           1 + (i + 1) % 2))
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # (dropped by stop)
+
+    # Stops the helpers' searches, and returns the nodes they searched. A
+    # helper that has died or does not report in time is ended, and later
+    # searches go on without it
+    def stop(self):
+        lost = []
+        for i, conn in enumerate(self.conns):
+            try:
+                conn.send("stop")
+            except (BrokenPipeError, ConnectionResetError):
+                lost.append(i)
+        nodes = 0
+        for i, conn in enumerate(self.conns):
+            if i in lost:
+                continue
+            try:
+                if conn.poll(STOP_TIMEOUT):
+                    nodes += conn.recv()
+                    continue
+            except (EOFError, ConnectionResetError):
+                pass
+            lost.append(i)
+        for i in sorted(lost, reverse=True):
+            self.processes[i].kill()
+            self.processes[i].join()
+            self.conns.pop(i).close()
+            del self.processes[i]
+        return nodes
+
+    # Ends the helper processes
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        for process in self.processes:
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        for conn in self.conns:
+            conn.close()
+        self.conns, self.processes = [], []
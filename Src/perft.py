@@ -0,0 +1,209 @@
+"""
+Perft: count the leaf nodes of the game tree to a fixed depth.
+
+Counts are taken with Src.game and checked against KNOWN_COUNTS, a table of
+counts for the named positions taken with the original referee (before the
+rules kernel, Referee.rules, was written), so that they do not depend on the
+code under test. Positions and depths beyond the table are checked against
+the referee instead (Referee.game.Game._available_actions to generate
+actions, Referee.game.Game.update to apply them). The referee shares the
+rules kernel with Src.game, so that check only covers Src.game's state
+representation and how it applies actions. The speed of each backend is
+reported in nodes per second so that optimisations of Src.game can be
+checked for both correctness and speed.
+
+usage: python -m Src.perft [-d DEPTH] [-p POSITION ...] [--no-oracle]
+"""
+
+import sys
+import time
+import argparse
+from collections import Counter
+
+from Referee.game import Game as RefereeGame, COLOURS
+from Src.game import Game
+from Src.positions import POSITIONS, getPosition
+
+DEPTH_DEFAULT = 2
+# Counts to depths 1, 2 and 3 for each named position (see Src.positions),
+# from the original referee's move generator
+KNOWN_COUNTS = {
+    "start": (50, 2500, 119400),
+    "midgame-open": (64, 3379, 189643),
+    "midgame-contact": (61, 4422, 230233),
+    "endgame-tower": (169, 4020, 637643),
+    "endgame-stack": (71, 700, 31476),
+    "endgame-corners": (37, 216, 5366),
+}
+
+
+# Returns the known count for a named position to a depth, or None
+def knownCount(name, depth):
+    counts = KNOWN_COUNTS.get(name, ())
+    return counts[depth - 1] if depth <= len(counts) else None
+
+
+# Counts the leaf nodes below state using Src.game. Positions where
+# the game is over have no children
+def perft(state, colour, depth):
+    if depth == 0:
+        return 1
+    if Game.gameOver(state):
+        return 0
+    actions = Game.getAllActions(state, colour)
+    if depth == 1:
+        return len(actions)
+    total = 0
+    for action in actions:
+        total += perft(Game.applyAction(action, state), 1 - colour, depth - 1)
+    return total
+
+
+# Returns the perft count below each root action using Src.game
+def divide(state, colour, depth):
+    counts = {}
+    if Game.gameOver(state):
+        return counts
+    for action in Game.getAllActions(state, colour):
+        child = Game.applyAction(action, state)
+        counts[_normalise(action)] = perft(child, 1 - colour, depth - 1)
+    return counts
+
+
+# Counts the leaf nodes below the referee's current game state
+def refereePerft(game, colour, depth):
+    if depth == 0:
+        return 1
+    if game.over():
+        return 0
+    actions = game._available_actions(COLOURS[colour])
+    if depth == 1:
+        return len(actions)
+    total = 0
+    for action in actions:
+        saved = _save(game)
+        game.update(COLOURS[colour], action)
+        total += refereePerft(game, 1 - colour, depth - 1)
+        _restore(game, saved)
+    return total
+
+
+# Returns the perft count below each root action using the referee
+def refereeDivide(game, colour, depth):
+    counts = {}
+    if game.over():
+        return counts
+    for action in game._available_actions(COLOURS[colour]):
+        saved = _save(game)
+        game.update(COLOURS[colour], action)
+        counts[action] = refereePerft(game, 1 - colour, depth - 1)
+        _restore(game, saved)
+    return counts
+
+
+# Builds a referee game holding the given board, with colour to move
+def refereeGame(board, colour):
+    game = RefereeGame()
+    game.set_board(board)
+    game.nturns = colour
+    game.history = Counter({game._snap(): 1})
+    return game
+
+
+def _save(game):
+    return (game.board.copy(), list(game._squares), dict(game.score),
+            game.nturns, game.drawmsg, game.key, game.history.copy())
+
+
+def _restore(game, saved):
+    (game.board, game._squares, game.score, game.nturns, game.drawmsg,
+     game.key, game.history) = saved
+
+
+# Strips NumPy integer types from an action so it compares and prints
+# like the referee's actions
+def _normalise(action):
+    if action[0] == "MOVE":
+        _, n, a, b = action
+        return ("MOVE", int(n), (int(a[0]), int(a[1])), (int(b[0]), int(b[1])))
+    return ("BOOM", (int(action[1][0]), int(action[1][1])))
+
+
+# Times a perft call, returning the count and the elapsed CPU time
+def _timed(fn, *args):
+    start = time.process_time()
+    count = fn(*args)
+    return count, time.process_time() - start
+
+
+def _nps(count, elapsed):
+    return count / elapsed if elapsed > 0 else float("inf")
+
+
+# Reports the root actions whose counts disagree between the backends
+def _reportDivide(name, depth, out):
+    state, colour = getPosition(name)
+    board, _ = POSITIONS[name]
+    ours = divide(state, colour, depth)
+    theirs = refereeDivide(refereeGame(board, colour), colour, depth)
+    for action in sorted(set(ours) | set(theirs), key=repr):
+        if ours.get(action) != theirs.get(action):
+            print(f"    {action!r}: src={ours.get(action)} "
+                  f"referee={theirs.get(action)}", file=out)
+
+
+# Runs perft to each depth up to maxDepth on each named position.
+# Returns True iff every count agreed with the known count, if any, and with
+# the referee (unless oracle is False)
+def run(names, maxDepth, oracle=True, out=sys.stdout):
+    allMatch = True
+    for name in names:
+        board, colourName = POSITIONS[name]
+        state, colour = getPosition(name)
+        print(f"{name} ({colourName} to move)", file=out)
+        for depth in range(1, maxDepth + 1):
+            count, elapsed = _timed(perft, state, colour, depth)
+            line = (f"  depth {depth}: {count:10d} nodes  "
+                    f"src {_nps(count, elapsed):10.0f} nps")
+            expected = {}
+            if knownCount(name, depth) is not None:
+                expected["known"] = knownCount(name, depth)
+            if oracle:
+                game = refereeGame(board, colour)
+                refCount, refElapsed = _timed(refereePerft, game, colour, depth)
+                line += f"  referee {_nps(refCount, refElapsed):10.0f} nps"
+                expected["referee"] = refCount
+            wrong = {source: n for source, n in expected.items() if n != count}
+            if wrong:
+                line += "  MISMATCH (" + ", ".join(
+                    f"{source}: {n}" for source, n in wrong.items()) + ")"
+            elif expected:
+                line += "  ok"
+            print(line, file=out)
+            if wrong:
+                allMatch = False
+                if "referee" in wrong:
+                    _reportDivide(name, depth, out)
+                break
+    return allMatch
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="perft",
+        description="count game tree leaf nodes and check them against known "
+        "counts and the referee's move generator.")
+    parser.add_argument("-d", "--depth", type=int, default=DEPTH_DEFAULT,
+        help="maximum depth (plies) to count to (default: %(default)s).")
+    parser.add_argument("-p", "--position", nargs="+", choices=POSITIONS,
+        default=list(POSITIONS), metavar="POSITION",
+        help="names of positions to count from (default: all of "
+        + ", ".join(POSITIONS) + ").")
+    parser.add_argument("--no-oracle", action="store_true",
+        help="skip the referee (check known counts only).")
+    args = parser.parse_args()
+    ok = run(args.position, args.depth, oracle=not args.no_oracle)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
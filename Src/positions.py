@@ -0,0 +1,74 @@
+"""
+A curated set of test positions shared by the perft and benchmark tools.
+
+Positions are written in the referee's convention: a mapping from (x, y)
+squares to signed stack counts (positive for white, negative for black),
+along with the colour whose turn it is.
+"""
+
+import numpy as np
+from Src.game import Game, BOARD_SIZE, STACK_IDX, COLOUR_IDX, WHITE, BLACK
+
+COLOURS = ("white", "black")
+
+
+# Converts a board in the referee's convention to an 8x8x2 state
+def boardToState(board):
+    state = np.zeros((BOARD_SIZE, BOARD_SIZE, 2), np.int8)
+    for (x, y), n in board.items():
+        if n == 0:
+            continue
+        state[x, y, STACK_IDX] = abs(n)
+        state[x, y, COLOUR_IDX] = BLACK if n < 0 else WHITE
+    return state
+
+
+# Converts an 8x8x2 state to a board in the referee's convention
+def stateToBoard(state):
+    board = {}
+    for x, y in zip(*np.nonzero(state[:, :, STACK_IDX])):
+        n = int(state[x, y, STACK_IDX])
+        board[(int(x), int(y))] = -n if state[x, y, COLOUR_IDX] == BLACK else n
+    return board
+
+
+def _startBoard():
+    state = Game.initState()
+    return stateToBoard(state)
+
+
+# Each entry holds the board and the colour to move
+POSITIONS = {
+    "start": (_startBoard(), "white"),
+    # Both sides have traded a few tokens and begun stacking
+    "midgame-open": ({
+        (0, 0): +1, (1, 0): +1, (3, 1): +2, (4, 2): +3, (6, 0): +1,
+        (7, 1): +1,
+        (0, 7): -1, (1, 6): -2, (3, 5): -2, (4, 6): -1, (6, 7): -1,
+        (7, 6): -2,
+    }, "white"),
+    # Stacks in contact in the centre, with chains available to both sides
+    "midgame-contact": ({
+        (0, 1): +1, (2, 3): +2, (3, 3): +1, (5, 2): +4,
+        (3, 4): -1, (4, 5): -3, (2, 6): -2, (6, 4): -1, (7, 7): -1,
+    }, "black"),
+    # One tall stack against scattered singles
+    "endgame-tower": ({
+        (2, 2): +12,
+        (1, 7): -1, (5, 6): -2, (6, 6): -1,
+    }, "white"),
+    "endgame-stack": ({
+        (3, 3): +5,
+        (5, 5): -1, (6, 6): -1,
+    }, "white"),
+    "endgame-corners": ({
+        (0, 0): +1, (7, 7): +1,
+        (4, 4): -3,
+    }, "black"),
+}
+
+
+# Returns the state and colour index to move for a named position
+def getPosition(name):
+    board, colour = POSITIONS[name]
+    return boardToState(board), COLOURS.index(colour)
@@ -0,0 +1,415 @@
+import time
+import threading
+from Src.game import Game, ThreatIndex, History
+from Referee.rules import REPETITIONS
+from Referee.position import from_state as positionKey
+
+# Constants
+INFINITY = 10 ** 6
+# Scores at or beyond WIN - MAX_PLY are forced wins (or losses when negative)
+WIN = 10 ** 5
+MAX_PLY = 1000
+EXACT, LOWER, UPPER = 0, 1, 2
+# Maximum number of entries kept in the transposition table
+TABLE_SIZE = 1 << 18
+# How many nodes to search between checks of the clock
+CHECK_INTERVAL = 256
+
+# Selective search features, each of which can be switched off for testing
+FEATURES = ("pvs", "aspiration", "nullmove", "lmr", "futility",
+            "equivalence")
+# Half-width of the aspiration window around the last iteration's score
+ASPIRATION_WINDOW = 1
+# Null move: depth reduction, minimum depth, and minimum number of stacks
+# the side to move must have (with fewer, having to move is more likely to
+# hurt, so passing would overestimate the position)
+NULL_REDUCTION = 2
+NULL_MIN_DEPTH = 3
+NULL_MIN_STACKS = 2
+# Late move reductions apply to moves (not booms) after this many actions
+# have been searched, at this depth or more
+LMR_MIN_ACTIONS = 3
+LMR_MIN_DEPTH = 3
+# Moves never change material, so one ply from the horizon a move can only
+# raise a material score by this much (the margin allows for evaluations
+# that look beyond material)
+FUTILITY_MARGIN = 1
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search once its time budget has been spent."""
+
+
+# Counters describing the work done by a single call to search
+class SearchStats:
+
+    def __init__(self):
+        self.nodes = 0
+        self.ttProbes = 0
+        self.ttHits = 0
+        # Cumulative CPU seconds and nodes at the end of each completed depth
+        self.depthTimes = []
+        self.depthNodes = []
+        self.elapsed = 0.0
+        # Nodes searched by helper processes meanwhile (see Src.parallel)
+        self.helperNodes = 0
+
+    def depth(self):
+        return len(self.depthTimes)
+
+    def nps(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def ttHitRate(self):
+        return self.ttHits / self.ttProbes if self.ttProbes else 0.0
+
+    # The ratio of nodes needed for the last completed depth to the nodes
+    # needed for the depth before it
+    def branchingFactor(self):
+        if len(self.depthNodes) < 2:
+            return 0.0
+        last = self.depthNodes[-1] - self.depthNodes[-2]
+        prev = self.depthNodes[-2] - (self.depthNodes[-3]
+                                      if len(self.depthNodes) > 2 else 0)
+        return last / prev if prev else 0.0
+
+    def asDict(self):
+        return {
+            "depth": self.depth(),
+            "nodes": self.nodes,
+            "seconds": self.elapsed,
+            "nps": self.nps(),
+            "depth_times": self.depthTimes,
+            "branching_factor": self.branchingFactor(),
+            "tt_probes": self.ttProbes,
+            "tt_hits": self.ttHits,
+            "tt_hit_rate": self.ttHitRate(),
+            "helper_nodes": self.helperNodes,
+        }
+
+
+# Iterative deepening negamax search with alpha-beta pruning and a
+# transposition table
+class AlphaBeta:
+
+    # table is a Src.sharedtable.SharedTable to share with other search
+    # processes, if given; otherwise the search keeps a dict of tableSize
+    # entries of its own
+    def __init__(self, evaluation, tableSize=TABLE_SIZE, features=FEATURES,
+                 table=None):
+        self.evaluation = evaluation
+        self.tableSize = tableSize
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"unknown search features: {sorted(unknown)}")
+        self.pvs = "pvs" in features
+        self.aspiration = "aspiration" in features
+        self.nullMove = "nullmove" in features
+        self.lmr = "lmr" in features
+        self.futility = "futility" in features
+        self.equivalence = "equivalence" in features
+        self.table = {} if table is None else table
+        self.shared = table is not None
+        self.stats = SearchStats()
+        self.deadline = None
+        # Set to ask the search to finish early (see stop)
+        self.stopped = threading.Event()
+        # Score of the last completed iteration, from colour's point of view
+        self.score = 0
+        # The game so far (see Src.game.History), and the positions on the
+        # line being searched, for the draw rules
+        self.history = History()
+        self.path = set()
+
+    # Returns the best action found for colour, searching until maxDepth
+    # is complete or timeLimit CPU seconds have passed (whichever is first).
+    # history is the game so far, if known, ending with state. Helpers in a
+    # parallel search (see Src.parallel) start from a later firstDepth
+    def search(self, state, colour, maxDepth=None, timeLimit=None,
+               history=None, firstDepth=1):
+        assert maxDepth is not None or timeLimit is not None
+        self.setHistory(state, colour, history)
+        self.stats = SearchStats()
+        start = time.process_time()
+        self.deadline = start + timeLimit if timeLimit is not None else None
+        best = None
+        depth = firstDepth
+        while maxDepth is None or depth <= maxDepth:
+            try:
+                score, action = self.searchWindow(state, colour, depth)
+            except SearchTimeout:
+                break
+            best, self.score = action, score
+            self.stats.depthTimes.append(time.process_time() - start)
+            self.stats.depthNodes.append(self.stats.nodes)
+            # No point searching deeper once the result is forced, or past
+            # the turn limit
+            if (abs(score) >= WIN - MAX_PLY or depth >= MAX_PLY
+                    or depth >= self.history.pliesLeft()):
+                break
+            depth += 1
+        self.stats.elapsed = time.process_time() - start
+        if best is None:
+            best = self.orderActions(state, colour, None,
+                                     ThreatIndex.fromState(state))[0]
+        return best
+
+    # Asks a search running in another thread to finish as soon as it next
+    # checks the clock, returning the best action of its last completed depth.
+    # The request stands until resume is called, so it is not lost if it
+    # arrives before that search has started
+    def stop(self):
+        self.stopped.set()
+
+    # Withdraws any request to stop, before handing the search a new job
+    def resume(self):
+        self.stopped.clear()
+
+    # Returns the score of state for colour from a search to a fixed depth,
+    # with no time limit
+    def scorePosition(self, state, colour, depth, history=None):
+        self.setHistory(state, colour, history)
+        self.deadline = None
+        return self.negamax(state, colour, depth, -INFINITY, INFINITY, 0)
+
+    # Searches the root with a narrow window around the last iteration's
+    # score, widening it to the full window if the score falls outside
+    def searchWindow(self, state, colour, depth):
+        if (not self.aspiration or depth == 1
+                or abs(self.score) >= WIN - MAX_PLY):
+            return self.searchRoot(state, colour, depth, -INFINITY, INFINITY)
+        alpha = self.score - ASPIRATION_WINDOW
+        beta = self.score + ASPIRATION_WINDOW
+        score, action = self.searchRoot(state, colour, depth, alpha, beta)
+        if alpha < score < beta:
+            return score, action
+        return self.searchRoot(state, colour, depth, -INFINITY, INFINITY)
+
+    def searchRoot(self, state, colour, depth, alpha, beta):
+        key = positionKey(state, colour)
+        self.path = {key}
+        ttMove = self.probeMove(key)
+        threats = ThreatIndex.fromState(state)
+        alphaOrig = alpha
+        bestScore, bestAction = -INFINITY, None
+        self.stats.nodes += 1
+        for i, action in enumerate(self.orderActions(state, colour, ttMove,
+                                                     threats)):
+            child = Game.applyAction(action, state)
+            score = self.searchChild(child, colour, depth, alpha, beta, 0, i,
+                                     action, threats)
+            if score > bestScore:
+                bestScore, bestAction = score, action
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if alphaOrig < bestScore < beta:
+            self.store(key, depth, bestScore, EXACT, bestAction)
+        return bestScore, bestAction
+
+    # Returns the score of the ith action (leading to child) for colour.
+    # Where the selective search features allow, the action is first
+    # searched with a null window (PVS) and/or at reduced depth (LMR), and
+    # searched again in full only if that suggests it might raise alpha.
+    # threats is the threat index of the parent state
+    def searchChild(self, child, colour, depth, alpha, beta, ply, i, action,
+                    threats):
+        reduction = self.reduction(depth, i, action)
+        nullWindow = self.pvs and i > 0
+        origin = (threats, action)
+        if reduction == 0 and not nullWindow:
+            return -self.negamax(child, 1 - colour, depth - 1, -beta, -alpha,
+                                 ply + 1, origin=origin)
+        score = -self.negamax(child, 1 - colour, depth - 1 - reduction,
+                              -alpha - 1, -alpha, ply + 1, origin=origin)
+        if score > alpha and reduction:
+            if not nullWindow:
+                return -self.negamax(child, 1 - colour, depth - 1, -beta,
+                                     -alpha, ply + 1, origin=origin)
+            score = -self.negamax(child, 1 - colour, depth - 1, -alpha - 1,
+                                  -alpha, ply + 1, origin=origin)
+        if nullWindow and alpha < score < beta:
+            score = -self.negamax(child, 1 - colour, depth - 1, -beta, -alpha,
+                                  ply + 1, origin=origin)
+        return score
+
+    # Late move reductions: search quiet moves late in the ordering one ply
+    # shallower
+    def reduction(self, depth, i, action):
+        if (self.lmr and depth >= LMR_MIN_DEPTH and i >= LMR_MIN_ACTIONS
+                and action[0] != "BOOM"):
+            return 1
+        return 0
+
+    # origin is the threat index of the parent state and the action that
+    # led here (None for a pass), or None if there is no parent
+    def negamax(self, state, colour, depth, alpha, beta, ply, allowNull=True,
+                origin=None):
+        stats = self.stats
+        stats.nodes += 1
+        if stats.nodes % CHECK_INTERVAL == 0 and (
+                self.stopped.is_set()
+                or (self.deadline is not None
+                    and time.process_time() > self.deadline)):
+            raise SearchTimeout()
+
+        counts = Game.getTokenCounts(state)
+        if counts[1 - colour] == 0:
+            return 0 if counts[colour] == 0 else WIN - ply
+        if counts[colour] == 0:
+            return -(WIN - ply)
+        # Lines reaching the turn limit, or a repetition, are draws. A
+        # position repeated within the line counts at once, as whoever
+        # chose to repeat it could do so again. (Repetitions are checked
+        # from one ply above the horizon, where the position key is needed
+        # anyway; a repetition at the horizon is found by the next
+        # iteration)
+        pliesLeft = self.history.pliesLeft()
+        if ply >= pliesLeft:
+            return 0
+        if depth <= 0:
+            return self.evaluation.evaluate(state, colour)
+        key = positionKey(state, colour)
+        if key in self.path or self.history.count(key) + 1 >= REPETITIONS:
+            return 0
+
+        stats.ttProbes += 1
+        entry = self.table.get(key)
+        ttMove = None
+        if entry is not None:
+            stats.ttHits += 1
+            entryDepth, entryScore, entryFlag, ttMove = entry
+            # (a score is only used if the turn limit is beyond the end of
+            # the search that gave it, as it may have been stored when the
+            # limit was further away)
+            if entryDepth >= depth and ply + entryDepth < pliesLeft:
+                if entryFlag == EXACT:
+                    return entryScore
+                if entryFlag == LOWER and entryScore >= beta:
+                    return entryScore
+                if entryFlag == UPPER and entryScore <= alpha:
+                    return entryScore
+
+        threats = self.threatIndex(state, origin)
+
+        # Null move: if passing still holds beta at a reduced depth, assume
+        # some action does too. Never twice in a row, and not with so few
+        # stacks that any action might make things worse
+        if (self.nullMove and allowNull and depth >= NULL_MIN_DEPTH
+                and beta - alpha == 1
+                and len(Game.getAllyCoords(state, colour)) >= NULL_MIN_STACKS
+                and self.evaluation.evaluate(state, colour) >= beta):
+            score = -self.negamax(state, 1 - colour, depth - 1 - NULL_REDUCTION,
+                                  -beta, -beta + 1, ply + 1, False,
+                                  (threats, None))
+            if score >= beta:
+                # Don't trust a forced result found after passing
+                return beta if score >= WIN - MAX_PLY else score
+
+        # Futility pruning: one ply from the horizon, actions that cannot
+        # bring the score up to alpha need not be searched. A move leaves
+        # the material as it is, and a boom changes it by its gain (from the
+        # threat index), unless it takes out all of the opponent's tokens
+        staticScore = None
+        if self.futility and depth == 1 and beta - alpha == 1:
+            staticScore = self.evaluation.evaluate(state, colour)
+        # Equivalent moves: one ply from the horizon, an evaluation of
+        # material alone gives every move (however many tokens it splits
+        # off, and wherever to) the same score, as moves never change the
+        # material, so only the first move searched need be
+        oneMove = (self.equivalence and depth == 1
+                   and self.evaluation.materialOnly)
+        movesSearched = 0
+
+        alphaOrig = alpha
+        bestScore, bestAction = -INFINITY, None
+        # (left behind if the search times out; searchRoot starts afresh)
+        self.path.add(key)
+        for i, action in enumerate(self.orderActions(state, colour, ttMove,
+                                                     threats)):
+            if staticScore is not None and action != ttMove:
+                gain = self.futileGain(action, colour, counts, threats)
+                if (gain is not None
+                        and staticScore + gain + FUTILITY_MARGIN <= alpha):
+                    bestScore = max(bestScore, staticScore + gain)
+                    continue
+            if action[0] == "MOVE":
+                if oneMove and movesSearched:
+                    continue
+                movesSearched += 1
+            child = Game.applyAction(action, state)
+            score = self.searchChild(child, colour, depth, alpha, beta, ply, i,
+                                     action, threats)
+            if score > bestScore:
+                bestScore, bestAction = score, action
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        self.path.remove(key)
+
+        if bestScore <= alphaOrig:
+            flag = UPPER
+        elif bestScore >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.store(key, depth, bestScore, flag, bestAction)
+        return bestScore
+
+    # Entries are keyed by the position key (see Referee.position) of the
+    # state and colour to move
+    def probeMove(self, key):
+        entry = self.table.get(key)
+        return entry[3] if entry is not None else None
+
+    def store(self, key, depth, score, flag, action):
+        if self.shared:
+            self.table.store(key, depth, score, flag, action)
+            return
+        # Simplest possible replacement scheme: start over once full
+        if len(self.table) >= self.tableSize:
+            self.table.clear()
+        self.table[key] = (depth, score, flag, action)
+
+    # Returns the change in material an action makes, for futility
+    # pruning, or None if it ends the game in colour's favour
+    def futileGain(self, action, colour, counts, threats):
+        if action[0] != "BOOM":
+            return 0
+        boomed = threats.boomCount(action[1])
+        if boomed[1 - colour] == counts[1 - colour]:
+            return None
+        return boomed[1 - colour] - boomed[colour]
+
+    # Sets the game the search is in: history if given (ending with state),
+    # otherwise a game that starts at state
+    def setHistory(self, state, colour, history):
+        self.history = history if history is not None else History(state,
+                                                                   colour)
+        self.path = set()
+
+    # Returns the threat index of a state, derived from its parent's where
+    # the search came from one (see negamax), so that it is only built from
+    # scratch at the root
+    def threatIndex(self, state, origin):
+        if origin is None:
+            return ThreatIndex.fromState(state)
+        parent, action = origin
+        return parent if action is None else parent.applyAction(action)
+
+    # Orders actions so that the remembered best action is tried first,
+    # followed by booms, the most tokens gained first (by the threat index),
+    # and then moves. Booms leading to the same state are only tried once
+    # (see ThreatIndex.distinctBooms). Sorting also keeps the search
+    # deterministic
+    def orderActions(self, state, colour, ttMove, threats):
+        actions = sorted(threats.distinctBooms(
+                             Game.getAllActions(state, colour), ttMove),
+                         key=lambda a: (a[0] != "BOOM", -threats.boomGain(
+                             a[1], colour) if a[0] == "BOOM" else 0, a))
+        if ttMove is not None and ttMove in actions:
+            actions.remove(ttMove)
+            actions.insert(0, ttMove)
+        return actions
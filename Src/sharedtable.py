@@ -0,0 +1,143 @@
+"""
+A transposition table in a block of shared memory, so that search processes
+working on the same position (see Src.parallel) share what they learn.
+
+The block starts with an 8 byte header holding the number of entries (a
+power of two), followed by the entries, each two u64 words:
+
+* data: the score (biased by SCORE_BIAS) in bits 32-63, the depth in bits
+  18-31, the flag (EXACT, LOWER or UPPER, see Src.search) in bits 16-17 and
+  the best action in bits 0-15, encoded as in game records (see
+  Referee.record), or NO_ACTION;
+* check: the hash of the entry's position key XOR data.
+
+A position's entry is the one its hash (of its key, see Referee.position)
+picks out. Entries are read and written without locks: an entry another
+process was writing at the same time, or an entry for another position,
+fails the check and reads as a miss. Every store replaces whatever was in
+the entry.
+
+`len(table)` counts the entries in use (those not empty), scanning the
+whole block.
+
+The process that creates a table owns the block, and unlinks it on
+`close()`; other processes attach to it by name. (Processes started from
+the owner share its resource tracker, which unlinks the block if the owner
+dies without closing it.)
+"""
+
+from hashlib import blake2b
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from Referee.record import encode_action, decode_action
+
+HEADER_BYTES = 8
+ENTRY_BYTES = 16
+SCORE_BIAS = 1 << 31
+DEPTH_LIMIT = 1 << 14
+NO_ACTION = 0xFFFF
+CLEAR_CHUNK = 1 << 16
+
+
+# Returns the hash of a position key, the same in every process (unlike
+# Python's hash of bytes, which is salted per process)
+def keyHash(key):
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little")
+
+
+class SharedTable:
+
+    # Attaches to the table in the named block (see create)
+    def __init__(self, name, owner=False):
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.owner = owner
+        self.words = self.shm.buf.cast("Q")
+        self.entries = self.words[0]
+        self.mask = self.entries - 1
+        self.actions = {}
+
+    # Creates a table of (at least one) entries, rounded down to a power of
+    # two, owned by this process
+    @staticmethod
+    def create(entries):
+        entries = 1 << (max(1, entries).bit_length() - 1)
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES +
+                                         entries * ENTRY_BYTES)
+        words = shm.buf.cast("Q")
+        words[0] = entries
+        words.release()
+        name = shm.name
+        shm.close()
+        return SharedTable(name, owner=True)
+
+    # Returns how many entries fit in a budget of so many bytes
+    @staticmethod
+    def entriesFor(budget):
+        return max(1, (budget - HEADER_BYTES) // ENTRY_BYTES)
+
+    # Bytes of shared memory held by the table
+    def nbytes(self):
+        return HEADER_BYTES + self.entries * ENTRY_BYTES
+
+    # Number of entries in use, counted by scanning the block (an empty
+    # entry is all zeros)
+    def __len__(self):
+        words = np.frombuffer(self.shm.buf, np.uint64, 2 * self.entries,
+                              HEADER_BYTES)
+        used = int(np.count_nonzero(words[0::2] | words[1::2]))
+        del words  # (the block cannot be closed while viewed)
+        return used
+
+    # Returns (depth, score, flag, action) stored for a position key, or None
+    def get(self, key):
+        h = keyHash(key)
+        i = 1 + 2 * (h & self.mask)
+        words = self.words
+        check, data = words[i], words[i + 1]
+        if check ^ data != h:
+            return None
+        code = data & 0xFFFF
+        action = None
+        if code != NO_ACTION:
+            action = self.actions.get(code)
+            if action is None:
+                action = self.actions[code] = decode_action(code)
+        return ((data >> 18) & (DEPTH_LIMIT - 1), (data >> 32) - SCORE_BIAS,
+                (data >> 16) & 3, action)
+
+    def store(self, key, depth, score, flag, action):
+        code = NO_ACTION if action is None else encode_action(action)
+        data = ((score + SCORE_BIAS) << 32 | min(depth, DEPTH_LIMIT - 1) << 18
+                | flag << 16 | code)
+        h = keyHash(key)
+        i = 1 + 2 * (h & self.mask)
+        words = self.words
+        words[i + 1] = data
+        words[i] = h ^ data
+
+    # Empties every entry, a chunk at a time
+    def clear(self):
+        buf, end = self.shm.buf, self.nbytes()
+        zeros = bytes(CLEAR_CHUNK)
+        for start in range(HEADER_BYTES, end, CLEAR_CHUNK):
+            stop = min(end, start + CLEAR_CHUNK)
+            buf[start:stop] = zeros[:stop - start]
+
+    # Detaches from the block, unlinking it if this process owns it
+    def close(self):
+        if self.shm is None:
+            return
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
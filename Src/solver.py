@@ -0,0 +1,234 @@
+"""
+Depth-first proof-number search (df-pn) for forced wins.
+
+Tries to prove that the side to move can capture all of its opponent's
+tokens within a number of plies, whatever the opponent does. Positions
+beyond the ply limit, and draws, count as failures to prove the win, so a
+proof is always sound. That includes draws by repetition, given the game so
+far: a position counts as a draw if it occurs for the REPETITIONS-th time,
+counting its occurrences in the game and on the line searched. Table
+entries are shared between lines, though, so a position also counts as a
+draw if it has occurred so often in the game that it could do so on some
+other line within the ply limit (each return to a position takes at least
+four plies, as a side must undo its own move). Up to 12 plies that bound
+covers every line; beyond, it is clamped to one earlier occurrence, and a
+proof reused from another line could miss a repetition. Memory is bounded
+by the size of the table, which is cleared when full, and the search gives
+up once it runs out of time or nodes.
+
+usage: python -m Src.solver [-p POSITION] [-n PLIES] [-t SECONDS]
+"""
+
+import sys
+import time
+import threading
+import argparse
+
+from Src.game import Game, ThreatIndex, History
+from Referee.rules import REPETITIONS
+from Src.search import SearchTimeout, CHECK_INTERVAL
+from Referee.position import from_state as positionKey
+
+# Proof and disproof numbers of a solved position
+INFINITY = 10 ** 9
+# Plies within which to look for a win
+MAX_PLIES_DEFAULT = 7
+TABLE_SIZE = 1 << 18
+
+
+class ProofNumberSolver:
+
+    def __init__(self, maxPlies=MAX_PLIES_DEFAULT, tableSize=TABLE_SIZE):
+        self.maxPlies = maxPlies
+        self.tableSize = tableSize
+        # (position key of the state and colour to move, plies left) ->
+        # (phi, delta) from the point of view of the side to move there
+        self.table = {}
+        self.attacker = None
+        self.history = History()
+        # Earlier occurrences in the game from which a position counts as a
+        # draw by repetition whatever the line (see terminal): a
+        # conservative bound, clamped so that a position new to the game is
+        # never a draw by it
+        self.repeatLimit = max(1, REPETITIONS - 1 - (maxPlies - 1) // 4)
+        # Occurrences of each position key on the line being searched, above
+        # the position being expanded
+        self.path = {}
+        self.deadline = None
+        self.stopped = threading.Event()
+        self.maxNodes = None
+        self.nodes = 0
+        self.line = []
+
+    # Returns the first action of a forced win for colour, or None if no win
+    # was proven within the limits. history is the game so far (see
+    # Src.game.History), ending with state, if known. The winning line found
+    # is kept in self.line
+    def solve(self, state, colour, timeLimit=None, maxNodes=None,
+              history=None):
+        # Entries depend on who is trying to win, and on the game so far (a
+        # proof may not hold given more of it), so only keep them while
+        # solving for the same colour with no history given
+        if colour != self.attacker or history is not None:
+            self.table.clear()
+            self.attacker = colour
+        self.history = History(state, colour) if history is None else history
+        self.path = {}
+        self.nodes = 0
+        self.maxNodes = maxNodes
+        self.deadline = (time.process_time() + timeLimit
+                         if timeLimit is not None else None)
+        self.line = []
+        try:
+            self.mid(state, colour, self.maxPlies, INFINITY - 1, INFINITY - 1)
+        except SearchTimeout:
+            return None
+        if self.lookup(state, colour, self.maxPlies)[0] != 0:
+            return None
+        self.line = self.provenLine(state, colour)
+        return self.line[0] if self.line else None
+
+    # Asks a solve running in another thread to give up (until resume is
+    # called, as for AlphaBeta.stop)
+    def stop(self):
+        self.stopped.set()
+
+    def resume(self):
+        self.stopped.clear()
+
+    # Expands a position until its phi or delta reaches its threshold
+    def mid(self, state, colour, plies, thPhi, thDelta):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and (
+                self.stopped.is_set()
+                or (self.deadline is not None
+                 and time.process_time() > self.deadline)
+                or (self.maxNodes is not None
+                    and self.nodes > self.maxNodes)):
+            raise SearchTimeout()
+
+        result = self.terminal(state, colour, plies)
+        if result is not None:
+            self.store(state, colour, plies, result)
+            return
+
+        children = [(action, Game.applyAction(action, state))
+                    for action in self.candidates(state, colour, plies)]
+        key = positionKey(state, colour)
+        while True:
+            # A child's delta is this node's phi, and vice versa
+            phi, delta = INFINITY, 0
+            best, bestDelta, secondDelta, bestPhi = None, INFINITY, INFINITY, 0
+            for _, child in children:
+                childPhi, childDelta = self.lookup(child, 1 - colour,
+                                                   plies - 1)
+                phi = min(phi, childDelta)
+                delta = min(INFINITY, delta + childPhi)
+                if childDelta < bestDelta:
+                    best, secondDelta = child, bestDelta
+                    bestDelta, bestPhi = childDelta, childPhi
+                elif childDelta < secondDelta:
+                    secondDelta = childDelta
+            if phi >= thPhi or delta >= thDelta:
+                self.store(state, colour, plies, (phi, delta))
+                return
+            self.path[key] = self.path.get(key, 0) + 1
+            self.mid(best, 1 - colour, plies - 1,
+                     min(INFINITY - 1, thDelta + bestPhi - delta),
+                     min(thPhi, secondDelta + 1))
+            self.path[key] -= 1
+
+    # Returns the actions worth trying: one boom per group (the others lead
+    # to the same state, and would count it more than once), and on the
+    # attacker's last ply only a boom, as only a boom can still win (moves
+    # never remove tokens)
+    def candidates(self, state, colour, plies):
+        actions = ThreatIndex.fromState(state).distinctBooms(
+            Game.getAllActions(state, colour))
+        if plies == 1 and colour == self.attacker:
+            actions = [a for a in actions if a[0] == "BOOM"]
+        return sorted(actions, key=lambda a: (a[0] != "BOOM", a))
+
+    # Returns (phi, delta) for a position that is over, out of plies or a
+    # draw by repetition (other than the root, which is in the game already)
+    def terminal(self, state, colour, plies):
+        counts = Game.getTokenCounts(state)
+        if counts[0] and counts[1] and plies > 0:
+            key = positionKey(state, colour)
+            earlier = self.history.count(key)
+            if plies == self.maxPlies or (
+                    earlier < self.repeatLimit
+                    and earlier + self.path.get(key, 0) < REPETITIONS - 1):
+                return None
+            attackerWins = False
+        else:
+            attackerWins = (counts[self.attacker]
+                            and not counts[1 - self.attacker])
+        if attackerWins == (colour == self.attacker):
+            return (0, INFINITY)
+        return (INFINITY, 0)
+
+    def lookup(self, state, colour, plies):
+        return self.table.get((positionKey(state, colour), plies), (1, 1))
+
+    def store(self, state, colour, plies, value):
+        if len(self.table) >= self.tableSize:
+            self.table.clear()
+        self.table[(positionKey(state, colour), plies)] = value
+
+    # Follows proven positions from a won root to the end of the game: the
+    # attacker plays a winning action, and the defender its first reply
+    # (all of which lose)
+    def provenLine(self, state, colour):
+        line = []
+        plies = self.maxPlies
+        self.path = {}
+        while self.terminal(state, colour, plies) is None:
+            for action in self.candidates(state, colour, plies):
+                child = Game.applyAction(action, state)
+                childPhi, childDelta = self.lookup(child, 1 - colour,
+                                                   plies - 1)
+                # A child lost for its side to move (attacker's turn), or
+                # won for it (defender's turn)
+                if (childDelta if colour == self.attacker else childPhi) == 0:
+                    break
+            else:
+                # The proof was lost from the table; stop the line here
+                break
+            line.append(action)
+            key = positionKey(state, colour)
+            self.path[key] = self.path.get(key, 0) + 1
+            state, colour, plies = child, 1 - colour, plies - 1
+        return line
+
+
+def main():
+    from Src.positions import POSITIONS, getPosition
+
+    parser = argparse.ArgumentParser(prog="solver",
+        description="look for a forced win for the side to move.")
+    parser.add_argument("-p", "--position", choices=POSITIONS,
+        default="endgame-tower", help="position to solve "
+        "(default: %(default)s).")
+    parser.add_argument("-n", "--plies", type=int, default=MAX_PLIES_DEFAULT,
+        help="plies within which to find a win (default: %(default)s).")
+    parser.add_argument("-t", "--time", type=float, default=None,
+        metavar="SECONDS", help="CPU time to give up after.")
+    args = parser.parse_args()
+
+    state, colour = getPosition(args.position)
+    solver = ProofNumberSolver(args.plies)
+    start = time.process_time()
+    action = solver.solve(state, colour, args.time)
+    elapsed = time.process_time() - start
+    if action is None:
+        print(f"no win found ({solver.nodes} nodes, {elapsed:.3f}s)")
+        sys.exit(1)
+    print(f"win in {len(solver.line)} plies ({solver.nodes} nodes, "
+          f"{elapsed:.3f}s):")
+    for action in solver.line:
+        print(f"  {action!r}")
+
+
+if __name__ == "__main__":
+    main()
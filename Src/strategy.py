@@ -1,25 +1,118 @@
+import time
 import random
-from Src.game import Game
+from Src.game import Game, ThreatIndex
+from Referee.position import from_state as positionKey
 
 WHITE = 0
 BLACK = 1
 STACK_IDX = 0
 COLOUR_IDX = 1
+# With this many tokens or fewer left on the board, first spend a share of
+# the budget trying to prove a forced win
+SOLVER_MATERIAL = 8
+SOLVER_SHARE = 0.25
 
 
 class Strategy:
 
-    def __init__(self, search, evaluation):
+    # workers are helper processes to search alongside the search (see
+    # Src.parallel), sharing its table, if any
+    def __init__(self, search, evaluation, solver=None, workers=None):
         self.evaluation = evaluation
         self.search = search
+        self.solver = solver
+        self.workers = workers
+        # The rest of a proven winning line, and the state in which to
+        # continue it (if the opponent keeps to it)
+        self.plan = None
+        self.proven = False
+
+    # Returns the action chosen by the search within the given budget,
+    # playing out a forced win instead once the solver has proven one.
+    # history is the game so far (see Src.game.History), if known
+    def chooseAction(self, state, colour, maxDepth=None, timeLimit=None,
+                     history=None):
+        self.proven = False
+        # (the proof allowed for the line's positions recurring, so the game
+        # reaching them does not make it a draw)
+        if self.plan is not None and self.plan[0] == positionKey(state):
+            self.proven = True
+            return self.followPlan(state, self.plan[1])
+        self.plan = None
+        # (a win proven beyond the turn limit would be a draw)
+        if (self.solver is not None and timeLimit is not None
+                and sum(Game.getTokenCounts(state)) <= SOLVER_MATERIAL
+                and (history is None
+                     or history.pliesLeft() >= self.solver.maxPlies)):
+            start = time.process_time()
+            action = self.solver.solve(state, colour, timeLimit * SOLVER_SHARE,
+                                       history=history)
+            if action is not None:
+                self.proven = True
+                return self.followPlan(state, self.solver.line)
+            timeLimit -= time.process_time() - start
+        if self.workers is None:
+            return self.search.search(state, colour, maxDepth, timeLimit,
+                                      history)
+        self.workers.start(state, colour, maxDepth, timeLimit, history)
+        try:
+            return self.search.search(state, colour, maxDepth, timeLimit,
+                                      history)
+        finally:
+            self.search.stats.helperNodes = self.workers.stop()
+
+    # Plays the first action of a winning line, remembering the rest
+    def followPlan(self, state, line):
+        action = line[0]
+        if len(line) > 2:
+            expected = Game.applyAction(line[1], Game.applyAction(action, state))
+            self.plan = (positionKey(expected), line[2:])
+        else:
+            self.plan = None
+        return action
+
+    # Asks a search running in another thread to finish early
+    def stop(self):
+        self.search.stop()
+        if self.solver is not None:
+            self.solver.stop()
+
+    # Withdraws any request to stop, before a new search is started in
+    # another thread
+    def resume(self):
+        self.search.resume()
+        if self.solver is not None:
+            self.solver.resume()
+
+    # Ends the helper processes and releases the shared table, if any
+    def close(self):
+        if self.workers is not None:
+            self.workers.close()
+            self.workers = None
+        if self.search.shared:
+            self.search.table.close()
 
 
 class Evaluation:
 
+    # Whether evaluate depends on the number of tokens of each colour alone
+    # (see the search's "equivalence" feature)
+    materialOnly = False
+
     def evaluate(state, colour):
         pass
 
 
+# Scores a state by how many more tokens colour has than its opponent
+class Material(Evaluation):
+
+    materialOnly = True
+
+    def evaluate(state, colour):
+        counts = Game.getTokenCounts(state)
+        return counts[colour] - counts[1 - colour]
+
+
 # Consider adding init function if
 # heuristic specific values need to be kept track of (likely)
 class Heuristic(Evaluation):
@@ -35,33 +128,14 @@ class Heuristic(Evaluation):
         pickIndex = random.randint(0, len(allActions)-1)
         return allActions[pickIndex]
 
+    # Returns the tokens of each colour a boom on coord would take out
+    # (build a ThreatIndex once to ask about many squares)
     def getBoomCount(coord, state):
-        boomSets = Game.collectAllBoomed(coord, state)
-        boomCounter = [0, 0]
-        for i in boomSets[WHITE]:
-            boomCounter[WHITE] += state[i[0], i[1], STACK_IDX]
-        for i in boomSets[BLACK]:
-            boomCounter[BLACK] += state[i[0], i[1], STACK_IDX]
-        return boomCounter
+        return list(ThreatIndex.fromState(state).boomCount(coord))
 
     # A desirable boom is one where there are more enemy pieces
     # lost then ally pieces. Returns the coordinates of the most
-    # desirable boom, or None if not present
+    # desirable boom (or None if not present) and how many more enemy
+    # pieces than ally pieces it takes out
     def getMostDesirableBoom(state, colour):
-        allyCoords = Game.getAllyCoords(state, colour)
-        # print('ALLY COORDS: ' + str(allyCoords))
-        # print('LEN ALLIES: ' + str(len(allyCoords)))
-        bestCoord, bestCount = None, 0
-        # BUG: Returning positive values for friendly booms
-        # for both sides
-        for i in allyCoords:
-            boomCounter = Heuristic.getBoomCount(i, state)
-            difference = boomCounter[WHITE] - boomCounter[BLACK]
-            if ((colour == WHITE and difference < bestCount) or
-                (colour == BLACK and difference > bestCount)
-            ):
-                bestCoord, bestCount = i, abs(difference)
-
-        print((bestCoord, bestCount))
-
-        return (bestCoord, bestCount)
+        return ThreatIndex.fromState(state).bestBoom(colour)
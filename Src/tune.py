@@ -0,0 +1,269 @@
+"""
+Tune the player's search and time-management parameters by SPSA
+(simultaneous perturbation stochastic approximation).
+
+Each iteration perturbs every parameter at once, by a random sign times a
+shrinking step, in both directions, and plays a batch of short games
+between the two perturbed players (as engines, see Src.engine, with the
+values passed on the command line) across a process pool, with the referee
+as the arbiter (see Referee.tournament). All parameters then move towards
+the side that scored better. Games are played under a CPU time limit, so the
+tuner looks for the most strength per CPU second rather than per node.
+
+Progress is saved to a checkpoint file after every iteration, along with
+the state of the random number generator drawing the perturbations, so an
+interrupted run can be resumed by running the same command again and goes
+on exactly as it would have.
+
+usage: python -m Src.tune [-n ITERATIONS] [-g GAMES] [-j JOBS] [-t SECONDS]
+                          [-o CHECKPOINT] [-p NAME ...] [-r RATE]
+"""
+
+import os
+import sys
+import json
+import shlex
+import random
+import argparse
+import importlib
+
+# Tunable parameters: name -> (module, constant, lowest, highest, step).
+# Each starts from the module's current value, and constants that are ints
+# there are rounded. The step is the size of the first perturbation, so
+# parameters of different scales move comparably. (The material evaluation
+# has no weights yet; weights of a richer evaluation belong here too.)
+PARAMETERS = {
+    "aspiration_window": ("Src.search", "ASPIRATION_WINDOW", 1, 4, 1),
+    "null_reduction": ("Src.search", "NULL_REDUCTION", 1, 4, 1),
+    "null_min_depth": ("Src.search", "NULL_MIN_DEPTH", 2, 6, 1),
+    "lmr_min_actions": ("Src.search", "LMR_MIN_ACTIONS", 1, 8, 1),
+    "lmr_min_depth": ("Src.search", "LMR_MIN_DEPTH", 2, 6, 1),
+    "futility_margin": ("Src.search", "FUTILITY_MARGIN", 0, 4, 1),
+    "solver_material": ("Src.strategy", "SOLVER_MATERIAL", 4, 16, 2),
+    "solver_share": ("Src.strategy", "SOLVER_SHARE", 0.05, 0.6, 0.1),
+    "moves_to_go": ("Src.Players.player", "MOVES_TO_GO", 15, 80, 8),
+    "min_move_time": ("Src.Players.player", "MIN_MOVE_TIME", 0.01, 0.5,
+                      0.05),
+}
+
+# Standard SPSA gain schedules: a_k = a / (k + 1 + A) ** ALPHA and
+# c_k = 1 / (k + 1) ** GAMMA (in units of each parameter's step), with A a
+# share of the planned iterations
+ALPHA = 0.602
+GAMMA = 0.101
+STABILITY_SHARE = 0.1
+
+ITERATIONS_DEFAULT = 100
+GAMES_DEFAULT = 16  # per iteration
+TIME_LIMIT_DEFAULT = 10.0  # CPU seconds per player per game
+CHECKPOINT_DEFAULT = "tune.json"
+# Parameter steps moved at the first iteration after a clean sweep
+RATE_DEFAULT = 1.0
+
+
+def _constant(name):
+    module, constant = PARAMETERS[name][:2]
+    return importlib.import_module(module), constant
+
+
+# Returns the current values of the named parameters
+def defaultValues(names=PARAMETERS):
+    values = {}
+    for name in names:
+        module, constant = _constant(name)
+        values[name] = getattr(module, constant)
+    return values
+
+
+# Sets the module constants of the given parameters (e.g. in an engine
+# started by the tuner), rounding those that are ints by default
+def applyValues(values):
+    for name, value in values.items():
+        module, constant = _constant(name)
+        if isinstance(getattr(module, constant), int):
+            value = int(round(value))
+        setattr(module, constant, value)
+
+
+# The value a player actually uses for a parameter
+def _effective(name, value):
+    module, constant = _constant(name)
+    if isinstance(getattr(module, constant), int):
+        return int(round(value))
+    return round(float(value), 6)
+
+
+def engineCommand(values):
+    args = [sys.executable, "-m", "Src.engine"]
+    if values:
+        args.append("--set")
+        args += [f"{name}={_effective(name, value)}"
+                 for name, value in sorted(values.items())]
+    return shlex.join(args)
+
+
+# Plays games between engines using the two sets of values, alternating
+# colours, and returns the score of the first (wins plus half of draws,
+# over games played)
+def playMatch(plus, minus, games, jobs=None, timeLimit=TIME_LIMIT_DEFAULT):
+    from Referee.engine import ENGINE_PREFIX
+    from Referee.tournament import tournament
+
+    locs = [(ENGINE_PREFIX, engineCommand(plus)),
+            (ENGINE_PREFIX, engineCommand(minus))]
+    # The first player's label is never renumbered
+    plusLabel = "".join(locs[0])
+    records = tournament(locs, games, jobs=jobs, time_limit=timeLimit,
+                         accounting="fast")
+    score = sum(1.0 if r["winner"] == plusLabel else
+                0.5 if r["winner"] is None else 0.0 for r in records)
+    return score / len(records)
+
+
+# A random.Random state as JSON (its tuples as lists), and back
+def _encodeState(state):
+    version, internal, gauss = state
+    return [version, list(internal), gauss]
+
+
+def _decodeState(state):
+    version, internal, gauss = state
+    return version, tuple(internal), gauss
+
+
+class SPSATuner:
+
+    def __init__(self, names, iterations, rate=RATE_DEFAULT):
+        self.names = list(names)
+        self.iterations = iterations
+        self.stability = STABILITY_SHARE * iterations
+        # a is set so that the first update after a clean sweep moves each
+        # parameter by rate steps
+        self.a = rate * 2 * (1 + self.stability) ** ALPHA
+        self.values = {name: float(value)
+                       for name, value in defaultValues(self.names).items()}
+        self.iteration = 0
+        self.history = []
+        # Draws the perturbations; its state is saved with the checkpoint
+        self.rng = random.Random()
+
+    def gains(self, k):
+        return (self.a / (k + 1 + self.stability) ** ALPHA,
+                1 / (k + 1) ** GAMMA)
+
+    def _clip(self, name, value):
+        _, _, low, high, _ = PARAMETERS[name]
+        return min(high, max(low, value))
+
+    # Returns the two perturbed sets of values for an iteration, and the
+    # signs used
+    def perturb(self, rng):
+        _, c = self.gains(self.iteration)
+        signs = {name: rng.choice((-1, 1)) for name in self.names}
+        plus, minus = {}, {}
+        for name in self.names:
+            delta = c * PARAMETERS[name][4] * signs[name]
+            plus[name] = self._clip(name, self.values[name] + delta)
+            minus[name] = self._clip(name, self.values[name] - delta)
+        return plus, minus, signs
+
+    # Moves the values towards the better-scoring perturbation, given the
+    # score of plus against minus
+    def update(self, score, signs):
+        a, c = self.gains(self.iteration)
+        # plus scored score, minus 1 - score
+        gradient = (2 * score - 1) / (2 * c)
+        for name in self.names:
+            step = a * gradient * signs[name] * PARAMETERS[name][4]
+            self.values[name] = self._clip(name, self.values[name] + step)
+        self.iteration += 1
+
+    def step(self, games, jobs=None, timeLimit=TIME_LIMIT_DEFAULT):
+        plus, minus, signs = self.perturb(self.rng)
+        score = playMatch(plus, minus, games, jobs, timeLimit)
+        self.update(score, signs)
+        self.history.append({"iteration": self.iteration, "score": score,
+                             "plus": plus, "minus": minus,
+                             "values": dict(self.values)})
+        return score
+
+    def effectiveValues(self):
+        return {name: _effective(name, value)
+                for name, value in self.values.items()}
+
+    def save(self, path):
+        checkpoint = {"iteration": self.iteration,
+                      "iterations": self.iterations,
+                      "values": self.values,
+                      "effective": self.effectiveValues(),
+                      "history": self.history,
+                      "rng": _encodeState(self.rng.getstate())}
+        temp = path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(checkpoint, f, indent=2)
+        # Replace the old checkpoint only once the new one is complete
+        os.replace(temp, path)
+
+    def load(self, path):
+        with open(path) as f:
+            checkpoint = json.load(f)
+        self.iteration = checkpoint["iteration"]
+        self.history = checkpoint["history"]
+        if "rng" in checkpoint:
+            self.rng.setstate(_decodeState(checkpoint["rng"]))
+        for name in self.names:
+            if name in checkpoint["values"]:
+                self.values[name] = checkpoint["values"][name]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="tune",
+        description="tune search and time-management parameters by SPSA, "
+        "playing short games between perturbed engines.")
+    parser.add_argument("-n", "--iterations", type=int,
+        default=ITERATIONS_DEFAULT,
+        help="number of SPSA iterations (default: %(default)s).")
+    parser.add_argument("-g", "--games", type=int, default=GAMES_DEFAULT,
+        help="games per iteration, alternating colours (default: "
+        "%(default)s).")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes (default: one per CPU).")
+    parser.add_argument("-t", "--time", type=float,
+        default=TIME_LIMIT_DEFAULT, metavar="SECONDS",
+        help="CPU time limit per player per game (default: %(default)s).")
+    parser.add_argument("-o", "--checkpoint", default=CHECKPOINT_DEFAULT,
+        help="file to save progress to after every iteration, and to "
+        "resume from if it exists (default: %(default)s).")
+    parser.add_argument("-p", "--parameters", nargs="+", choices=PARAMETERS,
+        default=list(PARAMETERS), metavar="NAME",
+        help="parameters to tune (default: all of "
+        f"{', '.join(PARAMETERS)}).")
+    parser.add_argument("-r", "--rate", type=float, default=RATE_DEFAULT,
+        help="steps each parameter moves after a clean sweep in the first "
+        "iteration (default: %(default)s).")
+    parser.add_argument("--seed", type=int, default=None,
+        help="seed for the perturbations.")
+    args = parser.parse_args()
+
+    tuner = SPSATuner(args.parameters, args.iterations, args.rate)
+    tuner.rng.seed(args.seed)
+    if os.path.exists(args.checkpoint):
+        # (restores the generator's state, so the seed only starts a run)
+        tuner.load(args.checkpoint)
+        print(f"resuming from iteration {tuner.iteration}", file=sys.stderr)
+    try:
+        while tuner.iteration < args.iterations:
+            score = tuner.step(args.games, args.jobs, args.time)
+            tuner.save(args.checkpoint)
+            print(f"iteration {tuner.iteration}/{args.iterations}: "
+                  f"plus scored {score:.3f}; {tuner.effectiveValues()}",
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted; run again to resume", file=sys.stderr)
+        sys.exit(1)
+    json.dump(tuner.effectiveValues(), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Tests for Referee.player's accounting modes: fast accounting reads the same
+figures as strict accounting, collecting garbage less often.
+"""
+
+import gc
+
+import pytest
+
+from Referee import player
+from Referee.player import PlayerWrapper, GC_INTERVAL, GC_NEAR_LIMIT
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    calls = []
+    monkeypatch.setattr(gc, "collect", lambda: calls.append(1))
+    return calls
+
+
+def test_fast_reads_match_strict_reads():
+    curr, peak = player._get_space_usage()
+    fast_curr, fast_peak = player._get_space_usage_fast()
+    assert fast_peak >= peak
+    assert fast_curr == pytest.approx(curr, abs=1)
+    # (reading again reuses the open status file)
+    assert player._get_space_usage_fast()[1] >= fast_peak
+
+
+@pytest.mark.parametrize("gc_interval", [1, GC_INTERVAL])
+def test_timer_collects_every_interval(collections, gc_interval):
+    timer = player._CountdownTimer(None, "white", gc_interval=gc_interval)
+    for _ in range(2 * GC_INTERVAL):
+        with timer:
+            pass
+    assert len(collections) == 2 * GC_INTERVAL // gc_interval
+
+
+def test_fast_watcher_collects_only_near_the_limit(collections,
+        monkeypatch):
+    # (without measuring, which could break the limit)
+    monkeypatch.setattr(player, "_SPACE_ENABLED", False)
+    watcher = player._MemoryWatcher(100, fast=True)
+    with watcher:
+        pass
+    assert collections == []
+    watcher.peak_usage = GC_NEAR_LIMIT * 100 + 1
+    with watcher:
+        pass
+    assert collections == [1]
+
+
+def test_unknown_accounting_mode():
+    with pytest.raises(ValueError, match="accounting mode"):
+        PlayerWrapper("white", ("Src", "Player"), accounting="loose")
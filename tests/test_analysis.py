@@ -0,0 +1,60 @@
+"""Tests for Src.analysis: judging the moves of a recorded game."""
+
+import random
+
+import pytest
+
+import Src.search
+from Referee import rules
+from Referee.game import COLOURS
+from Referee.record import RecordWriter
+from Src import analysis
+from Src.search import AlphaBeta
+
+PLIES = 6
+
+
+@pytest.fixture
+def record(tmp_path):
+    path = tmp_path / "game.exb"
+    writer = RecordWriter(str(path), "one", "two")
+    squares = [0] * rules.SQUARES
+    for x in (0, 1, 3, 4, 6, 7):
+        for y, n in ((0, 1), (1, 1), (6, -1), (7, -1)):
+            squares[rules.INDICES[x, y]] = n
+    rng = random.Random(34)
+    for ply in range(PLIES):
+        sign = rules.SIGNS[COLOURS[ply % 2]]
+        # quiet moves, so that the game goes on
+        action = rng.choice([a for a in rules.actions(squares, sign)
+                             if a[0] == "MOVE"])
+        for i, n in rules.changes(squares, action):
+            squares[i] = n
+        writer.write_ply(action, None)
+    writer.close("aborted")
+    return str(path)
+
+
+def test_moves_are_judged(record):
+    report = analysis.analyseGame(record, depth=2)
+    for side in ("white", "black"):
+        assert report["sides"][side]["moves"] == PLIES // 2
+        assert report["sides"][side]["unjudged"] == 0
+
+
+class _StoppedSearch(AlphaBeta):
+    # A search that runs out of time before finishing depth 1
+    def search(self, *args, **kwargs):
+        self.stop()
+        return super().search(*args, **kwargs)
+
+
+def test_unfinished_search_is_not_judged(record, monkeypatch):
+    monkeypatch.setattr(Src.search, "CHECK_INTERVAL", 1)
+    monkeypatch.setattr(analysis, "AlphaBeta", _StoppedSearch)
+    report = analysis.analyseGame(record, timeLimit=60)
+    assert report["blunders"] == []
+    for side in ("white", "black"):
+        assert report["sides"][side] == {"moves": 0,
+                                         "unjudged": PLIES // 2,
+                                         "blunders": 0, "mean_loss": 0.0}
@@ -0,0 +1,43 @@
+"""Tests for Src.bench: the results it records and how runs are compared."""
+
+import io
+import json
+
+from Src import bench
+
+
+def _report(nps, nodes=1000, depth=2):
+    return {"results": [{"position": "start", "mode": "depth",
+                         "max_depth": depth, "nps": nps, "nodes": nodes}]}
+
+
+def test_depth_run_is_deterministic_and_serialisable():
+    first = bench.benchPosition("start", 2, [])
+    second = bench.benchPosition("start", 2, [])
+    assert len(first) == 1
+    result = first[0]
+    assert result["mode"] == "depth" and result["depth"] == 2
+    assert len(result["depth_times"]) == 2
+    assert result["peak_memory"] > 0
+    assert (result["nodes"], result["action"]) \
+        == (second[0]["nodes"], second[0]["action"])
+    json.dumps(first)
+
+
+def test_time_runs_follow_the_depth_run():
+    results = bench.benchPosition("start", 1, [0.05])
+    assert [r["mode"] for r in results] == ["depth", "time"]
+    assert results[1]["time_limit"] == 0.05
+
+
+def test_compare_flags_a_slowdown():
+    out = io.StringIO()
+    assert bench.compare(_report(950), _report(1000), out)
+    assert not bench.compare(_report(800), _report(1000), out)
+    assert "REGRESSION" in out.getvalue()
+
+
+def test_compare_skips_other_depths():
+    out = io.StringIO()
+    assert bench.compare(_report(1, depth=3), _report(1000), out)
+    assert out.getvalue() == ""
@@ -0,0 +1,111 @@
+"""Tests for Src.dataset: writing, reading and sampling training positions."""
+
+import io
+import random
+
+import numpy as np
+import pytest
+
+from Referee.game import Game as RefereeGame, COLOURS
+from Referee.position import from_state as positionKey
+from Src.dataset import DatasetWriter, Dataset, BatchSampler, build, \
+    packBoards, unpackBoards
+from Src.game import Game, WHITE, BLACK
+from Src.positions import POSITIONS, getPosition
+
+
+def _states():
+    return np.array([getPosition(name)[0] for name in POSITIONS])
+
+
+def test_packed_boards_are_position_keys():
+    states = _states()
+    packed = packBoards(states)
+    for state, board in zip(states, packed):
+        assert bytes(board) == positionKey(state, WHITE)[:64]
+    assert (unpackBoards(packed)[..., 0] == states[..., 0]).all()
+    # (the colour of an empty square is not kept)
+    occupied = states[..., 0] > 0
+    assert (unpackBoards(packed)[..., 1][occupied]
+            == states[..., 1][occupied]).all()
+
+
+def test_games_are_read_back_by_id(tmp_path):
+    name = str(tmp_path / "positions")
+    states = _states()
+    writer = DatasetWriter(name)
+    writer.addGame(states[:2], [WHITE, BLACK], [3, 40000], "white", game=9)
+    writer.addGame(states[2:], [BLACK] * 4, [-1] * 4, "draw", game=5)
+    writer.close()
+    dataset = Dataset(name)
+    assert len(dataset) == len(states)
+    assert list(dataset.games()) == [9, 5]
+    records = dataset.records[dataset.gameRecords([9])]
+    assert list(records["colour"]) == [WHITE, BLACK]
+    assert list(records["result"]) == [1, -1]
+    assert list(records["score"]) == [3, 32767]
+    assert list(dataset.gameRecords([5, 9])) == [2, 3, 4, 5, 0, 1]
+    assert (dataset.records["result"][2:] == 0).all()
+    with pytest.raises(KeyError):
+        dataset.gameRecords([1])
+
+
+def test_not_a_dataset(tmp_path):
+    name = str(tmp_path / "positions")
+    for suffix in (".pos", ".idx"):
+        with open(name + suffix, "wb") as f:
+            f.write(b"\0" * 16)
+    with pytest.raises(ValueError, match="not a version"):
+        Dataset(name)
+
+
+@pytest.mark.parametrize("dropLast", [False, True])
+def test_epoch_visits_every_record_once(tmp_path, dropLast):
+    name = str(tmp_path / "positions")
+    writer = DatasetWriter(name)
+    state = Game.initState()
+    writer.addGame([state] * 100, [WHITE] * 100, np.arange(100), "draw")
+    writer.close()
+    sampler = BatchSampler(Dataset(name), 8, seed=40, blockSize=10,
+                           blocksPerBuffer=3, dropLast=dropLast)
+    batches = list(sampler)
+    scores = np.concatenate([batch["score"] for batch in batches])
+    assert len(set(scores)) == len(scores)
+    if dropLast:
+        assert len(scores) == 96
+        assert all(len(batch) == 8 for batch in batches)
+    else:
+        assert sorted(scores) == list(range(100))
+    assert list(scores) != sorted(scores)
+
+
+def test_build_from_records(tmp_path):
+    rng = random.Random(40)
+    records = tmp_path / "records"
+    records.mkdir()
+    plies = {}
+    for game in range(3):
+        path = str(records / f"game-{game:06d}.exb")
+        referee = RefereeGame(recordfilename=path)
+        turn = 0
+        while not referee.over() and turn < 20:
+            colour = COLOURS[turn % 2]
+            referee.update(colour,
+                rng.choice(referee._available_actions(colour)))
+            turn += 1
+        # the second game never finishes, and is skipped
+        if game == 1:
+            referee.abort()
+        else:
+            referee.drawmsg = "stopped"
+            referee.end()
+            plies[game] = turn
+    name = str(tmp_path / "positions")
+    build(str(records), name, out=io.StringIO())
+    dataset = Dataset(name)
+    assert list(dataset.games()) == list(plies)
+    assert len(dataset) == sum(plies.values())
+    first = dataset.records[dataset.gameRecords([0])]
+    assert bytes(first["board"][0]) \
+        == positionKey(Game.initState(), WHITE)[:64]
+    assert list(first["colour"]) == [ply % 2 for ply in range(plies[0])]
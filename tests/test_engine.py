@@ -0,0 +1,50 @@
+"""Tests for Src.engine: a search that fails is reported, not left hanging."""
+
+import io
+import sys
+
+import pytest
+
+from Referee.engine import EnginePlayerWrapper, ENGINE_PREFIX
+from Referee.isolation import PlayerProcessError
+from Src.engine import Engine
+
+# an engine whose searches fail (after the depth-1 search it runs on start-up)
+FAILING_ENGINE = (
+    f"{sys.executable} -c \""
+    "from Src.strategy import Strategy; "
+    "search = Strategy.chooseAction; "
+    "Strategy.chooseAction = lambda self, state, colour, depth=None, *args: "
+    "search(self, state, colour, depth, *args) if depth == 1 else 1 / 0; "
+    "from Src.engine import main; main()\"")
+
+
+def _fail(*args):
+    raise RuntimeError("no moves today")
+
+
+def test_failed_search_replies_with_an_error(capsys):
+    out = io.StringIO()
+    engine = Engine(out=out)
+    engine.strategy.chooseAction = _fail
+    engine.handle("go depth 2")
+    engine.wait()
+    replies = out.getvalue().splitlines()
+    assert replies[-1].startswith("error search failed")
+    assert not any(line.startswith("bestmove") for line in replies)
+    assert "no moves today" in capsys.readouterr().err
+    # the engine is still there to answer
+    engine.handle("isready")
+    assert out.getvalue().splitlines()[-1] == "readyok"
+
+
+def test_failed_search_is_blamed_on_the_engine():
+    # the time limit only keeps a hanging engine from hanging the test
+    wrapper = EnginePlayerWrapper("white", (ENGINE_PREFIX, FAILING_ENGINE),
+        time_limit=10, quiet=True)
+    try:
+        wrapper.init("white")
+        with pytest.raises(PlayerProcessError, match="search failed"):
+            wrapper.action()
+    finally:
+        wrapper.close()
@@ -0,0 +1,104 @@
+"""
+Tests for Referee.game: checking actions, and the board by square index and
+the Zobrist key, both kept up to date with the board.
+"""
+
+import random
+from collections import Counter
+
+import pytest
+
+from Referee import rules
+from Referee.game import Game, COLOURS, IllegalActionException
+
+
+def _rebuilt(game):
+    return [game.board[xy] for xy in rules.COORDS]
+
+
+@pytest.mark.parametrize("action", [
+    ("BOOM", (2, 2)),           # an empty square
+    ("BOOM", (0, 7)),           # a black stack
+    ("BOOM", (9, 9)),           # off the board
+    ("BOOM", [0, 1]),           # a list, not a square
+    ("MOVE", 2, (0, 1), (0, 3)), # more tokens than the stack has
+    ("MOVE", 1, (0, 1), (1, 2)), # not in a straight line
+    ("MOVE", 1, (0, 1), (0, 1)), # nowhere
+    ("MOVE", "1", (0, 1), (0, 2)),
+    ("MOVE", 1, (0, 1)),
+    ("PASS",),
+    "BOOM",
+])
+def test_illegal_action_is_rejected(action):
+    game = Game()
+    before = game.squares()
+    with pytest.raises(IllegalActionException):
+        game.update("white", action)
+    assert game.squares() == before
+
+
+def test_squares_follow_updates():
+    rng = random.Random(45)
+    for _ in range(20):
+        game = Game()
+        turn = 0
+        while not game.over():
+            colour = COLOURS[turn % 2]
+            game.update(colour, rng.choice(game._available_actions(colour)))
+            assert game.squares() == _rebuilt(game)
+            turn += 1
+
+
+def test_set_board():
+    game = Game()
+    game.set_board({(0, 0): 3, (7, 7): -2})
+    assert game.squares() == _rebuilt(game)
+    assert game.score == {"white": 3, "black": 2}
+    assert game.key == game._hash_board()
+
+
+def test_zobrist_key_follows_updates():
+    rng = random.Random(30)
+    for _ in range(20):
+        game = Game()
+        # each position (with the side to move), counted directly
+        seen = Counter({(tuple(game.squares()), 0): 1})
+        turn = 0
+        while not game.over():
+            colour = COLOURS[turn % 2]
+            game.update(colour, rng.choice(game._available_actions(colour)))
+            turn += 1
+            assert game.key == game._hash_board()
+            position = (tuple(game.squares()), turn % 2)
+            seen[position] += 1
+            assert game.history[game._snap()] == seen[position]
+
+
+def test_fourth_repetition_is_a_draw():
+    game = Game()
+    shuffle = [("white", ("MOVE", 1, (0, 1), (0, 2))),
+        ("black", ("MOVE", 1, (0, 6), (0, 5))),
+        ("white", ("MOVE", 1, (0, 2), (0, 1))),
+        ("black", ("MOVE", 1, (0, 5), (0, 6)))]
+    for repetition in range(2, rules.REPETITIONS + 1):
+        assert not game.over()
+        for colour, action in shuffle:
+            game.update(colour, action)
+        assert game.history[game._snap()] == repetition
+    assert game.over()
+    assert "occurred 4 times" in game.drawmsg
+
+
+def test_same_board_other_side_to_move_is_not_a_repetition():
+    game = Game()
+    game.set_board({(0, 0): 2, (7, 7): -1})
+    white_to_move = game._snap()
+    # white's stack goes round a triangle, black's back and forth
+    game.update("white", ("MOVE", 2, (0, 0), (0, 2)))
+    game.update("black", ("MOVE", 1, (7, 7), (7, 6)))
+    game.update("white", ("MOVE", 2, (0, 2), (0, 1)))
+    game.update("black", ("MOVE", 1, (7, 6), (7, 7)))
+    game.update("white", ("MOVE", 2, (0, 1), (0, 0)))
+    assert game.key == white_to_move
+    assert game._snap() != white_to_move
+    assert game.history[game._snap()] == 1
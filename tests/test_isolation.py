@@ -0,0 +1,101 @@
+"""
+Tests for Referee.isolation: players in processes of their own, and the
+board they can share with the referee.
+"""
+
+import os
+
+import pytest
+
+from Referee.game import Game
+from Referee.isolation import ProcessPlayerWrapper, PlayerProcessError, \
+    SharedBoard
+
+MOVES = [("white", ("MOVE", 1, (0, 1), (0, 2))),
+    ("black", ("MOVE", 1, (0, 6), (0, 5))),
+    ("white", ("BOOM", (0, 2)))]
+
+
+class BoardPlayer:
+    """Answers with what it reads from the shared board (and its pid)."""
+    def __init__(self, colour):
+        self.board = None
+
+    def attach_board(self, board):
+        self.board = board
+
+    def action(self):
+        plies, board = self.board.read()
+        return (os.getpid(), plies, sorted(board.items()))
+
+    def update(self, colour, action):
+        pass
+
+
+class CrashingPlayer:
+    def __init__(self, colour):
+        pass
+
+    def action(self):
+        os._exit(3)
+
+
+class FailingPlayer:
+    def __init__(self, colour):
+        pass
+
+    def action(self):
+        raise RuntimeError("out of ideas")
+
+
+def _board_after(moves):
+    game = Game()
+    for colour, action in moves:
+        game.update(colour, action)
+    return sorted((xy, n) for xy, n in game.board.items() if n)
+
+
+def test_shared_board_follows_actions():
+    board = SharedBoard()
+    reader = SharedBoard(board.name)
+    try:
+        assert reader.read() == (0, dict(_board_after([])))
+        for ply, (_, action) in enumerate(MOVES, 1):
+            board.apply(action)
+            plies, squares = reader.read()
+            assert plies == ply
+            assert sorted(squares.items()) == _board_after(MOVES[:ply])
+        assert reader.read_key()[1][-1] == len(MOVES) % 2
+    finally:
+        reader.close()
+        board.close(unlink=True)
+
+
+def test_player_reads_the_shared_board():
+    wrapper = ProcessPlayerWrapper("white", (__name__, "BoardPlayer"),
+        share_board=True)
+    try:
+        wrapper.init("white")
+        for colour, action in MOVES:
+            wrapper.update(colour, action)
+        pid, plies, board = wrapper.action()
+    finally:
+        wrapper.close()
+    assert pid != os.getpid()
+    assert plies == len(MOVES)
+    assert [(tuple(xy), n) for xy, n in board] == _board_after(MOVES)
+
+
+@pytest.mark.parametrize("Player, message", [
+    ("CrashingPlayer", "exited unexpectedly"),
+    ("FailingPlayer", "out of ideas"),
+])
+def test_failure_is_raised_in_the_referee(Player, message):
+    wrapper = ProcessPlayerWrapper("white", (__name__, Player), quiet=True)
+    try:
+        wrapper.init("white")
+        with pytest.raises(PlayerProcessError, match=message):
+            wrapper.action()
+    finally:
+        wrapper.close()
+    assert wrapper.process is None
@@ -0,0 +1,61 @@
+"""Tests for Src.memory: counting the bytes held by the player's tables."""
+
+import tracemalloc
+
+import pytest
+
+from Src.memory import MB, tableBytes, searchTableEntries, \
+    solverTableEntries, componentUsage, tableCounts, tracedUsage
+from Src.positions import getPosition
+from Src.search import AlphaBeta
+from Src.solver import ProofNumberSolver
+from Src.strategy import Strategy, Material
+
+BUDGET = MB // 8
+
+
+@pytest.fixture(scope="module")
+def strategy():
+    search = AlphaBeta(Material, tableSize=searchTableEntries(BUDGET))
+    solver = ProofNumberSolver(tableSize=solverTableEntries(BUDGET))
+    search.search(*getPosition("midgame-open"), maxDepth=5)
+    solver.solve(*getPosition("endgame-stack"), maxNodes=5000)
+    return Strategy(search, Material, solver)
+
+
+def test_estimate_is_close_to_exact(strategy):
+    estimate = componentUsage(strategy)
+    exact = componentUsage(strategy, exact=True)
+    for name in ("search_table", "solver_table"):
+        assert estimate[name] == pytest.approx(exact[name], rel=0.2)
+    assert exact["move_tables"] > 0
+
+
+def test_tables_keep_to_their_budgets(strategy):
+    counts = tableCounts(strategy)
+    assert counts["search_table"] <= searchTableEntries(BUDGET)
+    assert counts["solver_table"] <= solverTableEntries(BUDGET)
+    assert counts["search_table"] > searchTableEntries(BUDGET) / 2
+    usage = componentUsage(strategy, exact=True)
+    assert usage["search_table"] <= 1.1 * BUDGET
+    assert usage["solver_table"] <= 1.1 * BUDGET
+    # budgets scale
+    assert searchTableEntries(2 * BUDGET) \
+        == pytest.approx(2 * searchTableEntries(BUDGET), abs=1)
+
+
+def test_empty_table():
+    assert tableBytes({}) == tableBytes({}, exact=True) > 0
+
+
+def test_traced_usage():
+    assert tracedUsage() is None
+    tracemalloc.start()
+    try:
+        search = AlphaBeta(Material)
+        search.search(*getPosition("start"), maxDepth=2)
+        usage = tracedUsage()
+    finally:
+        tracemalloc.stop()
+    assert usage["search"] > 0
+    assert set(usage) >= {"search", "solver", "game", "numpy"}
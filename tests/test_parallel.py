@@ -0,0 +1,51 @@
+"""Tests for stopping searches (Src.search, Src.parallel)."""
+
+import time
+
+from Src.game import Game
+from Src.search import AlphaBeta
+from Src.strategy import Material
+from Src.sharedtable import SharedTable
+from Src.parallel import SearchWorkers, STOP_TIMEOUT
+
+WHITE = 0
+
+
+def test_stop_before_search_starts_is_kept():
+    search = AlphaBeta(Material)
+    search.stop()
+    start = time.time()
+    action = search.search(Game.initState(), WHITE, timeLimit=60)
+    assert time.time() - start < 5
+    assert action is not None
+    # until it is withdrawn
+    search.resume()
+    search.search(Game.initState(), WHITE, maxDepth=2)
+    assert search.stats.depth() == 2
+
+
+def test_workers_stop_straight_after_start():
+    with SharedTable.create(1 << 10) as table:
+        workers = SearchWorkers(1, table.name)
+        try:
+            for _ in range(3):
+                workers.start(Game.initState(), WHITE, timeLimit=60)
+                start = time.time()
+                workers.stop()
+                assert time.time() - start < STOP_TIMEOUT
+            assert len(workers.processes) == 1
+        finally:
+            workers.close()
+
+
+def test_workers_stop_drops_dead_helper():
+    with SharedTable.create(1 << 10) as table:
+        workers = SearchWorkers(1, table.name)
+        try:
+            workers.processes[0].kill()
+            workers.processes[0].join()
+            workers.start(Game.initState(), WHITE, maxDepth=1)
+            assert workers.stop() == 0
+            assert workers.processes == []
+        finally:
+            workers.close()
@@ -0,0 +1,67 @@
+"""Tests for Referee.position: position keys and their text form."""
+
+import random
+
+import numpy as np
+import pytest
+
+from Referee.game import Game as RefereeGame, COLOURS
+from Referee.position import from_board, to_board, from_state, to_state, \
+    to_text, from_text, board_part, KEY_SIZE, WHITE, BLACK, NO_COLOUR
+from Src.game import Game
+
+START = "aa1aa1aa/aa1aa1aa/8/8/8/8/AA1AA1AA/AA1AA1AA:w"
+
+
+def _boards(seed, games=5):
+    # the boards of some random games, with the colour to move
+    rng = random.Random(seed)
+    for _ in range(games):
+        game = RefereeGame()
+        turn = 0
+        while not game.over():
+            yield dict(game.board), COLOURS[turn % 2]
+            colour = COLOURS[turn % 2]
+            game.update(colour, rng.choice(game._available_actions(colour)))
+            turn += 1
+
+
+def test_start_position():
+    key = from_board(RefereeGame().board, "white")
+    assert len(key) == KEY_SIZE
+    assert to_text(key) == START
+    assert key == from_state(Game.initState(), WHITE)
+
+
+def test_board_and_state_keys_agree():
+    for board, colour in _boards(44):
+        key = from_board(board, colour)
+        state, colour_byte = to_state(key)
+        assert from_state(state, colour) == key
+        assert colour_byte == (WHITE if colour == "white" else BLACK)
+        # (the slow path, and the colour of empty squares, make no odds)
+        other = state.astype(np.int64)
+        other[..., 1][other[..., 0] == 0] = 1
+        assert from_state(other, colour) == key
+        assert to_board(key) == ({xy: n for xy, n in board.items() if n},
+                                 key[-1])
+
+
+def test_text_round_trip():
+    for board, colour in _boards(45, games=2):
+        key = from_board(board, colour)
+        assert from_text(to_text(key)) == key
+    key = from_board({(0, 0): 12, (7, 7): -12})
+    assert to_text(key) == "7l/8/8/8/8/8/8/L7:-"
+    assert from_text(to_text(key)) == key
+    assert key[-1] == NO_COLOUR
+    assert board_part(key) == key[:-1]
+
+
+@pytest.mark.parametrize("text", [
+    "", "8/8/8/8/8/8/8/8", "8/8/8/8/8/8/8:w", "8/8/8/8/8/8/8/9:w",
+    "8/8/8/8/8/8/8/7:w", "8/8/8/8/8/8/8/m7:w", "8/8/8/8/8/8/8/8:x",
+])
+def test_malformed_text(text):
+    with pytest.raises(ValueError, match="not a position"):
+        from_text(text)
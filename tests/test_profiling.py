@@ -0,0 +1,71 @@
+"""Tests for Referee.profiling: profiling player calls and merging profiles."""
+
+import time
+import pstats
+
+import pytest
+
+from Referee.player import PlayerWrapper
+from Referee.profiling import PlayerProfile, read_folded, merge_profiles, \
+    profile_name
+
+
+def _spin(seconds=0.05):
+    start = time.process_time()
+    while time.process_time() - start < seconds:
+        pass
+    return "done"
+
+
+def test_samples_start_at_the_profiled_call(tmp_path):
+    profile = PlayerProfile(str(tmp_path / "white"))
+    assert profile.call(_spin) == "done"
+    assert sum(profile.samples.values()) > 0
+    assert all(stack.split(";")[0] == f"{__name__}._spin"
+               for stack in profile.samples)
+    # writing again adds to the profile in the file
+    profile.write()
+    profile.write()
+    assert read_folded(profile.path) == profile.samples + profile.samples
+
+
+def test_cprofile(tmp_path):
+    profile = PlayerProfile(str(tmp_path / "white"), "cprofile")
+    profile.call(_spin, 0.01)
+    profile.write()
+    assert profile.path.endswith(".prof")
+    functions = {name for _, _, name in pstats.Stats(profile.path).stats}
+    assert "_spin" in functions
+
+
+def test_merge_profiles(tmp_path):
+    parts = []
+    for worker in range(3):
+        profile = PlayerProfile(str(tmp_path / str(worker)))
+        profile.samples.update({"a;b": worker, "a": 1})
+        profile.write()
+        parts.append(profile.path)
+    merged = str(tmp_path / "player.folded")
+    merge_profiles(parts, merged)
+    assert read_folded(merged) == {"a;b": 3, "a": 3}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["player.folded"]
+
+
+def test_wrapper_profiles_every_call(tmp_path):
+    profile = PlayerProfile(str(tmp_path / "white"), "cprofile")
+    wrapper = PlayerWrapper("white", ("Src", "Player"), profile=profile)
+    wrapper.init("white")
+    wrapper.update("white", ("MOVE", 1, (0, 1), (0, 2)))
+    wrapper.close()
+    functions = {name for _, _, name in pstats.Stats(profile.path).stats}
+    assert {"__init__", "update"} <= functions
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="profiling mode"):
+        PlayerProfile("white", "trace")
+
+
+def test_profile_name():
+    assert profile_name("engine=python -m Src.engine") \
+        == "engine_python_-m_Src.engine"
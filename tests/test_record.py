@@ -0,0 +1,90 @@
+"""Tests for Referee.record: encoding actions and replaying game records."""
+
+import random
+
+import pytest
+
+from Referee import rules
+from Referee.game import Game, COLOURS
+from Referee.record import RecordWriter, read_record, encode_action, \
+    decode_action
+
+
+def _squares(board):
+    return [board[xy] for xy in rules.COORDS]
+
+
+def _random_game(rng, **options):
+    game = Game(**options)
+    turn = 0
+    while not game.over():
+        colour = COLOURS[turn % 2]
+        game.update(colour, rng.choice(game._available_actions(colour)),
+            cpu_time=turn / 8)
+        turn += 1
+    return game
+
+
+def test_actions_round_trip():
+    rng = random.Random(33)
+    seen = set()
+    for _ in range(10):
+        game = Game()
+        turn = 0
+        while not game.over():
+            colour = COLOURS[turn % 2]
+            actions = game._available_actions(colour)
+            for action in actions:
+                code = encode_action(action)
+                assert decode_action(code) == action
+                seen.add(code)
+            game.update(colour, rng.choice(actions))
+            turn += 1
+    assert all(0 <= code < 1 << 16 for code in seen)
+
+
+def test_record_replays_the_game(tmp_path):
+    rng = random.Random(34)
+    path = str(tmp_path / "game.exb")
+    game = _random_game(rng, recordfilename=path,
+        playernames=("one", "two"))
+    result = game.end()
+    record = read_record(path)
+    assert (record.white, record.black) == ("one", "two")
+    assert len(record) == game.nturns
+    assert _squares(record.position()) == game.squares()
+    assert record.result in result or record.result == "draw"
+    assert record.cpu_times == [turn / 8 for turn in range(len(record))]
+    # positions part of the way through, too
+    replay = Game()
+    for ply, action in enumerate(record.actions()):
+        assert _squares(record.position(ply)) == replay.squares()
+        replay.update(COLOURS[ply % 2], action)
+
+
+def test_unfinished_record_without_cpu_times(tmp_path):
+    path = str(tmp_path / "game.exb")
+    writer = RecordWriter(path, cpu=False)
+    writer.write_ply(("MOVE", 1, (0, 1), (0, 2)))
+    writer.file.close() # (as if the referee died)
+    record = read_record(path)
+    assert record.actions() == [("MOVE", 1, (0, 1), (0, 2))]
+    assert record.cpu_times is None
+    assert record.result is None
+
+
+def test_aborted_record(tmp_path):
+    path = str(tmp_path / "game.exb")
+    game = Game(recordfilename=path)
+    game.update("white", ("BOOM", (0, 0)))
+    game.abort()
+    record = read_record(path)
+    assert len(record) == 1 and record.result == "aborted"
+    assert record.cpu_times == [pytest.approx(float("nan"), nan_ok=True)]
+
+
+def test_not_a_record(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("white won")
+    with pytest.raises(ValueError, match="not a game record"):
+        read_record(str(path))
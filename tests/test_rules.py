@@ -0,0 +1,123 @@
+"""
+Tests for the rules kernel (Referee.rules), checked against a direct
+reading of the rules written here, and for perft's known counts.
+"""
+
+import random
+
+import pytest
+
+from Referee import rules
+from Src.perft import perft, refereePerft, refereeGame, KNOWN_COUNTS
+from Src.positions import POSITIONS, getPosition
+
+
+def _random_board(rng):
+    squares = [0] * rules.SQUARES
+    for s in rng.sample(range(rules.SQUARES), rng.randint(1, 16)):
+        squares[s] = rng.choice((1, 1, 1, 2, 3, 5)) * rng.choice((1, -1))
+    return squares
+
+
+def _boards(count, seed=26):
+    rng = random.Random(seed)
+    return [_random_board(rng) for _ in range(count)]
+
+
+def _spec_actions(squares, sign):
+    # a boom on each of the side's stacks, and moves of 1..n tokens from a
+    # stack of n up to n squares in a straight line, onto an empty square or
+    # a stack of the same colour
+    actions = set()
+    for (x, y), n in zip(rules.COORDS, squares):
+        n *= sign
+        if n <= 0:
+            continue
+        actions.add(("BOOM", (x, y)))
+        for dx, dy in rules.DIRECTIONS:
+            for d in range(1, n + 1):
+                b = (x + d*dx, y + d*dy)
+                if b not in rules.INDICES:
+                    continue
+                if squares[rules.INDICES[b]] * sign >= 0:
+                    actions.update(("MOVE", m, (x, y), b)
+                                   for m in range(1, n + 1))
+    return actions
+
+
+def _spec_apply(squares, action):
+    # a boom removes the stack and sets off every stack next to it
+    # (diagonals included), which set off their neighbours in turn
+    squares = list(squares)
+    if action[0] == "BOOM":
+        todo = [action[1]]
+        while todo:
+            x, y = todo.pop()
+            if squares[rules.INDICES[x, y]] == 0:
+                continue
+            squares[rules.INDICES[x, y]] = 0
+            todo.extend((i, j) for i in range(x - 1, x + 2)
+                        for j in range(y - 1, y + 2) if (i, j) in rules.INDICES)
+        return squares
+    _, m, a, b = action
+    s, t = rules.INDICES[a], rules.INDICES[b]
+    m = m if squares[s] > 0 else -m
+    squares[s] -= m
+    squares[t] += m
+    return squares
+
+
+def _apply(squares, action):
+    squares = list(squares)
+    for i, n in rules.changes(squares, action):
+        squares[i] = n
+    return squares
+
+
+@pytest.mark.parametrize("squares", _boards(200))
+@pytest.mark.parametrize("sign", (+1, -1))
+def test_actions_follow_the_rules(squares, sign):
+    actions = rules.actions(squares, sign)
+    assert len(actions) == len(set(actions))
+    assert set(actions) == _spec_actions(squares, sign)
+    # booms first
+    kinds = [a[0] for a in actions]
+    assert kinds == sorted(kinds, key=lambda kind: kind != "BOOM")
+
+
+@pytest.mark.parametrize("squares", _boards(200))
+def test_changes_follow_the_rules(squares):
+    for sign in (+1, -1):
+        for action in rules.actions(squares, sign):
+            assert _apply(squares, action) == _spec_apply(squares, action)
+
+
+@pytest.mark.parametrize("squares", _boards(50))
+def test_is_legal_matches_actions(squares):
+    rng = random.Random(sum(map(abs, squares)))
+    for sign in (+1, -1):
+        legal = set(rules.actions(squares, sign))
+        candidates = set(legal)
+        for _ in range(200):
+            a = rules.COORDS[rng.randrange(rules.SQUARES)]
+            b = rules.COORDS[rng.randrange(rules.SQUARES)]
+            candidates.add(("BOOM", a))
+            candidates.add(("MOVE", rng.randint(0, 6), a, b))
+        for action in candidates:
+            assert rules.is_legal(squares, sign, action) == (action in legal)
+    # malformed actions are not legal, and do not raise
+    for action in (None, "BOOM", ("BOOM",), ("BOOM", [0, 0]),
+                   ("BOOM", (0, 8)), ("MOVE", 1.5, (0, 0), (0, 1)),
+                   ("MOVE", 1, (0, 0)), ("MOVE", "1", (0, 0), (0, 1)),
+                   ("JUMP", (0, 0))):
+        assert not rules.is_legal(squares, +1, action)
+
+
+@pytest.mark.parametrize("name", KNOWN_COUNTS)
+def test_perft_known_counts(name):
+    state, colour = getPosition(name)
+    board, _ = POSITIONS[name]
+    expected = KNOWN_COUNTS[name][:2]
+    assert [perft(state, colour, d) for d in (1, 2)] == list(expected)
+    game = refereeGame(board, colour)
+    assert [refereePerft(game, colour, d) for d in (1, 2)] == list(expected)
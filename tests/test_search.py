@@ -0,0 +1,134 @@
+"""
+Tests for Src.search: which selective search features keep the score, that
+pruning still finds forced wins, that equivalent actions are pruned, and
+that the search knows the draw rules.
+"""
+
+import pytest
+
+from Referee import rules
+from Referee.position import from_state as positionKey
+from Src.game import Game, History, ThreatIndex, WHITE, BLACK
+from Src.positions import POSITIONS, getPosition, boardToState
+from Src.search import AlphaBeta, FEATURES, WIN, MAX_PLY
+from Src.strategy import Material
+
+# White wins in three plies (see tests/test_solver.py)
+TRAP = {(2, 1): 1, (7, 7): 1, (0, 0): -1}
+STEP = ("MOVE", 1, (2, 1), (1, 1))
+
+
+def _search(name, features, depth):
+    state, colour = getPosition(name)
+    search = AlphaBeta(Material, features=features)
+    action = search.search(state, colour, maxDepth=depth)
+    return search, action
+
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_windows_keep_the_score(name):
+    # PVS and aspiration windows only narrow the search around the score
+    plain, _ = _search(name, ("equivalence",), 3)
+    windowed, _ = _search(name, ("pvs", "aspiration", "equivalence"), 3)
+    assert windowed.score == plain.score
+
+
+def test_selective_search_searches_fewer_nodes():
+    plain, _ = _search("midgame-open", ("equivalence",), 4)
+    selective, _ = _search("midgame-open", FEATURES, 4)
+    assert selective.stats.depth() == plain.stats.depth() == 4
+    assert selective.stats.nodes < plain.stats.nodes / 2
+
+
+@pytest.mark.parametrize("features", [(), FEATURES])
+def test_forced_win_is_found(features):
+    search = AlphaBeta(Material, features=features)
+    assert search.search(boardToState(TRAP), WHITE, maxDepth=6) == STEP
+    assert search.score >= WIN - MAX_PLY
+    # (and the search stops once the win is proven)
+    assert search.stats.depth() < 6
+
+
+def test_unknown_feature():
+    with pytest.raises(ValueError, match="unknown search features"):
+        AlphaBeta(Material, features=("pvs", "singular"))
+
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_distinct_booms_lead_to_distinct_states(name):
+    state, colour = getPosition(name)
+    threats = ThreatIndex.fromState(state)
+    actions = Game.getAllActions(state, colour)
+    booms = [a for a in actions if a[0] == "BOOM"]
+    kept = threats.distinctBooms(actions)
+    distinct = [a for a in kept if a[0] == "BOOM"]
+    assert kept[len(distinct):] == actions[len(booms):]
+    children = {a: Game.applyAction(a, state).tobytes() for a in booms}
+    assert len({children[a] for a in distinct}) == len(distinct)
+    assert {children[a] for a in distinct} == set(children.values())
+    # any boom can be the one kept for its group
+    for boom in booms:
+        assert boom in threats.distinctBooms(actions, keep=boom)
+
+
+class _NotMaterial(Material):
+    # (the same scores, but the search may not assume so)
+    materialOnly = False
+
+
+@pytest.mark.parametrize("name", POSITIONS)
+def test_equivalence_keeps_the_score(name):
+    plain, _ = _search(name, (), 3)
+    pruned, _ = _search(name, ("equivalence",), 3)
+    assert pruned.score == plain.score
+    assert pruned.stats.nodes < plain.stats.nodes
+
+
+def test_equivalence_needs_a_material_evaluation():
+    state, colour = getPosition("midgame-open")
+    searches = [AlphaBeta(evaluation, features=features)
+                for evaluation, features in ((Material, ()),
+                    (_NotMaterial, ("equivalence",)))]
+    for search in searches:
+        search.search(state, colour, maxDepth=3)
+    assert searches[0].stats.nodes == searches[1].stats.nodes
+
+
+def test_history_counts_since_the_last_boom():
+    state = Game.initState()
+    history = History(state, WHITE)
+    step = ("MOVE", 1, (0, 1), (0, 2))
+    child = Game.applyAction(step, state)
+    history.push(step, child, BLACK)
+    assert history.count(positionKey(child, BLACK)) == 1
+    assert history.pliesLeft() == 2 * rules.MAX_TURNS - 1
+    # no position before a boom can occur again
+    boom = ("BOOM", (0, 2))
+    history.push(boom, Game.applyAction(boom, child), WHITE)
+    assert history.count(positionKey(child, BLACK)) == 0
+    assert len(history.counts) == 1
+
+
+@pytest.mark.parametrize("repeats, wins", [
+    (rules.REPETITIONS - 2, True),
+    (rules.REPETITIONS - 1, False),
+])
+def test_repetition_is_a_draw(repeats, wins):
+    state = boardToState(TRAP)
+    history = History(state, WHITE)
+    child = Game.applyAction(STEP, state)
+    history.counts[positionKey(child, BLACK)] = repeats
+    search = AlphaBeta(Material)
+    search.search(state, WHITE, maxDepth=3, history=history)
+    assert (search.score >= WIN - MAX_PLY) == wins
+
+
+@pytest.mark.parametrize("pliesLeft, wins", [(3, True), (2, False)])
+def test_turn_limit_is_a_draw(pliesLeft, wins):
+    state = boardToState(TRAP)
+    history = History(state, WHITE, plies=2 * rules.MAX_TURNS - pliesLeft)
+    search = AlphaBeta(Material)
+    search.search(state, WHITE, maxDepth=6, history=history)
+    assert (search.score >= WIN - MAX_PLY) == wins
+    # (and the search goes no deeper than the game can)
+    assert search.stats.depth() <= pliesLeft
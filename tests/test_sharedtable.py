@@ -0,0 +1,36 @@
+"""Tests for Src.sharedtable and the memory report of a shared table."""
+
+from Src.game import Game, WHITE
+from Src.memory import componentUsage, tableCounts
+from Src.search import AlphaBeta, EXACT
+from Src.sharedtable import SharedTable
+from Src.strategy import Strategy, Material
+from Referee.position import from_state as positionKey
+
+ACTION = ("BOOM", (0, 0))
+
+
+def test_len_counts_entries_in_use():
+    with SharedTable.create(1 << 12) as table:
+        assert len(table) == 0
+        keys = [bytes([i]) * 65 for i in range(3)]
+        for depth, key in enumerate(keys):
+            table.store(key, depth, -5, EXACT, ACTION)
+        assert len(table) == 3
+        # replacing an entry does not add one
+        table.store(keys[0], 4, 0, EXACT, None)
+        assert len(table) == 3
+        assert table.get(keys[0]) == (4, 0, EXACT, None)
+        table.clear()
+        assert len(table) == 0
+
+
+def test_memory_report_of_shared_table():
+    with SharedTable.create(1 << 12) as table:
+        search = AlphaBeta(Material, table=table)
+        strategy = Strategy(search, Material)
+        search.search(Game.initState(), WHITE, maxDepth=2)
+        assert tableCounts(strategy)["search_table"] == len(table) > 0
+        assert componentUsage(strategy, exact=True)["search_table"] \
+            == table.nbytes()
+        assert table.get(positionKey(Game.initState(), WHITE)) is not None
@@ -0,0 +1,71 @@
+"""Tests for Src.solver: proofs that account for draws by repetition."""
+
+from Src.game import Game, History, WHITE, BLACK
+from Src.positions import boardToState
+from Src.solver import ProofNumberSolver
+from Referee.rules import REPETITIONS
+from Referee.position import from_state as positionKey
+
+# White wins in three plies by stepping next to Black's last token: it can
+# only step next to White's stack or boom, taking it but not (7, 7)
+TRAP = {(2, 1): 1, (7, 7): 1, (0, 0): -1}
+STEP = ("MOVE", 1, (2, 1), (1, 1))
+
+
+def _history(state, repeats):
+    # The game so far, in which the position after STEP has occurred
+    # `repeats` times
+    history = History(state, WHITE)
+    child = Game.applyAction(STEP, state)
+    history.counts[positionKey(child, BLACK)] = repeats
+    return history
+
+
+def test_proves_win():
+    state = boardToState(TRAP)
+    solver = ProofNumberSolver(3)
+    assert solver.solve(state, WHITE) == STEP
+    assert solver.line == [STEP, ("BOOM", (0, 0))]
+
+
+def test_repetition_is_not_a_win():
+    state = boardToState(TRAP)
+    solver = ProofNumberSolver(3)
+    # stepping there again would draw the game
+    assert solver.solve(state, WHITE, history=_history(state, 3)) is None
+    assert solver.solve(state, WHITE, history=_history(state, 2)) == STEP
+
+
+def test_table_kept_only_without_history():
+    state = boardToState(TRAP)
+    solver = ProofNumberSolver(3)
+    solver.solve(state, WHITE)
+    assert solver.solve(state, WHITE, history=_history(state, 3)) is None
+
+
+def test_long_ply_limit_still_proves_wins():
+    # past 12 plies the repetition bound no longer covers every line, but
+    # positions new to the game must not count as draws
+    state = boardToState(TRAP)
+    for plies in (13, 16):
+        solver = ProofNumberSolver(plies)
+        assert solver.solve(state, WHITE) is not None
+        assert len(solver.line) >= 2
+        assert solver.solve(state, WHITE, history=History(state, WHITE)) \
+            is not None
+
+
+def test_repetition_on_the_line_is_a_draw():
+    # with the position after STEP seen REPETITIONS - 2 times in the game,
+    # one more visit on the line is its last allowed occurrence
+    state = boardToState(TRAP)
+    solver = ProofNumberSolver(3)
+    child = Game.applyAction(STEP, state)
+    solver.path = {}
+    solver.attacker = WHITE
+    solver.history = History(state, WHITE)
+    key = positionKey(child, BLACK)
+    solver.history.counts[key] = REPETITIONS - 2
+    assert solver.terminal(child, BLACK, 2) is None
+    solver.path[key] = 1
+    assert solver.terminal(child, BLACK, 2) is not None
@@ -0,0 +1,97 @@
+"""Tests for Referee.sprt: paired openings, the test's verdicts and matches."""
+
+import random
+
+import pytest
+
+from Referee import rules
+from Referee.game import Game, COLOURS
+from Referee.sprt import SPRT, sprt_match, iter_openings
+
+GREEDY = (__name__, "GreedyPlayer")
+PASSIVE = (__name__, "PassivePlayer")
+
+
+class PassivePlayer:
+    """Never booms."""
+    def __init__(self, colour):
+        self.sign = rules.SIGNS[colour]
+        self.game = Game()
+        self.random = random.Random(colour)
+
+    def choose(self, actions):
+        return self.random.choice([a for a in actions if a[0] == "MOVE"]
+            or actions)
+
+    def action(self):
+        return self.choose(rules.actions(self.game.squares(), self.sign))
+
+    def update(self, colour, action):
+        self.game.update(colour, action)
+
+
+class GreedyPlayer(PassivePlayer):
+    """Takes the most tokens it can in one action."""
+    def choose(self, actions):
+        squares = self.game.squares()
+        def gain(action):
+            after = list(squares)
+            for i, n in rules.changes(squares, action):
+                after[i] = n
+            white, black = rules.token_counts(after)
+            return (white - black) * self.sign
+        best = max(map(gain, actions))
+        return self.random.choice([a for a in actions if gain(a) == best])
+
+
+def test_openings_are_reproducible_and_legal():
+    openings = iter_openings(4, seed=49)
+    first = [next(openings) for _ in range(10)]
+    again = iter_openings(4, seed=49)
+    assert [next(again) for _ in range(10)] == first
+    assert len({tuple(opening) for opening in first}) > 1
+    for opening in first:
+        assert len(opening) == 4
+        game = Game()
+        for ply, action in enumerate(opening):
+            assert action[0] == "MOVE"
+            game.update(COLOURS[ply % 2], action)
+
+
+@pytest.mark.parametrize("score, status", [(1.0, "H1"), (0.0, "H0"),
+    (0.5, "H0")])
+def test_decisions(score, status):
+    test = SPRT(0, 10)
+    while test.status() is None:
+        test.add(score)
+        assert test.pairs() < 10000
+    assert test.status() == status
+    elo, low, high = test.elo()
+    assert low <= elo <= high
+
+
+def test_clean_sweeps_pass():
+    test = SPRT(0, 10)
+    for _ in range(25):
+        test.add(1.0)
+        if test.status() is not None:
+            break
+    assert test.status() == "H1"
+    assert test.summary()["pentanomial"] == [0, 0, 0, 0, test.pairs()]
+    # the bigger the difference to tell, the sooner it is told
+    wide = SPRT(0, 100)
+    for _ in range(test.pairs() // 2):
+        wide.add(1.0)
+    assert wide.status() == "H1"
+
+
+def test_hypotheses_in_order():
+    with pytest.raises(ValueError):
+        SPRT(10, 0)
+
+
+def test_stronger_candidate_passes():
+    test = SPRT(0, 100)
+    status = sprt_match(GREEDY, PASSIVE, test, max_pairs=20, jobs=1)
+    assert status == "H1"
+    assert test.pairs() < 20
@@ -0,0 +1,27 @@
+"""Tests for Referee.tables: the generated tables and their fallbacks."""
+
+import pytest
+
+from Referee import rules, tables
+
+
+@pytest.mark.parametrize("name", tables.TABLES)
+def test_files_match_builders(name):
+    build = tables.TABLES[name][0]
+    assert list(tables.load(name)) == list(build())
+
+
+@pytest.mark.parametrize("name", tables.TABLES)
+def test_missing_or_stale_file_is_built(name, tmp_path, monkeypatch):
+    build = tables.TABLES[name][0]
+    monkeypatch.setattr(tables, "DATA_DIR", str(tmp_path))
+    assert list(tables.load(name)) == list(build())
+    (tmp_path / (name + ".bin")).write_bytes(b"stale")
+    assert list(tables.load(name)) == list(build())
+
+
+def test_kernel_tables():
+    # the corner's explosion, and its rays along the edges
+    assert rules.mask_squares(rules.BLAST[0]) == [0, 1, 8, 9]
+    assert rules.RAYS[0] == [[8, 16, 24, 32, 40, 48, 56], [],
+                             [1, 2, 3, 4, 5, 6, 7], []]
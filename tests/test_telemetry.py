@@ -0,0 +1,68 @@
+"""Tests for telemetry (Referee.log.TelemetryLog): what players are charged."""
+
+import io
+import json
+import time
+
+import pytest
+
+from Referee.log import TelemetryLog
+from Referee.player import PlayerWrapper
+from Referee.isolation import ProcessPlayerWrapper
+
+STATS_TIME = 0.2 # CPU seconds spent in each call to .stats()
+
+
+class SlowStatsPlayer:
+    """A player that plays instantly but takes its time over its stats."""
+    def __init__(self, colour):
+        pass
+
+    def action(self):
+        return ("BOOM", (0, 0))
+
+    def update(self, colour, action):
+        pass
+
+    def stats(self):
+        start = time.process_time()
+        while time.process_time() - start < STATS_TIME:
+            pass
+        return {"nodes": 1}
+
+
+@pytest.mark.parametrize("Wrapper", [PlayerWrapper, ProcessPlayerWrapper])
+def test_stats_are_charged_to_the_player(Wrapper):
+    log = io.StringIO()
+    wrapper = Wrapper("white", (__name__, "SlowStatsPlayer"),
+        telemetry=TelemetryLog(log))
+    try:
+        wrapper.init("white")
+        wrapper.action()
+    finally:
+        wrapper.close()
+    assert wrapper.timer.clock >= STATS_TIME
+    record = json.loads(log.getvalue().splitlines()[-1])
+    assert record["stats"] == {"nodes": 1}
+    assert record["cpu_total"] >= STATS_TIME
+
+
+def test_every_call_is_recorded():
+    log = io.StringIO()
+    telemetry = TelemetryLog(log, game=7)
+    wrapper = PlayerWrapper("white", (__name__, "SlowStatsPlayer"),
+        telemetry=telemetry)
+    wrapper.init("white")
+    action = wrapper.action()
+    wrapper.update("white", action)
+    wrapper.update("black", ("MOVE", 1, (0, 6), (0, 5)))
+    wrapper.close()
+    records = [json.loads(line) for line in log.getvalue().splitlines()]
+    assert [r["method"] for r in records] == ["init", "action", "update",
+        "update"]
+    assert [r["turn"] for r in records] == [0, 1, 1, 1]
+    assert all(r["game"] == 7 and r["colour"] == "white" for r in records)
+    assert records[1]["action"] == json.loads(json.dumps(action))
+    assert records[1]["stats"] == {"nodes": 1}
+    assert [r["stats"] for r in records[2:]] == [None, None]
+    assert records[-1]["cpu_total"] == wrapper.timer.clock
@@ -0,0 +1,55 @@
+"""Tests for Src.game.ThreatIndex: kept up to date action by action."""
+
+import random
+
+from Referee import rules
+from Src.game import Game, ThreatIndex, WHITE
+
+
+def _same(index, other):
+    assert index.squares == other.squares
+    assert index.groupOf == other.groupOf
+    assert index.groups == other.groups
+
+
+def test_incremental_index_matches_rebuilt():
+    rng = random.Random(46)
+    for _ in range(30):
+        state, colour = Game.initState(), WHITE
+        index = ThreatIndex.fromState(state)
+        while not Game.gameOver(state):
+            actions = Game.getAllActions(state, colour)
+            # every child's index, from the same parent index
+            for action in rng.sample(actions, min(5, len(actions))):
+                child = Game.applyAction(action, state)
+                _same(index.applyAction(action),
+                      ThreatIndex.fromState(child))
+            # which is left as it was
+            _same(index, ThreatIndex.fromState(state))
+            action = rng.choice(actions)
+            state = Game.applyAction(action, state)
+            index = index.applyAction(action)
+            colour = 1 - colour
+
+
+def test_boom_count_is_the_chain_explosion():
+    rng = random.Random(47)
+    state, colour = Game.initState(), WHITE
+    for _ in range(60):
+        if Game.gameOver(state):
+            break
+        index = ThreatIndex.fromState(state)
+        squares = Game.signedSquares(state)
+        for s, n in enumerate(squares):
+            coord = rules.COORDS[s]
+            if not n:
+                assert index.boomCount(coord) == (0, 0)
+                continue
+            removed = [squares[i] for i, _ in
+                       rules.changes(squares, ("BOOM", coord))]
+            assert tuple(index.boomCount(coord)) == (
+                sum(n for n in removed if n > 0),
+                -sum(n for n in removed if n < 0))
+        state = Game.applyAction(
+            rng.choice(Game.getAllActions(state, colour)), state)
+        colour = 1 - colour
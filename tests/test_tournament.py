@@ -0,0 +1,90 @@
+"""Tests for Referee.tournament: blaming failures on the right player."""
+
+import math
+import random
+
+import pytest
+
+from Referee import rules
+from Referee.game import Game
+from Referee.tournament import tournament, _play_game, summarise, \
+    ACCOUNTING_DEFAULT
+from Referee.profiling import PROFILE_MODES
+
+BOGUS_ENGINE = ("engine=", "/nonexistent/engine --uci")
+PLAYER = ("Src", "Player")
+RANDOM = (__name__, "RandomPlayer")
+
+
+class RandomPlayer:
+    """Plays a random legal action (the same ones every game)."""
+    def __init__(self, colour):
+        self.sign = 1 if colour == "white" else -1
+        self.game = Game()
+        self.random = random.Random(colour)
+
+    def action(self):
+        return self.random.choice(rules.actions(self.game.squares(),
+            self.sign))
+
+    def update(self, colour, action):
+        self.game.update(colour, action)
+
+
+def _spec(white, black):
+    return (0, ("white", white), ("black", black), None, None,
+            ACCOUNTING_DEFAULT, None, None, False, None, PROFILE_MODES[0], ())
+
+
+@pytest.mark.parametrize("white, black, culprit", [
+    (BOGUS_ENGINE, PLAYER, "white"),
+    (PLAYER, BOGUS_ENGINE, "black"),
+])
+def test_engine_that_fails_to_start_forfeits(white, black, culprit):
+    record = _play_game(_spec(white, black))
+    assert record["failure"] == "crash"
+    assert record["culprit"] == culprit
+    assert record["winner"] == ("black" if culprit == "white" else "white")
+    assert record["cpu"][culprit] == 0
+    # the record still adds up with the rest of the tournament's
+    summary = summarise([record], ["white", "black"])
+    assert summary["players"][culprit]["crash"] == 1
+    assert summary["players"][culprit]["losses"] == 1
+
+
+def test_game_record():
+    record = _play_game(_spec(RANDOM, (__name__, "RandomPlayer")))
+    assert record["failure"] is None
+    assert record["winner"] in ("white", "black", None)
+    assert 0 < record["turns"] <= 2 * rules.MAX_TURNS
+    assert set(record["cpu"]) == {"white", "black"}
+
+
+def test_tournament_alternates_colours():
+    records = tournament([RANDOM, RANDOM], games=2, jobs=1)
+    assert [r["game"] for r in records] == [0, 1]
+    labels = [(r["white"], r["black"]) for r in records]
+    assert labels[0] == labels[1][::-1]
+    # the same players, so the same game with the colours swapped
+    assert records[0]["result"] == records[1]["result"]
+
+
+def test_summary_standings():
+    def record(white, black, winner):
+        return {"white": white, "black": black, "winner": winner,
+            "failure": None, "culprit": None,
+            "cpu": {white: 1.0, black: 2.0}, "memory": {white: 0, black: 0}}
+    records = [record("a", "b", "a"), record("b", "a", "a"),
+        record("a", "b", None), record("b", "a", "b")]
+    summary = summarise(records, ["a", "b"])
+    a, b = summary["players"]["a"], summary["players"]["b"]
+    assert (a["wins"], a["draws"], a["losses"]) == (2, 1, 1)
+    assert (b["wins"], b["draws"], b["losses"]) == (1, 1, 2)
+    assert a["cpu"] == b["cpu"] == 1.5
+    assert a["elo"] == pytest.approx(-b["elo"])
+    assert a["elo_low"] < a["elo"] < a["elo_high"]
+    [pair] = summary["pairs"]
+    assert (pair["player"], pair["opponent"], pair["wins"]) == ("a", "b", 2)
+    # a clean sweep has no finite Elo difference
+    sweep = summarise([record("a", "b", "a")], ["a", "b"])
+    assert sweep["players"]["a"]["elo"] == math.inf
@@ -0,0 +1,86 @@
+"""Tests for Src.tune: SPSA updates, and resuming a run from its checkpoint."""
+
+import shlex
+
+import pytest
+
+import Src.search
+from Src import tune
+from Src.tune import SPSATuner, PARAMETERS
+
+NAMES = ["null_reduction", "futility_margin", "solver_share"]
+
+
+def _match(plus, minus, games, jobs=None, timeLimit=None):
+    # a stand-in for playing games: a smaller futility margin wins
+    if plus["futility_margin"] == minus["futility_margin"]:
+        return 0.5
+    return 1.0 if plus["futility_margin"] < minus["futility_margin"] else 0.0
+
+
+@pytest.fixture
+def matches(monkeypatch):
+    monkeypatch.setattr(tune, "playMatch", _match)
+
+
+def test_clean_sweep_moves_rate_steps():
+    tuner = SPSATuner(NAMES, 10, rate=0.5)
+    start = dict(tuner.values)
+    signs = {"null_reduction": 1, "futility_margin": -1, "solver_share": 1}
+    tuner.update(1.0, signs)
+    for name in NAMES:
+        step = PARAMETERS[name][4]
+        assert tuner.values[name] == pytest.approx(
+            start[name] + 0.5 * step * signs[name])
+    assert tuner.iteration == 1
+
+
+def test_perturbations_stay_in_bounds():
+    tuner = SPSATuner(NAMES, 10)
+    tuner.values["null_reduction"] = PARAMETERS["null_reduction"][3]
+    for _ in range(20):
+        plus, minus, signs = tuner.perturb(tuner.rng)
+        for name in NAMES:
+            _, _, low, high, _ = PARAMETERS[name]
+            assert low <= plus[name] <= high and low <= minus[name] <= high
+            assert (plus[name] - minus[name]) * signs[name] >= 0
+
+
+def test_tuning_follows_the_score(matches):
+    tuner = SPSATuner(NAMES, 10)
+    tuner.rng.seed(41)
+    start = tuner.values["futility_margin"]
+    for _ in range(5):
+        tuner.step(games=2)
+    assert tuner.values["futility_margin"] < start
+
+
+def test_resumed_run_goes_on_as_before(matches, tmp_path):
+    path = str(tmp_path / "tune.json")
+    straight = SPSATuner(NAMES, 6)
+    straight.rng.seed(41)
+    for _ in range(6):
+        straight.step(games=2)
+
+    interrupted = SPSATuner(NAMES, 6)
+    interrupted.rng.seed(41)
+    for _ in range(3):
+        interrupted.step(games=2)
+        interrupted.save(path)
+    resumed = SPSATuner(NAMES, 6)
+    resumed.load(path)
+    for _ in range(3):
+        resumed.step(games=2)
+    assert resumed.history == straight.history
+    assert resumed.values == straight.values
+
+
+def test_values_reach_the_engine(monkeypatch):
+    # (restored after the test)
+    monkeypatch.setattr(Src.search, "NULL_REDUCTION",
+                        Src.search.NULL_REDUCTION)
+    tune.applyValues({"null_reduction": 2.7})
+    assert Src.search.NULL_REDUCTION == 3
+    args = shlex.split(tune.engineCommand({"null_reduction": 2.7,
+                                           "solver_share": 0.25}))
+    assert args[-3:] == ["--set", "null_reduction=3", "solver_share=0.25"]